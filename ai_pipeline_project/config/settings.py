@@ -23,20 +23,102 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+
 # LLM (Gemini via LangChain)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")  # flash is friendlier on free tier
+# LLM gateway: client-side quota, retries and coalescing for every Gemini call
+LLM_RPM = float(os.getenv("LLM_RPM", "15"))                # requests per minute; 0 = unlimited
+LLM_TPM = float(os.getenv("LLM_TPM", "1000000"))           # tokens per minute (prompt + output); 0 = unlimited
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))   # retries of rate-limited / unavailable calls
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))  # seconds; full-jitter exponential backoff
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "256"))  # reserved per call, settled after
 
 # Weather
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5/weather")
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))    # seconds a response is served as fresh
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "1800"))   # extra seconds served stale while refreshing
+WEATHER_MAX_WORKERS = int(os.getenv("WEATHER_MAX_WORKERS", "4"))    # concurrent lookups for multi-city questions
 
 # Qdrant
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", None)
 QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "ai_pipeline_collection")
+# tenant used when a caller does not name one; its document ids are stored unprefixed
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+# Collection storage / index settings, used when a collection is created and by
+# qdrant_helper.migrate_collection for existing ones (Qdrant backend)
+QDRANT_ON_DISK = os.getenv("QDRANT_ON_DISK", "false").lower() in ("1", "true", "yes")  # vectors + payloads on disk (mmap)
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none").lower()  # "none", "scalar" (int8, 4x) or "product" (16x)
+QDRANT_QUANTIZATION_RESCORE = os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() in ("1", "true", "yes")
+QDRANT_QUANTIZATION_OVERSAMPLING = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", "2.0"))  # candidates rescored per hit
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))                     # graph degree
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+QDRANT_HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", "0"))                    # search-time ef; 0 = server default
+
+# Vector store backend: "qdrant" (server at QDRANT_URL) or "embedded" (in-process, memory-mapped)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+EMBEDDED_STORE_PATH = os.getenv("EMBEDDED_STORE_PATH", os.path.join(DATA_DIR, "embeddings", "store"))
 
 # Embeddings
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None              # e.g. "cpu", "cuda"; None = auto
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))  # torch CPU threads; 0 = torch default
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))    # cached query embeddings; 0 disables
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))    # seconds; 0 = never expire
+
+# Ingestion (chunking + manifest of already-embedded documents)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "400"))        # words per chunk
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))   # words shared by adjacent chunks
+CHUNK_BOUNDARY = os.getenv("CHUNK_BOUNDARY", "sentence")  # "sentence" (snap to sentence ends) or "word"
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))               # page-extraction processes; 0 = all cores, 1 = serial
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))  # pages per worker task (smaller PDFs stay serial)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # chunks encoded + upserted per request
+# Chunk embeddings persisted per (model, text hash): re-ingests and rebuilt collections skip the encoder
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(DATA_DIR, "cache", "embeddings"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))  # ~0.75 GB at 384-d; full = no new entries
+INGEST_MANIFEST_PATH = os.getenv(
+    "INGEST_MANIFEST_PATH", os.path.join(DATA_DIR, "embeddings", "ingest_manifest.json")
+)
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(DATA_DIR, "uploads"))  # content-addressed uploaded PDFs
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # background ingestion jobs run at once
+
+# Headless HTTP API (python -m src.server)
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "8"))                 # graph runs at once
+SERVER_QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", "32"))          # runs waiting for a worker; beyond that -> 429
+SERVER_REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "60"))  # seconds per query, queueing included -> 504
+SERVER_MAX_UPLOAD_MB = float(os.getenv("SERVER_MAX_UPLOAD_MB", "50"))  # larger uploads -> 413
+# directories a query's "pdf_path" may point into (os.pathsep-separated); uploads are always allowed
+SERVER_PDF_ROOTS = [p for p in os.getenv("SERVER_PDF_ROOTS", "").split(os.pathsep) if p]
+
+# Context assembly (retrieved chunks -> prompt context)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))          # estimated prompt tokens for context; 0 = no limit
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.9"))  # shingle Jaccard above which a hit is a duplicate
+
+# Answer cache (RAG answers keyed by document version + retrieved chunks + prompt + model)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(DATA_DIR, "cache", "answers.sqlite3"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "10000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))             # seconds; 0 = never expire
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))   # e.g. 0.95 to reuse paraphrases; 0 = exact only
+
+# Router (classify node): keyword rules -> embedding centroids -> LLM
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.8"))  # below this, ask the next tier
+ROUTER_EMBEDDING_TIER = os.getenv("ROUTER_EMBEDDING_TIER", "true").lower() == "true"
+# start ingestion check + retrieval for an attached PDF while the router is still deciding
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+
+# Built-in tracing / metrics (src/utils/tracing.py): per-stage spans in the graph state + Prometheus text
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_LOG = os.getenv("TRACE_LOG", "true").lower() == "true"  # one JSON line per graph node on the "src.trace" logger
 
 # LangSmith (set these to enable tracing)
 LANGCHAIN_TRACING_V2 = os.getenv("LANGCHAIN_TRACING_V2", "false")  # "true" to enable
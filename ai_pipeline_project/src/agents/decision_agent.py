@@ -1,28 +1,199 @@
 # src/agents/decision_agent.py
 """
-Simple decision logic that picks between weather or RAG based on user input.
-This can be replaced with a LangGraph node later.
+Decision logic that picks between weather or RAG based on user input.
+
+`route_question` is a tiered router used by the LangGraph classify node:
+  1. keyword rules            (free, microseconds)
+  2. embedding-centroid model (reuses the loaded sentence-transformer and the
+                               query-embedding cache, ~ms)
+  3. LLM classifier           (only when the cheaper tiers are not confident)
+Per-tier hit counts are available from `router_stats()`, along with how
+often the embedding tier failed and the router fell through to the LLM.
 """
 
-from typing import Dict
+import asyncio
+import logging
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from src.utils.qdrant_helper import embed_query, embed_queries
+from config.settings import ROUTER_CONFIDENCE_THRESHOLD, ROUTER_EMBEDDING_TIER, EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+_WEATHER_RE = re.compile(
+    r"\b(weather|temperature|forecast|rain\w*|sunny|wind|windy|humid\w*|snow\w*|storm\w*|"
+    r"celsius|fahrenheit|degrees)\b"
+)
+_DOC_RE = re.compile(
+    r"\b(pdf|document|assignment|file|read|paper|section|chapter|page|author|abstract|"
+    r"summar\w*|report)\b"
+)
 
-def decide_action(user_message: str) -> Dict[str, str]:
+# a handful of examples per label; their mean embedding is the label centroid
+_EXAMPLES = {
+    "weather": [
+        "What's the weather in Mumbai?",
+        "Will it rain in Delhi tomorrow?",
+        "How hot is it in Pune right now?",
+        "Is it cold outside in London?",
+        "Current conditions in New York",
+        "Do I need an umbrella in Bangalore today?",
+    ],
+    "rag": [
+        "What is the main idea of the uploaded text?",
+        "Explain the methodology described here.",
+        "Who are the team members mentioned?",
+        "List the key findings.",
+        "What problem does the proposed solution address?",
+        "Give me the conclusion in two lines.",
+    ],
+}
+
+_centroids = {}
+_centroid_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"keyword": 0, "embedding": 0, "llm": 0, "fallback": 0}
+_embedding_errors = 0
+
+
+def decide_action(user_message: str) -> Dict[str, Any]:
     """
-    Very simple keyword-based decision. Returns dict:
-      {"action": "weather"|"rag", "intent": short_intent_str}
+    Keyword-based decision. Returns dict:
+      {"action": "weather"|"rag", "intent": short_intent_str, "confidence": 0..1}
+    confidence is high only when exactly one kind of keyword matched.
     """
     text = user_message.lower().strip()
+    weather = bool(_WEATHER_RE.search(text))
+    doc = bool(_DOC_RE.search(text))
 
-    # Weather keywords
-    weather_keywords = ["weather", "temperature", "forecast", "rain", "sunny", "wind"]
-    if any(k in text for k in weather_keywords):
-        return {"action": "weather", "intent": "get_weather"}
-
-    # If user asks about the PDF (document, assignment, file, pdf)
-    doc_keys = ["pdf", "document", "assignment", "file", "read", "paper"]
-    if any(k in text for k in doc_keys) or text.endswith("?"):
-        # assume question to RAG unless explicit weather mention
-        return {"action": "rag", "intent": "query_document"}
+    if weather and not doc:
+        return {"action": "weather", "intent": "get_weather", "confidence": 0.95}
+    if doc and not weather:
+        return {"action": "rag", "intent": "query_document", "confidence": 0.95}
+    if weather and doc:
+        # e.g. "what does the report say about rainfall" -> lean on the document
+        return {"action": "rag", "intent": "query_document", "confidence": 0.5}
 
     # Default to RAG
-    return {"action": "rag", "intent": "query_document"}
+    return {"action": "rag", "intent": "query_document", "confidence": 0.0}
+
+
+def _get_centroids() -> dict:
+    centroids = _centroids.get(EMBEDDING_MODEL)
+    if centroids is None:
+        with _centroid_lock:
+            centroids = _centroids.get(EMBEDDING_MODEL)
+            if centroids is None:
+                centroids = {}
+                for label, examples in _EXAMPLES.items():
+                    vecs = embed_queries(examples)
+                    vecs = vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+                    c = vecs.mean(axis=0)
+                    centroids[label] = c / max(np.linalg.norm(c), 1e-12)
+                _centroids[EMBEDDING_MODEL] = centroids
+    return centroids
+
+
+def classify_by_embedding(user_message: str, temperature: float = 0.05) -> Dict[str, Any]:
+    """
+    Nearest-centroid label for the question embedding. confidence is the
+    softmax probability of the winning label over the cosine similarities.
+    """
+    centroids = _get_centroids()
+    q = embed_query(user_message)
+    q = q / max(np.linalg.norm(q), 1e-12)
+    labels = list(centroids)
+    sims = np.array([float(centroids[label] @ q) for label in labels])
+    probs = np.exp((sims - sims.max()) / temperature)
+    probs /= probs.sum()
+    best = int(np.argmax(probs))
+    return {"action": labels[best], "confidence": float(probs[best])}
+
+
+def _count(tier: str):
+    with _stats_lock:
+        _stats[tier] += 1
+
+
+def _embedding_failed(error: Exception):
+    global _embedding_errors
+    with _stats_lock:
+        _embedding_errors += 1
+    # ImportError / OSError: no sentence-transformers or model files here (slim
+    # deployments); anything else is a bug and gets a traceback
+    if isinstance(error, (ImportError, OSError)):
+        logger.debug("embedding router tier unavailable: %s", error)
+    else:
+        logger.warning("embedding router tier failed", exc_info=error)
+
+
+def _route_local(user_message: str, threshold: float) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """Keyword and embedding tiers: (confident decision or None, best guess so far)."""
+    decision = decide_action(user_message)
+    if decision["confidence"] >= threshold:
+        _count("keyword")
+        return {"action": decision["action"], "tier": "keyword", "confidence": decision["confidence"]}, None
+
+    best = {"action": decision["action"], "confidence": decision["confidence"]}
+    if ROUTER_EMBEDDING_TIER:
+        try:
+            emb = classify_by_embedding(user_message)
+            if emb["confidence"] >= threshold:
+                _count("embedding")
+                return {**emb, "tier": "embedding"}, None
+            if emb["confidence"] > best["confidence"]:
+                best = emb
+        except Exception as e:
+            _embedding_failed(e)  # the LLM tier decides
+    return None, best
+
+
+def _route_llm(label: str) -> Dict[str, Any]:
+    _count("llm")
+    return {"action": "weather" if "weather" in label else "rag", "tier": "llm", "confidence": 1.0}
+
+
+def _route_fallback(best: Dict[str, Any]) -> Dict[str, Any]:
+    _count("fallback")
+    return {**best, "tier": "fallback"}
+
+
+def route_question(user_message: str,
+                   llm_classify: Optional[Callable[[str], str]] = None,
+                   threshold: float = ROUTER_CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+    """
+    Returns {"action": "weather"|"rag", "tier": "keyword"|"embedding"|"llm"|"fallback",
+             "confidence": float}.
+    llm_classify(question) -> "weather" | "rag" is only called when neither
+    cheaper tier reaches `threshold`.
+    """
+    decision, best = _route_local(user_message, threshold)
+    if decision is not None:
+        return decision
+    if llm_classify is not None:
+        return _route_llm(llm_classify(user_message))
+    return _route_fallback(best)
+
+
+async def aroute_question(user_message: str,
+                          llm_classify: Optional[Callable[[str], Awaitable[str]]] = None,
+                          threshold: float = ROUTER_CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+    """Async route_question: the local tiers run in a worker thread, llm_classify is awaited."""
+    decision, best = await asyncio.to_thread(_route_local, user_message, threshold)
+    if decision is not None:
+        return decision
+    if llm_classify is not None:
+        return _route_llm(await llm_classify(user_message))
+    return _route_fallback(best)
+
+
+def router_stats() -> dict:
+    with _stats_lock:
+        counts, errors = dict(_stats), _embedding_errors
+    total = sum(counts.values())
+    rates = {f"{tier}_rate": round(n / total, 4) if total else 0.0 for tier, n in counts.items()}
+    return {"total": total, **counts, **rates, "embedding_errors": errors}
@@ -1,72 +1,87 @@
 # src/agents/rag_agent.py
 """
 RAG pipeline:
- - load chunks from PDF (pdf_loader)
- - ensure embeddings in Qdrant (embedding_pipeline)
+ - ingest the PDF once (ingestion manifest -> pdf_loader + embedding_pipeline)
  - retrieve top-k docs (qdrant_helper)
  - call Gemini to answer using context + user question
 """
 
-from src.utils.pdf_loader import load_pdf_text_chunks
-from src.pipelines.embedding_pipeline import ensure_embeddings_upsert
-from src.pipelines.retervial import retrieve_top_k  # fixed typo
+from src.pipelines.ingestion import ensure_pdf_ingested
+from src.pipelines.retervial import retrieve_top_k, document_scope  # fixed typo
+from src.pipelines.context import assemble_context, context_key
 from src.utils.evaluation import evaluate_response
-from config.settings import GEMINI_MODEL, GEMINI_API_KEY
+from src.utils.answer_cache import get_answer_cache, cache_scope
+from src.utils.qdrant_helper import embed_query
+from src.utils.llm import get_genai_model
+from src.utils.llm_gateway import get_gateway
+from src.utils.tracing import span, estimate_tokens
+from config.settings import GEMINI_MODEL, LLM_OUTPUT_TOKENS_ESTIMATE
 
-import google.generativeai as genai
+PROMPT_TEMPLATE = """Use the following extracted document snippets to answer the question.
 
-# configure Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+Provide a concise, referenced answer and mention which snippet (by index) you used if relevant."""
 
 
-def answer_from_docs(pdf_path: str, question: str, top_k: int = 4) -> dict:
+def answer_from_docs(pdf_path: str, question: str, top_k: int = 4, tenant_id: str = None) -> dict:
     """
     Returns dict with:
       - 'answer': LLM text
       - 'sources': list of retrieved passages
-      - 'raw': raw LLM response
+      - 'raw': raw LLM response (None when served from the answer cache)
       - 'eval': evaluation metrics
+      - 'cached': True if the answer came from the answer cache
+      - 'context': prompt tokens used / saved by context assembly (None when cached)
     """
-    # 1) Load chunks from PDF
-    chunks = load_pdf_text_chunks(pdf_path)
-
-    # 2) Store embeddings in Qdrant
-    ensure_embeddings_upsert(chunks)
-
-    # 3) Retrieve relevant docs
-    hits = retrieve_top_k(question, top_k=top_k)
-
-    # 4) Build context for prompt
-    context_text = "\n\n---\n\n".join(
-        [h["payload"].get("text", "") for h in hits]
-    )
-
-    prompt = f"""Use the following extracted document snippets to answer the question.
-
-CONTEXT:
-{context_text}
-
-QUESTION: {question}
-
-Provide a concise, referenced answer and mention which snippet (by index) you used if relevant."""
-
-    if not GEMINI_API_KEY:
-        raise RuntimeError("GEMINI_API_KEY not set in environment for LLM calls.")
-
-    # ✅ Updated Gemini call
-    model = genai.GenerativeModel(GEMINI_MODEL)
-    response = model.generate_content(prompt)
-
-    # Extract generated text
-    text = getattr(response, "text", str(response))
-
-    # 5) Evaluate answer
-    eval_metrics = evaluate_response(question, text, hits)
+    # 1+2) Load chunks and store embeddings, skipped if already ingested
+    doc = ensure_pdf_ingested(pdf_path, tenant_id=tenant_id)
+
+    # 3) Retrieve relevant docs (from this document only)
+    hits = retrieve_top_k(question, top_k=top_k, **document_scope(doc))
+
+    # 4) Reuse a cached answer for the same document version + context
+    cache = get_answer_cache()
+    scope = cache_scope(doc["sha256"], [h["id"] for h in hits], PROMPT_TEMPLATE + context_key(), GEMINI_MODEL)
+    qvec = embed_query(question) if cache else None
+    with span("answer_cache.get") as s:
+        text = cache.get(scope, question, qvec) if cache else None
+        s["cache_hit"] = text is not None
+    response = None
+    context_stats = None
+
+    if text is None:
+        # 5) Build context for prompt: merge overlapping chunks, drop duplicates, fit the token budget
+        ctx = assemble_context(hits)
+        context_stats = {k: ctx[k] for k in ("tokens", "raw_tokens", "tokens_saved", "dropped")}
+        prompt = PROMPT_TEMPLATE.format(context=ctx["text"], question=question)
+
+        # ✅ Updated Gemini call (client shared across calls)
+        with span("llm.rag_agent") as s:
+            model = get_genai_model(GEMINI_MODEL)
+            response = get_gateway().call(lambda: model.generate_content(prompt), key=(id(model), prompt),
+                                          tokens=estimate_tokens(prompt) + LLM_OUTPUT_TOKENS_ESTIMATE)
+
+            # Extract generated text
+            text = getattr(response, "text", str(response))
+            usage = getattr(response, "usage_metadata", None)
+            s["tokens_in"] = getattr(usage, "prompt_token_count", 0) or estimate_tokens(prompt)
+            s["tokens_out"] = getattr(usage, "candidates_token_count", 0) or estimate_tokens(text)
+        if cache:
+            cache.put(scope, question, text, qvec)
+
+    # 6) Evaluate answer
+    with span("eval"):
+        eval_metrics = evaluate_response(question, text, hits)
 
     return {
         "answer": text,
         "sources": hits,
         "raw": response,
-        "eval": eval_metrics
+        "eval": eval_metrics,
+        "cached": response is None,
+        "context": context_stats,
     }
@@ -1,21 +1,76 @@
 # src/agents/weather_agent.py
+"""
+Current-weather lookups against OpenWeatherMap (or WEATHER_API_URL).
+
+  - one pooled requests.Session, so repeat calls reuse keep-alive connections
+  - responses cached per (normalized city, units): fresh for WEATHER_CACHE_TTL,
+    then served stale for up to WEATHER_STALE_TTL more while a background
+    refresh fetches the new value (stale-while-revalidate)
+  - `fetch_weather_many` resolves several cities concurrently
+  - `afetch_weather_by_city` / `afetch_weather_many` for the async graph nodes
+"""
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-from config.settings import WEATHER_API_KEY
+from requests.adapters import HTTPAdapter
 
-OWM_BASE = "https://api.openweathermap.org/data/2.5/weather"
+from src.utils.cache import TTLCache, normalize_text
+from src.utils.tracing import span
+from config.settings import (
+    WEATHER_API_KEY,
+    WEATHER_API_URL,
+    WEATHER_CACHE_TTL,
+    WEATHER_STALE_TTL,
+    WEATHER_MAX_WORKERS,
+)
 
-def fetch_weather_by_city(city: str, units: str = "metric") -> dict:
-    """
-    Calls OpenWeatherMap current weather API.
-    Returns parsed JSON (or raises).
-    """
+OWM_BASE = WEATHER_API_URL
+
+# (city, units) -> (fetched_at, result); entries live for fresh + stale window
+_cache = TTLCache(maxsize=1024, ttl=WEATHER_CACHE_TTL + WEATHER_STALE_TTL)
+_refreshing = set()
+_session = None
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(WEATHER_MAX_WORKERS, 4))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(WEATHER_MAX_WORKERS, 1),
+                                               thread_name_prefix="weather")
+    return _executor
+
+
+def _request_weather(city: str, units: str) -> dict:
     if not WEATHER_API_KEY:
         raise RuntimeError("WEATHER_API_KEY not set in environment")
 
     params = {"q": city, "appid": WEATHER_API_KEY, "units": units}
-    resp = requests.get(OWM_BASE, params=params, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+    with span("weather.http") as s:
+        resp = _get_session().get(OWM_BASE, params=params, timeout=10)
+        s.update(status=resp.status_code, bytes=len(resp.content))
+        resp.raise_for_status()
+        data = resp.json()
 
     # Minimal normalized result
     result = {
@@ -28,3 +83,81 @@ def fetch_weather_by_city(city: str, units: str = "metric") -> dict:
     }
     return result
 
+
+def _refresh(key: tuple, city: str, units: str):
+    try:
+        _cache.set(key, (time.monotonic(), _request_weather(city, units)))
+    except Exception:
+        pass  # keep serving the stale value until it expires
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+
+
+def fetch_weather_by_city(city: str, units: str = "metric") -> dict:
+    """
+    Calls OpenWeatherMap current weather API.
+    Returns parsed JSON (or raises).
+    """
+    with span("weather.fetch", city=city) as s:
+        key = (normalize_text(city), units)
+        entry = _cache.get(key)
+        s["cache_hit"] = entry is not None
+        if entry is not None:
+            fetched_at, result = entry
+            if time.monotonic() - fetched_at > WEATHER_CACHE_TTL:
+                s["stale"] = True
+                with _lock:
+                    start = key not in _refreshing
+                    _refreshing.add(key)
+                if start:
+                    _get_executor().submit(_refresh, key, city, units)
+            return result
+
+        result = _request_weather(city, units)
+        _cache.set(key, (time.monotonic(), result))
+        return result
+
+
+def split_cities(location: str) -> list:
+    """'Pune and Delhi' / 'Pune, Delhi & Goa' -> ['Pune', 'Delhi', 'Goa']."""
+    parts = re.split(r"\s*(?:,|&|\band\b)\s*", location or "", flags=re.IGNORECASE)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def fetch_weather_many(cities: list, units: str = "metric") -> dict:
+    """
+    Weather for several cities, fetched concurrently.
+    Returns {city: result} or {city: {"error": str}} per city, in input order.
+    """
+    cities = list(dict.fromkeys(c.strip() for c in cities if c and c.strip()))
+    futures = {c: _get_executor().submit(fetch_weather_by_city, c, units) for c in cities}
+    out = {}
+    for city, fut in futures.items():
+        try:
+            out[city] = fut.result()
+        except Exception as e:
+            out[city] = {"error": str(e)}
+    return out
+
+
+async def afetch_weather_by_city(city: str, units: str = "metric") -> dict:
+    """Async fetch_weather_by_city; cache hits return without leaving the event loop."""
+    key = (normalize_text(city), units)
+    entry = _cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] <= WEATHER_CACHE_TTL:
+        with span("weather.fetch", city=city, cache_hit=True):
+            return entry[1]
+    # the blocking call keeps the pooled session and stale-while-revalidate logic
+    return await asyncio.to_thread(fetch_weather_by_city, city, units)
+
+
+async def afetch_weather_many(cities: list, units: str = "metric") -> dict:
+    cities = list(dict.fromkeys(c.strip() for c in cities if c and c.strip()))
+    results = await asyncio.gather(*(afetch_weather_by_city(c, units) for c in cities),
+                                   return_exceptions=True)
+    return {c: ({"error": str(r)} if isinstance(r, Exception) else r) for c, r in zip(cities, results)}
+
+
+def weather_cache_stats() -> dict:
+    return _cache.stats()
@@ -98,17 +98,33 @@ from src.agents.rag_agent import answer_from_docs
 import os
 import sys
 import re
-import tempfile
+import asyncio
 import streamlit as st
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.graph.flow import build_graph
+from src.graph.flow import warmup
+from src.graph.streaming import astream_answer, latency_stats
+from src.graph.speculation import speculation_stats
+from src.pipelines.ingest_jobs import store_upload, submit_ingestion, job_status
+from src.utils.tracing import metrics_snapshot
+from src.utils.llm_gateway import gateway_stats
 
 st.set_page_config(page_title="AI Pipeline Demo — LangGraph + LangChain", layout="centered")
 st.title("RAG Based Smart Agent")
 
+
+@st.cache_resource(show_spinner="Loading models...")
+def _warmup():
+    # once per process, not per rerun: graph, encoder and LLM clients are process-wide
+    return warmup()
+
+
+# only when served by `streamlit run` (plain imports, e.g. tests, stay cheap)
+if st.runtime.exists():
+    _warmup()
+
 # Sidebar: PDF upload (for RAG)
 st.sidebar.header("RAG Document")
 uploaded_pdf = st.sidebar.file_uploader(
@@ -117,12 +133,17 @@ uploaded_pdf = st.sidebar.file_uploader(
     accept_multiple_files=False
 )
 
-pdf_path = None
+pdf_path = ingest_job = None
 if uploaded_pdf:
-    tmp_dir = tempfile.gettempdir()
-    pdf_path = os.path.join(tmp_dir, uploaded_pdf.name)
-    with open(pdf_path, "wb") as f:
-        f.write(uploaded_pdf.read())
+    # stored and queued once per uploaded file, not on every rerun
+    upload = st.session_state.get("upload")
+    if upload is None or upload["file_id"] != uploaded_pdf.file_id:
+        stored = store_upload(uploaded_pdf.getvalue(), uploaded_pdf.name)
+        job = submit_ingestion(stored["path"], document_id=stored["document_id"], sha256=stored["sha256"])
+        upload = st.session_state.upload = {"file_id": uploaded_pdf.file_id, "path": stored["path"], "job": job}
+    pdf_path, ingest_job = upload["path"], upload["job"]
+    status = job_status(ingest_job) or {"state": "unknown"}
+    st.sidebar.caption(f"Indexing: {status['state']}" + (f" ({status['error']})" if status.get("error") else ""))
 
 # Conversation history
 if "history" not in st.session_state:
@@ -130,27 +151,48 @@ if "history" not in st.session_state:
 
 user_input = st.text_input("Ask something (weather or about the uploaded PDF)")
 
-if st.button("Send") and user_input.strip():
-    graph = build_graph()
+# Display conversation
+for role, text in st.session_state.history:
+    if role == "user":
+        st.markdown(f"**You:** {text}")
+    else:
+        st.markdown(f"**Assistant:** {text}")
 
+
+async def _stream_reply(state: dict, config: dict, placeholder) -> str:
+    # render answer tokens as the graph streams them
+    text = ""
+    async for event in astream_answer(state, config=config):
+        if event["type"] == "token":
+            text += event["text"]
+            placeholder.markdown(f"**Assistant:** {text}▌")
+        else:
+            result = event["state"]
+            text = result.get("answer") or result.get("error") or "No answer produced."
+            placeholder.markdown(f"**Assistant:** {text}")
+            st.caption(f"first token {event['metrics']['ttft_ms']:.0f} ms · "
+                       f"complete {event['metrics']['total_ms']:.0f} ms")
+    return text
+
+
+if st.button("Send") and user_input.strip():
     # feed graph state
     state = {
         "question": user_input,
         "pdf_path": pdf_path,  # None if not uploaded
+        "ingest_job": ingest_job,  # rag waits for this job instead of ingesting inline
     }
 
     # If LangSmith is enabled, you can pass run metadata tags:
     config = {"configurable": {"thread_id": "ui-session"}, "tags": ["ui", "streamlit"]}
 
-    result = graph.invoke(state, config=config)
-    reply = result.get("answer") or result.get("error") or "No answer produced."
+    st.markdown(f"**You:** {user_input}")
+    reply = asyncio.run(_stream_reply(state, config, st.empty()))
 
     st.session_state.history.append(("user", user_input))
     st.session_state.history.append(("assistant", reply))
 
-# Display conversation
-for role, text in st.session_state.history:
-    if role == "user":
-        st.markdown(f"**You:** {text}")
-    else:
-        st.markdown(f"**Assistant:** {text}")
+with st.sidebar.expander("Latency"):
+    st.json({**latency_stats(), "speculative_retrieval": speculation_stats(), "llm_gateway": gateway_stats()})
+with st.sidebar.expander("Stage timings"):
+    st.json(metrics_snapshot())
@@ -0,0 +1,605 @@
+# src/evaluation/benchmark.py
+"""
+Offline end-to-end latency benchmark.
+
+Runs the real pipeline code (ingestion, graph, rag_agent) on generated PDFs
+with every external dependency replaced by a local, deterministic stand-in:
+  - HashEncoder:      feature-hashing bag-of-words vectors instead of the
+                      sentence-transformer (no model download)
+  - FakeChatModel /   canned answers (optionally with a fixed delay) instead
+    FakeGenaiModel:   of Gemini
+  - EmbeddedStore:    in a temporary directory instead of a Qdrant server
+  - weather stub:     local HTTP server instead of OpenWeatherMap
+
+Reported per PDF size:
+  - ingestion stages (parse, chunk, embed, upsert) run one after another,
+    plus the streaming ensure_pdf_ingested wall time and chunks/sec
+  - query latency p50/p95/p99 and throughput for the graph (rag and weather
+    questions) and answer_from_docs, with the mean time per query spent in
+    embed / search / llm / eval
+
+A saved baseline is compared against each run; metrics slower than the
+baseline by more than the tolerance are flagged (exit code 1 with --strict).
+
+    python -m src.evaluation.benchmark
+    python -m src.evaluation.benchmark --pages 5 50 --questions 10 --llm-latency-ms 200
+    python -m src.evaluation.benchmark --save-baseline
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from config.settings import (
+    DATA_DIR,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    CHUNK_BOUNDARY,
+    EMBED_BATCH_SIZE,
+    EMBEDDING_MODEL,
+    EMBEDDING_DEVICE,
+    GEMINI_MODEL,
+)
+
+DEFAULT_BASELINE = os.path.join(DATA_DIR, "benchmarks", "baseline.json")
+DEFAULT_PAGES = (5, 50, 200)
+STAGES = ("parse", "chunk", "embed", "upsert", "search", "llm", "eval")
+CITIES = ["Mumbai", "Pune", "Delhi", "Chennai", "Kolkata", "Jaipur", "Nagpur", "Surat"]
+
+
+# ---------- timing ----------
+class Timings:
+    """Thread-safe accumulator of seconds per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.seconds = {s: 0.0 for s in STAGES}
+            self.calls = {s: 0 for s in STAGES}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    @contextlib.contextmanager
+    def time(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.seconds)
+
+
+def percentiles(samples: List[float]) -> dict:
+    """Latency summary in milliseconds for a list of seconds."""
+    if not samples:
+        return {"n": 0}
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    total = float(np.sum(samples))
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "qps": round(len(samples) / total, 2) if total else 0.0,
+    }
+
+
+# ---------- offline stand-ins ----------
+@lru_cache(maxsize=200_000)
+def _bucket(token: str, dim: int):
+    h = zlib.crc32(token.encode("utf-8"))
+    return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+
+class HashEncoder:
+    """Deterministic bag-of-words encoder with the SentenceTransformer.encode signature."""
+
+    def __init__(self, timings: Timings, dim: int = 384):
+        self.timings = timings
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        with self.timings.time("embed"):
+            if isinstance(texts, str):
+                texts = [texts]
+            out = np.zeros((len(texts), self.dim), dtype=np.float32)
+            for row, text in enumerate(texts):
+                for token in text.lower().split():
+                    idx, sign = _bucket(token.strip(".,;:!?\"'()"), self.dim)
+                    out[row, idx] += sign
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+            return out
+
+
+def _canned_answer(prompt: str) -> str:
+    words = prompt.split()
+    return "Based on the provided context: " + " ".join(words[-40:])
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model stand-in: answers from the prompt text after a fixed delay."""
+
+    timings: Any = None
+    latency_s: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        with self.timings.time("llm"):
+            if self.latency_s:
+                time.sleep(self.latency_s)
+            if messages[0].content.startswith("You route questions"):
+                text = "weather" if "weather" in messages[-1].content.lower() else "rag"
+            else:
+                text = _canned_answer(messages[-1].content)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+class _GenaiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenaiModel:
+    """google.generativeai GenerativeModel stand-in for rag_agent.answer_from_docs."""
+
+    def __init__(self, timings: Timings, latency_s: float = 0.0):
+        self.timings = timings
+        self.latency_s = latency_s
+
+    def generate_content(self, prompt: str):
+        with self.timings.time("llm"):
+            if self.latency_s:
+                time.sleep(self.latency_s)
+            return _GenaiResponse(_canned_answer(prompt))
+
+
+def _timed_store(store, timings: Timings):
+    """Wrap a VectorStore so upserts and searches are timed."""
+    from src.utils.vector_store import VectorStore
+
+    class TimedStore(VectorStore):
+        def collection_exists(self, name):
+            return store.collection_exists(name)
+
+        def create_collection(self, name, vector_size):
+            store.create_collection(name, vector_size)
+
+        def vector_size(self, name):
+            return store.vector_size(name)
+
+        def delete_collection(self, name):
+            store.delete_collection(name)
+
+        def configure_collection(self, name):
+            return store.configure_collection(name)
+
+        def upsert(self, name, ids, vectors, payloads):
+            with timings.time("upsert"):
+                store.upsert(name, ids, vectors, payloads)
+
+        def delete(self, name, ids):
+            store.delete(name, ids)
+
+        def update_payloads(self, name, ids, payloads):
+            store.update_payloads(name, ids, payloads)
+
+        def create_payload_index(self, name, field):
+            store.create_payload_index(name, field)
+
+        def search(self, name, vector, top_k=4, filters=None):
+            with timings.time("search"):
+                return store.search(name, vector, top_k, filters)
+
+        def search_batch(self, name, vectors, top_k=4, filters=None):
+            with timings.time("search"):
+                return store.search_batch(name, vectors, top_k, filters)
+
+    return TimedStore()
+
+
+def start_weather_stub():
+    """Local OpenWeatherMap stand-in; returns (server, url). Call server.shutdown() when done."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            city = parse_qs(urlparse(self.path).query).get("q", ["?"])[0]
+            temp = 20 + zlib.crc32(city.encode()) % 15
+            body = json.dumps({"name": city, "weather": [{"description": "clear sky"}],
+                               "main": {"temp": temp, "feels_like": temp + 1, "humidity": 50}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/weather"
+
+
+# ---------- generated documents ----------
+def _vocabulary(rng: random.Random, size: int = 3000) -> list:
+    syllables = ["ka", "lo", "mi", "ra", "te", "su", "no", "vi", "da", "pe", "zu", "fo", "ri", "ga", "me", "tu"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_pdf(path: str, pages: int, words_per_page: int = 350, seed: int = 0) -> List[str]:
+    """Write a text PDF of `pages` pages of deterministic pseudo-prose; returns the page texts."""
+    rng = random.Random(seed)
+    vocab = _vocabulary(rng)
+    texts = []
+    for _ in range(pages):
+        words, sentence = [], 0
+        for i in range(words_per_page):
+            w = rng.choice(vocab)
+            sentence += 1
+            if sentence >= rng.randint(8, 20) or i == words_per_page - 1:
+                w += "."
+                sentence = 0
+            words.append(w)
+        texts.append(" ".join(words))
+
+    # 1 catalog, 2 page tree, 3 font, then a page object + content stream per page
+    objs = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(texts):
+        ops = ["BT /F1 9 Tf 11 TL 36 806 Td"]
+        for j in range(0, len(text), 110):
+            ops.append(f"({text[j:j + 110]}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                    f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objs.append(f"<< /Length {len(stream.encode())} >>\nstream\n{stream}\nendstream")
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for k, obj in enumerate(objs):
+        offsets.append(len(out))
+        out += f"{k + 1} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+    return texts
+
+
+def make_questions(page_texts: List[str], n: int, seed: int = 0) -> List[str]:
+    """Distinct document questions built from words that occur in the PDF."""
+    rng = random.Random(seed + 1)
+    words = sorted({w.strip(".") for t in page_texts for w in t.split()})
+    return [f"What does the document say about {' '.join(rng.sample(words, 3))}?" for _ in range(n)]
+
+
+# ---------- environment ----------
+@contextlib.contextmanager
+def offline_env(workdir: str, timings: Timings, llm_latency_s: float = 0.0):
+    """Point every external dependency of the pipeline at a local stand-in, restoring it afterwards."""
+    from src.utils import encoder, llm, vector_store, answer_cache, qdrant_helper, llm_gateway, embedding_cache
+    from src.utils.embedded_store import EmbeddedStore
+    from src.pipelines import ingestion
+    from src.agents import wheather_agent, decision_agent, rag_agent
+    from src.graph import flow
+    from src.utils.cache import TTLCache
+
+    server, url = start_weather_stub()
+    previous_store = vector_store._store
+    saved = {
+        (ingestion, "INGEST_MANIFEST_PATH"): ingestion.INGEST_MANIFEST_PATH,
+        (ingestion, "_manifest"): ingestion._manifest,
+        (wheather_agent, "OWM_BASE"): wheather_agent.OWM_BASE,
+        (wheather_agent, "WEATHER_API_KEY"): wheather_agent.WEATHER_API_KEY,
+        (wheather_agent, "_cache"): wheather_agent._cache,
+        (qdrant_helper, "_query_cache"): qdrant_helper._query_cache,
+        (answer_cache, "_cache"): answer_cache._cache,
+        (llm_gateway, "_gateway"): llm_gateway._gateway,
+        (embedding_cache, "_cache"): embedding_cache._cache,
+        (flow, "evaluate_response"): flow.evaluate_response,
+        (rag_agent, "evaluate_response"): rag_agent.evaluate_response,
+    }
+    previous_encoder = encoder._models.get((EMBEDDING_MODEL, EMBEDDING_DEVICE))
+    previous_chat = {t: llm._chat_clients.get((GEMINI_MODEL, t)) for t in (0.0, 0.2)}
+    previous_genai = llm._genai_models.get(GEMINI_MODEL)
+
+    def timed_eval(evaluate):
+        def wrapper(*args, **kwargs):
+            with timings.time("eval"):
+                return evaluate(*args, **kwargs)
+        return wrapper
+
+    try:
+        encoder.set_encoder(HashEncoder(timings))
+        decision_agent._centroids.pop(EMBEDDING_MODEL, None)
+        vector_store.set_store(_timed_store(EmbeddedStore(os.path.join(workdir, "store")), timings))
+        fake = FakeChatModel(timings=timings, latency_s=llm_latency_s)
+        for t in (0.0, 0.2):
+            llm.set_chat_model(fake, temperature=t)
+        llm.set_genai_model(FakeGenaiModel(timings, llm_latency_s))
+        llm_gateway.set_gateway(llm_gateway.LLMGateway(rpm=0, tpm=0))  # the fakes have no quota
+        # hash-encoder vectors must not land in the real model's cache; scoped to this run
+        embedding_cache.set_embedding_cache(embedding_cache.EmbeddingCache(os.path.join(workdir, "embeddings")))
+        answer_cache.set_answer_cache(answer_cache.AnswerCache(os.path.join(workdir, "answers.sqlite3")))
+        ingestion.INGEST_MANIFEST_PATH = os.path.join(workdir, "manifest.json")
+        ingestion._manifest = None
+        wheather_agent.OWM_BASE, wheather_agent.WEATHER_API_KEY = url, "benchmark"
+        wheather_agent._cache = TTLCache(maxsize=1024, ttl=600)
+        qdrant_helper._query_cache = TTLCache(maxsize=2048, ttl=0)
+        flow.evaluate_response = timed_eval(saved[(flow, "evaluate_response")])
+        rag_agent.evaluate_response = timed_eval(saved[(rag_agent, "evaluate_response")])
+        yield
+    finally:
+        server.shutdown()
+        server.server_close()
+        for (module, name), value in saved.items():
+            setattr(module, name, value)
+        encoder.set_encoder(previous_encoder)
+        decision_agent._centroids.pop(EMBEDDING_MODEL, None)
+        vector_store.set_store(previous_store)
+        for t, client in previous_chat.items():
+            llm.set_chat_model(client, temperature=t)
+        llm.set_genai_model(previous_genai)
+
+
+# ---------- phases ----------
+def bench_ingestion(pdf_path: str, timings: Timings) -> dict:
+    """Stage-by-stage ingestion, then the streaming path the app uses."""
+    from src.utils.pdf_loader import iter_pdf_pages, iter_chunk_spans
+    from src.utils.encoder import get_encoder
+    from src.utils.vector_store import get_store
+    from src.pipelines.ingestion import ensure_pdf_ingested
+
+    timings.reset()
+    with timings.time("parse"):
+        pages = list(iter_pdf_pages(pdf_path))
+    with timings.time("chunk"):
+        chunks = list(iter_chunk_spans(pages, CHUNK_SIZE, CHUNK_OVERLAP, boundary=CHUNK_BOUNDARY))
+    model = get_encoder()
+    vectors = np.concatenate([
+        model.encode([c["text"] for c in chunks[i:i + EMBED_BATCH_SIZE]], batch_size=EMBED_BATCH_SIZE)
+        for i in range(0, len(chunks), EMBED_BATCH_SIZE)
+    ]) if chunks else np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    store = get_store()
+    if store.collection_exists("benchmark_staged"):
+        store.delete_collection("benchmark_staged")
+    store.create_collection("benchmark_staged", vectors.shape[1])
+    for i in range(0, len(chunks), EMBED_BATCH_SIZE):
+        store.upsert("benchmark_staged", list(range(i, min(i + EMBED_BATCH_SIZE, len(chunks)))),
+                     vectors[i:i + EMBED_BATCH_SIZE], [{"text": c["text"]} for c in chunks[i:i + EMBED_BATCH_SIZE]])
+    stages = {k: round(v, 4) for k, v in timings.snapshot().items() if k in ("parse", "chunk", "embed", "upsert")}
+
+    t0 = time.perf_counter()
+    record = ensure_pdf_ingested(pdf_path)
+    streaming_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ensure_pdf_ingested(pdf_path)
+    cached_s = time.perf_counter() - t0
+    # every chunk re-embedded and re-upserted: the vectors come from the embedding cache
+    timings.reset()
+    t0 = time.perf_counter()
+    ensure_pdf_ingested(pdf_path, force=True)
+    rebuild_s = time.perf_counter() - t0
+    return {
+        "chunks": len(record["chunk_ids"]),
+        "stages_s": stages,
+        "staged_total_s": round(sum(stages.values()), 4),
+        "streaming_s": round(streaming_s, 4),
+        "chunks_per_sec": round(len(record["chunk_ids"]) / streaming_s, 1) if streaming_s else 0.0,
+        "cached_ms": round(cached_s * 1000, 3),
+        "rebuild_s": round(rebuild_s, 4),
+        "rebuild_embed_s": round(timings.snapshot().get("embed", 0.0), 4),
+    }
+
+
+def _per_query(timings: Timings, n: int) -> dict:
+    snap = timings.snapshot()
+    return {k: round(snap[k] / n * 1000, 3) for k in ("embed", "search", "llm", "eval")} if n else {}
+
+
+def bench_queries(pdf_path: str, questions: List[str], timings: Timings) -> dict:
+    from src.graph.flow import build_graph
+    from src.agents.rag_agent import answer_from_docs
+
+    graph = build_graph()
+    results = {}
+
+    timings.reset()
+    latencies, errors = [], 0
+    for q in questions:
+        t0 = time.perf_counter()
+        out = graph.invoke({"question": q, "pdf_path": pdf_path})
+        latencies.append(time.perf_counter() - t0)
+        errors += bool(out.get("error"))
+    results["graph_rag"] = {**percentiles(latencies), "stages_ms": _per_query(timings, len(questions)), "errors": errors}
+
+    timings.reset()
+    latencies, errors = [], 0
+    for i in range(len(questions)):
+        t0 = time.perf_counter()
+        out = graph.invoke({"question": f"What's the weather in {CITIES[i % len(CITIES)]}?"})
+        latencies.append(time.perf_counter() - t0)
+        errors += bool(out.get("error"))
+    results["graph_weather"] = {**percentiles(latencies), "stages_ms": _per_query(timings, len(questions)), "errors": errors}
+
+    timings.reset()
+    latencies = []
+    for q in questions:
+        t0 = time.perf_counter()
+        answer_from_docs(pdf_path, q + " (agent)")  # distinct from the graph questions: no answer-cache hits
+        latencies.append(time.perf_counter() - t0)
+    results["rag_agent"] = {**percentiles(latencies), "stages_ms": _per_query(timings, len(questions))}
+    return results
+
+
+def run(pages=DEFAULT_PAGES, questions: int = 20, llm_latency_ms: float = 0.0, seed: int = 0) -> dict:
+    """Run the whole benchmark and return the report dict."""
+    timings = Timings()
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "encoder": "hash",
+            "llm_latency_ms": llm_latency_ms,
+            "questions": questions,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "chunk_boundary": CHUNK_BOUNDARY,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "runs": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        with offline_env(workdir, timings, llm_latency_ms / 1000):
+            for n in pages:
+                pdf_path = os.path.join(workdir, f"bench_{n}p.pdf")
+                texts = make_pdf(pdf_path, n, seed=seed)
+                report["runs"][f"{n}p"] = {
+                    "pages": n,
+                    "ingest": bench_ingestion(pdf_path, timings),
+                    "queries": bench_queries(pdf_path, make_questions(texts, questions, seed), timings),
+                }
+    return report
+
+
+# ---------- baseline ----------
+def _flatten(d: dict, prefix: str = "") -> dict:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def _direction(key: str) -> Optional[int]:
+    """+1 if bigger is worse (latency), -1 if bigger is better (throughput), None if not compared."""
+    last = key.rsplit(".", 1)[-1]
+    if last in ("chunks_per_sec", "qps"):
+        return -1
+    if last in ("p50_ms", "p95_ms", "p99_ms", "streaming_s") or ".stages_s." in key:
+        return 1
+    return None
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.25, min_delta_ms: float = 1.0) -> list:
+    """
+    Metrics that got worse than the baseline by more than `tolerance` (relative)
+    and `min_delta_ms` (absolute, so sub-millisecond noise is ignored).
+    """
+    current, base = _flatten(report.get("runs", {})), _flatten(baseline.get("runs", {}))
+    regressions = []
+    for key, value in current.items():
+        direction = _direction(key)
+        if direction is None or key not in base:
+            continue
+        old = base[key]
+        if direction > 0:
+            scale = 1000.0 if key.endswith("_s") or ".stages_s." in key else 1.0
+            worse = value > old * (1 + tolerance) and (value - old) * scale > min_delta_ms
+        else:
+            worse = value < old * (1 - tolerance)
+        if worse:
+            regressions.append({"metric": key, "baseline": old, "current": value,
+                                "change": round((value - old) / old, 3) if old else None})
+    return regressions
+
+
+def _print_report(report: dict, regressions: list):
+    for name, r in report["runs"].items():
+        ing = r["ingest"]
+        print(f"\n== {name}: {r['pages']} pages, {ing['chunks']} chunks ==")
+        print("ingest   " + "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in ing["stages_s"].items())
+              + f"  | streaming={ing['streaming_s'] * 1000:.1f}ms ({ing['chunks_per_sec']} chunks/s)"
+              + f"  cached={ing['cached_ms']:.2f}ms")
+        for qname, q in r["queries"].items():
+            stages = "  ".join(f"{k}={v:.2f}" for k, v in q["stages_ms"].items())
+            print(f"{qname:<14} p50={q['p50_ms']:.2f}ms p95={q['p95_ms']:.2f}ms p99={q['p99_ms']:.2f}ms "
+                  f"qps={q['qps']}  [per query ms: {stages}]")
+    if regressions:
+        print("\nREGRESSIONS vs baseline:")
+        for r in regressions:
+            print(f"  {r['metric']}: {r['baseline']} -> {r['current']} ({r['change']:+.0%})")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline latency benchmark for the RAG / weather graph.")
+    parser.add_argument("--pages", type=int, nargs="+", default=list(DEFAULT_PAGES), help="PDF sizes to generate")
+    parser.add_argument("--questions", type=int, default=20, help="questions per PDF and route")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated LLM call latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with / save to")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--output", help="also write the full report JSON here")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 on regressions")
+    args = parser.parse_args(argv)
+
+    report = run(args.pages, args.questions, args.llm_latency_ms, args.seed)
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+    _print_report(report, regressions)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+    return 1 if regressions and args.strict else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,74 +1,193 @@
 # src/graph/flow.py
 from __future__ import annotations
-from typing import TypedDict, Literal, Optional, List, Dict, Any
+import asyncio
+import json
+import re
+import operator
+import threading
+from typing import Annotated, TypedDict, Literal, Optional, List, Dict, Any
 
-from langgraph.graph import StateGraph, START, END
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
 from src.utils.llm import get_gemini_chat
-from src.agents.wheather_agent import fetch_weather_by_city
-from src.pipelines.embedding_pipeline import ensure_embeddings_upsert
-from src.pipelines.retervial import retrieve_top_k
-from src.utils.pdf_loader import load_pdf_text_chunks
+from src.utils.llm_gateway import get_gateway
+from src.agents.decision_agent import route_question, aroute_question
+from src.agents.wheather_agent import (
+    fetch_weather_by_city, fetch_weather_many, afetch_weather_by_city, afetch_weather_many, split_cities,
+)
+from src.pipelines.ingestion import ensure_pdf_ingested, ingested_record
+from src.pipelines.ingest_jobs import wait_for_job, await_job, submit_ingestion
+from src.pipelines.retervial import retrieve_top_k, aretrieve_top_k, document_scope
+from src.pipelines.context import assemble_context, context_key
 from src.utils.evaluation import evaluate_response
+from src.utils.answer_cache import get_answer_cache, cache_scope
+from src.utils.qdrant_helper import embed_query
+from src.utils.tracing import span, collect, current_trace, estimate_tokens
+from src.graph import speculation
+from config.settings import GEMINI_MODEL, SPECULATIVE_RETRIEVAL, LLM_OUTPUT_TOKENS_ESTIMATE
+
+RAG_TEMPLATE = "Use the context to answer the question concisely.\n\nCONTEXT:\n{context}\n\nQUESTION: {question}"
+
+# ---------- PROMPTS (built once; chains are cached per temperature) ----------
+CLASSIFY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You route questions. Respond with exactly one word: 'weather' if the user asks about weather/temperature/forecast; otherwise 'rag'."),
+    ("human", "{q}")
+])
+WEATHER_PROMPT = ChatPromptTemplate.from_template(
+    "Summarize the following weather info for the user in one sentence.\n{w}"
+)
+RAG_PROMPT = ChatPromptTemplate.from_template(RAG_TEMPLATE)
+
+_PROMPTS = {"classify": CLASSIFY_PROMPT, "weather": WEATHER_PROMPT, "rag": RAG_PROMPT}
+_chains = {}
+_graph = None
+_lock = threading.Lock()
+
+def get_chain(name: str, temperature: float):
+    """prompt | llm for one of _PROMPTS, reusing the pooled client from utils.llm."""
+    llm = get_gemini_chat(temperature=temperature)
+    key = (name, float(temperature), id(llm))  # a swapped client (utils.llm.set_chat_model) gets a new chain
+    chain = _chains.get(key)
+    if chain is None:
+        chain = _PROMPTS[name] | llm
+        _chains[key] = chain  # a racing duplicate is harmless: both wrap the same client
+    return chain
+
+def _llm_span_update(s: dict, name: str, inputs: dict, out):
+    usage = getattr(out, "usage_metadata", None) or {}
+    s["tokens_in"] = usage.get("input_tokens") or estimate_tokens(_PROMPTS[name].format(**inputs))
+    s["tokens_out"] = usage.get("output_tokens") or estimate_tokens(out.content)
+
+def _gateway_args(name: str, chain, inputs: dict) -> dict:
+    # identical prompts to the same client while one is in flight share the call (see utils/llm_gateway.py)
+    prompt = _PROMPTS[name].format(**inputs)
+    return {"key": (name, id(chain), json.dumps(inputs, sort_keys=True, default=str)),
+            "tokens": estimate_tokens(prompt) + LLM_OUTPUT_TOKENS_ESTIMATE}
+
+def _call_llm(name: str, temperature: float, inputs: dict, config: RunnableConfig):
+    with span(f"llm.{name}") as s:
+        chain = get_chain(name, temperature)
+        out = get_gateway().call(lambda: chain.invoke(inputs, config=config), **_gateway_args(name, chain, inputs))
+        _llm_span_update(s, name, inputs, out)
+        return out
+
+async def _acall_llm(name: str, temperature: float, inputs: dict, config: RunnableConfig):
+    with span(f"llm.{name}") as s:
+        chain = get_chain(name, temperature)
+        out = await get_gateway().acall(lambda: chain.ainvoke(inputs, config=config),
+                                        **_gateway_args(name, chain, inputs))
+        _llm_span_update(s, name, inputs, out)
+        return out
 
 # ---------- STATE ----------
 class AppState(TypedDict, total=False):
     question: str              # user question
     pdf_path: Optional[str]    # path to uploaded pdf (for RAG)
+    tenant_id: Optional[str]   # owner of the pdf; None = DEFAULT_TENANT
+    ingest_job: Optional[str]  # background ingestion of pdf_path (see pipelines/ingest_jobs.py)
     mode: Optional[Literal["weather", "rag"]]
+    route: Optional[Dict[str, Any]]  # router decision: action, tier, confidence
+    prefetch_id: Optional[str]  # speculative retrieval started by classify (see graph/speculation.py)
     location: Optional[str]    # extracted location (for weather)
     weather: Optional[Dict[str, Any]]
     rag_hits: Optional[List[Dict[str, Any]]]
     answer: Optional[str]
     sources: Optional[List[Dict[str, Any]]]
+    answer_cached: Optional[bool]  # True if the RAG answer came from the answer cache
+    context_stats: Optional[Dict[str, Any]]  # prompt tokens used / saved by context assembly
     error: Optional[str]
+    trace: Annotated[List[Dict[str, Any]], operator.add]  # spans of every node (see utils/tracing.py)
 
 # ---------- NODE: classify weather vs rag ----------
-def classify_node(state: AppState, config: RunnableConfig) -> AppState:
-    llm = get_gemini_chat(temperature=0.0)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system",
-         "You route questions. Respond with exactly one word: 'weather' if the user asks about weather/temperature/forecast; otherwise 'rag'."),
-        ("human", "{q}")
-    ])
-    chain = prompt | llm
-    out = chain.invoke({"q": state["question"]}, config=config)
-    label = out.content.strip().lower()
-    mode: Literal["weather", "rag"] = "weather" if "weather" in label else "rag"
+def _llm_classify(question: str, config: RunnableConfig) -> str:
+    out = _call_llm("classify", 0.0, {"q": question}, config)
+    return out.content.strip().lower()
+
+async def _allm_classify(question: str, config: RunnableConfig) -> str:
+    out = await _acall_llm("classify", 0.0, {"q": question}, config)
+    return out.content.strip().lower()
+
+def _start_prefetch(state: AppState) -> Optional[str]:
+    # retrieval for an attached PDF overlaps routing; rag takes it, weather drops it
+    if SPECULATIVE_RETRIEVAL and state.get("pdf_path"):
+        return speculation.start(state["pdf_path"], state["question"], tenant_id=state.get("tenant_id"),
+                                 ingest_job=state.get("ingest_job"))
+    return None
+
+def _classify_state(question: str, decision: Dict[str, Any]) -> AppState:
+    mode: Literal["weather", "rag"] = decision["action"]
 
     # simple location heuristic if weather
     loc = None
     if mode == "weather":
-        import re
-        q = state["question"]
-        m = re.search(r"\bin\s+([a-zA-Z\s]+)", q, flags=re.IGNORECASE)
+        m = re.search(r"\bin\s+([a-zA-Z\s]+)", question, flags=re.IGNORECASE)
         if m:
             loc = m.group(1).strip().title()
         else:
             # fallback: last token(s)
-            parts = q.strip().split()
+            parts = question.strip().split()
             if parts:
                 loc = parts[-1].title()
 
-    new_state: AppState = {"mode": mode, "location": loc}
+    new_state: AppState = {"mode": mode, "location": loc, "route": decision}
     return new_state
 
+def classify_node(state: AppState, config: RunnableConfig) -> AppState:
+    prefetch_id = _start_prefetch(state)
+    try:
+        # keyword rules / embedding centroids first; the LLM only when they are unsure
+        decision = route_question(state["question"], llm_classify=lambda q: _llm_classify(q, config))
+    except BaseException:
+        speculation.discard(prefetch_id)  # no rag / weather node will run to take or drop it
+        raise
+    return {**_classify_state(state["question"], decision), "prefetch_id": prefetch_id}
+
+async def aclassify_node(state: AppState, config: RunnableConfig) -> AppState:
+    prefetch_id = _start_prefetch(state)
+    try:
+        decision = await aroute_question(state["question"], llm_classify=lambda q: _allm_classify(q, config))
+    except BaseException:  # includes cancellation (server request timeout)
+        speculation.discard(prefetch_id)
+        raise
+    return {**_classify_state(state["question"], decision), "prefetch_id": prefetch_id}
+
 # ---------- NODE: weather ----------
 def weather_node(state: AppState, config: RunnableConfig) -> AppState:
+    speculation.discard(state.get("prefetch_id"))
     loc = (state.get("location") or "").strip()
     if not loc:
         return {"error": "No location found in the question. Please specify a city/state."}
     try:
-        w = fetch_weather_by_city(loc)
+        cities = split_cities(loc)
+        if len(cities) > 1:
+            # "weather in Pune and Delhi": look the cities up concurrently
+            w = fetch_weather_many(cities)
+            if all("error" in r for r in w.values()):
+                raise RuntimeError("; ".join(f"{c}: {r['error']}" for c, r in w.items()))
+        else:
+            w = fetch_weather_by_city(loc)
         # Optionally format with LLM (LangChain) for nicer answer
-        llm = get_gemini_chat(temperature=0.2)
-        prompt = ChatPromptTemplate.from_template(
-            "Summarize the following weather info for the user in one sentence.\n{w}"
-        )
-        chain = prompt | llm
-        formatted = chain.invoke({"w": w}, config=config).content
+        formatted = _call_llm("weather", 0.2, {"w": w}, config).content
+        return {"weather": w, "answer": formatted}
+    except Exception as e:
+        return {"error": f"Weather fetch failed: {e}"}
+
+async def aweather_node(state: AppState, config: RunnableConfig) -> AppState:
+    speculation.discard(state.get("prefetch_id"))
+    loc = (state.get("location") or "").strip()
+    if not loc:
+        return {"error": "No location found in the question. Please specify a city/state."}
+    try:
+        cities = split_cities(loc)
+        if len(cities) > 1:
+            w = await afetch_weather_many(cities)
+            if all("error" in r for r in w.values()):
+                raise RuntimeError("; ".join(f"{c}: {r['error']}" for c, r in w.items()))
+        else:
+            w = await afetch_weather_by_city(loc)
+        formatted = (await _acall_llm("weather", 0.2, {"w": w}, config)).content
         return {"weather": w, "answer": formatted}
     except Exception as e:
         return {"error": f"Weather fetch failed: {e}"}
@@ -79,39 +198,126 @@ def rag_node(state: AppState, config: RunnableConfig) -> AppState:
     if not pdf_path:
         return {"error": "Please upload a PDF to use RAG."}
     try:
-        # 1) load & embed
-        chunks = load_pdf_text_chunks(pdf_path)
-        ensure_embeddings_upsert(chunks)
-        # 2) retrieve
-        hits = retrieve_top_k(state["question"], top_k=4)
-        context = "\n\n---\n\n".join([h["payload"].get("text", "") for h in hits])
-
-        # 3) answer with LangChain Gemini
-        llm = get_gemini_chat(temperature=0.2)
-        prompt = ChatPromptTemplate.from_template(
-            "Use the context to answer the question concisely.\n\nCONTEXT:\n{context}\n\nQUESTION: {question}"
-        )
-        chain = prompt | llm
-        resp = chain.invoke({"context": context, "question": state["question"]}, config=config)
-        text = resp.content
-
-        # 4) evaluate (LangSmith-ready metrics placeholder)
-        eval_metrics = evaluate_response(state["question"], text, hits)
-
-        return {"rag_hits": hits, "answer": text, "sources": hits}
+        question = state["question"]
+        prefetched = speculation.take(state.get("prefetch_id"))
+        if prefetched:
+            doc, hits = prefetched["doc"], prefetched["hits"]
+            _adopt_spans(prefetched)
+        else:
+            # 1) load & embed (no-op if this exact PDF is already in the manifest),
+            #    or wait for the upload's background ingestion job
+            if state.get("ingest_job"):
+                doc = wait_for_job(state["ingest_job"])
+            else:
+                doc = ensure_pdf_ingested(pdf_path, tenant_id=state.get("tenant_id"))
+            # 2) retrieve, restricted to this document's chunks
+            hits = retrieve_top_k(question, top_k=4, **document_scope(doc))
+
+        # 3) answer cache: same document version + same retrieved chunks + same prompt/model
+        lookup = _cache_lookup(doc, question, hits)
+        if lookup["answer"] is not None:
+            return {"rag_hits": hits, "answer": lookup["answer"], "sources": hits, "answer_cached": True}
+
+        # 4) answer with LangChain Gemini over the de-duplicated, budgeted context
+        ctx = assemble_context(hits)
+        resp = _call_llm("rag", 0.2, {"context": ctx["text"], "question": question}, config)
+        return _rag_answer(question, hits, resp.content, lookup, ctx)
+    except Exception as e:
+        return {"error": f"RAG failed: {e}"}
+
+async def arag_node(state: AppState, config: RunnableConfig) -> AppState:
+    pdf_path = state.get("pdf_path")
+    if not pdf_path:
+        return {"error": "Please upload a PDF to use RAG."}
+    try:
+        question = state["question"]
+        prefetched = await speculation.atake(state.get("prefetch_id"))
+        if prefetched:
+            doc, hits = prefetched["doc"], prefetched["hits"]
+            _adopt_spans(prefetched)
+        else:
+            if state.get("ingest_job"):
+                doc = await await_job(state["ingest_job"])
+            else:
+                # only the manifest check runs on the serving executor; a new PDF is ingested
+                # on the ingestion pool, so a timed-out request does not leave a thread behind
+                doc = await asyncio.to_thread(ingested_record, pdf_path, tenant_id=state.get("tenant_id"))
+                if doc is None:
+                    doc = await await_job(submit_ingestion(pdf_path, tenant_id=state.get("tenant_id")))
+            hits = await aretrieve_top_k(question, top_k=4, **document_scope(doc))
+
+        lookup = await asyncio.to_thread(_cache_lookup, doc, question, hits)
+        if lookup["answer"] is not None:
+            return {"rag_hits": hits, "answer": lookup["answer"], "sources": hits, "answer_cached": True}
+
+        ctx = assemble_context(hits)
+        # tokens of this call are what stream_mode="messages" streams to the UI
+        resp = await _acall_llm("rag", 0.2, {"context": ctx["text"], "question": question}, config)
+        return await asyncio.to_thread(_rag_answer, question, hits, resp.content, lookup, ctx)
     except Exception as e:
         return {"error": f"RAG failed: {e}"}
 
+def _adopt_spans(prefetched: dict):
+    # the speculative retrieval ran on another thread with its own trace
+    trace = current_trace()
+    if trace is not None and prefetched.get("spans"):
+        trace.extend([{**sp, "speculative": True} for sp in prefetched["spans"]])
+
+def _cache_lookup(doc: dict, question: str, hits: list) -> dict:
+    cache = get_answer_cache()
+    scope = cache_scope(doc["sha256"], [h["id"] for h in hits], RAG_TEMPLATE + context_key(), GEMINI_MODEL)
+    qvec = embed_query(question) if cache else None
+    with span("answer_cache.get") as s:
+        answer = cache.get(scope, question, qvec) if cache else None
+        s["cache_hit"] = answer is not None
+    return {"cache": cache, "scope": scope, "qvec": qvec, "answer": answer}
+
+def _rag_answer(question: str, hits: list, text: str, lookup: dict, ctx: dict) -> AppState:
+    if lookup["cache"]:
+        lookup["cache"].put(lookup["scope"], question, text, lookup["qvec"])
+
+    # 5) evaluate (LangSmith-ready metrics placeholder)
+    with span("eval"):
+        eval_metrics = evaluate_response(question, text, hits)
+
+    context_stats = {k: ctx[k] for k in ("tokens", "raw_tokens", "tokens_saved", "dropped")}
+    return {"rag_hits": hits, "answer": text, "sources": hits, "answer_cached": False,
+            "context_stats": context_stats}
+
 # ---------- CONDITIONAL EDGE ----------
 def route(state: AppState) -> Literal["to_weather", "to_rag"]:
     return "to_weather" if state.get("mode") == "weather" else "to_rag"
 
+# ---------- TRACING ----------
+def _traced(name: str, fn):
+    """Run a node inside its own trace and return the recorded spans under "trace"."""
+    def node(state: AppState, config: RunnableConfig) -> AppState:
+        with collect(f"node.{name}") as trace:
+            with span(f"node.{name}"):
+                out = fn(state, config)
+        return {**out, "trace": trace.spans} if trace.spans else out
+    return node
+
+def _atraced(name: str, fn):
+    async def node(state: AppState, config: RunnableConfig) -> AppState:
+        with collect(f"node.{name}") as trace:
+            with span(f"node.{name}"):
+                out = await fn(state, config)
+        return {**out, "trace": trace.spans} if trace.spans else out
+    return node
+
+def _node(name: str, fn, afn) -> RunnableLambda:
+    # each node has a sync and an async body: invoke/stream use the first, ainvoke/astream the second
+    return RunnableLambda(_traced(name, fn), afunc=_atraced(name, afn), name=name)
+
 # ---------- BUILD GRAPH ----------
 def build_graph():
+    from langgraph.graph import StateGraph, START, END  # langgraph is imported with the first graph
+
     graph = StateGraph(AppState)
-    graph.add_node("classify", classify_node)
-    graph.add_node("weather", weather_node)
-    graph.add_node("rag", rag_node)
+    graph.add_node("classify", _node("classify", classify_node, aclassify_node))
+    graph.add_node("weather", _node("weather", weather_node, aweather_node))
+    graph.add_node("rag", _node("rag", rag_node, arag_node))
 
     graph.add_edge(START, "classify")
     graph.add_conditional_edges("classify", route, {"to_weather": "weather", "to_rag": "rag"})
@@ -119,3 +325,38 @@ def build_graph():
     graph.add_edge("rag", END)
 
     return graph.compile()
+
+def get_graph():
+    """The compiled graph, built on first use and shared by every request (nodes keep no state)."""
+    global _graph
+    if _graph is None:
+        with _lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
+
+def warmup() -> dict:
+    """
+    Pay the one-time costs before the first question: compile the graph,
+    load the embedding model and router centroids, create the LLM clients.
+    Returns what was warmed; failures (no API key, no model) are reported, not raised.
+    """
+    from src.utils.encoder import warmup as warmup_encoder
+    from src.agents.decision_agent import _get_centroids
+
+    status = {}
+    get_graph()
+    status["graph"] = True
+    try:
+        warmup_encoder()
+        _get_centroids()
+        status["encoder"] = True
+    except Exception as e:
+        status["encoder"] = f"failed: {e}"
+    try:
+        for name, temperature in (("classify", 0.0), ("weather", 0.2), ("rag", 0.2)):
+            get_chain(name, temperature)
+        status["llm"] = True
+    except Exception as e:
+        status["llm"] = f"failed: {e}"
+    return status
@@ -0,0 +1,165 @@
+# src/graph/speculation.py
+"""
+Speculative retrieval for the RAG path.
+
+When a PDF is attached, the classify node calls `start()` before routing, so
+the query embedding and vector search run on a worker thread while the
+router (embedding tier / LLM) is still deciding. The rag node then `take()`s
+the result instead of retrieving again; the weather node `discard()`s it.
+
+Speculation never ingests or waits for ingestion: it only runs for a
+document that is already in the manifest (or whose upload job is done), so
+a prefetch is one retrieval. The pool has SERVER_WORKERS threads, and a
+prefetch still queued when the rag node gets to it is cancelled and the
+node retrieves inline instead of waiting behind other requests.
+
+`speculation_stats()` compares the cost and the benefit:
+  - saved_s:  retrieval time that overlapped routing (latency hidden from rag questions)
+  - wasted_s: retrieval time spent for questions that went to weather
+  - skipped:  prefetches that found the document not ingested yet
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from src.pipelines.ingestion import ingested_record
+from src.pipelines.ingest_jobs import job_status, wait_for_job
+from src.pipelines.retervial import retrieve_top_k, document_scope
+from src.utils.tracing import collect
+from config.settings import SERVER_WORKERS
+
+_pending = {}  # prefetch id -> Future of {"doc", "hits", "seconds", "spans"}
+_executor = None
+_lock = threading.Lock()
+_stats = {"started": 0, "used": 0, "failed": 0, "skipped": 0, "discarded": 0, "cancelled": 0,
+          "saved_s": 0.0, "waited_s": 0.0, "wasted_s": 0.0}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(SERVER_WORKERS, 1), thread_name_prefix="prefetch")
+    return _executor
+
+
+def set_workers(workers: int):
+    """Resize the prefetch pool to the graph runs a server admits at once (prefetches already queued still run)."""
+    global _executor
+    with _lock:
+        previous, _executor = _executor, ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="prefetch")
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def _add(**deltas):
+    with _lock:
+        for k, v in deltas.items():
+            _stats[k] += v
+
+
+def _prefetch(pdf_path: str, question: str, top_k: int, tenant_id: str, ingest_job: str):
+    t0 = time.perf_counter()
+    with collect() as trace:  # handed to the rag node's trace by take()'s caller
+        if ingest_job:
+            doc = wait_for_job(ingest_job)  # done when start() checked it
+        else:
+            doc = ingested_record(pdf_path, tenant_id=tenant_id)
+            if doc is None:
+                return None  # not ingested yet: the rag node ingests
+        hits = retrieve_top_k(question, top_k=top_k, **document_scope(doc))
+    return {"doc": doc, "hits": hits, "seconds": time.perf_counter() - t0, "spans": trace.spans}
+
+
+def start(pdf_path: str, question: str, top_k: int = 4, tenant_id: str = None, ingest_job: str = None):
+    """
+    Begin retrieval in the background; returns the id to take() / discard() it
+    with, or None while the upload's ingestion job is still running.
+    """
+    if ingest_job and (job_status(ingest_job) or {}).get("state") != "done":
+        return None
+    prefetch_id = uuid.uuid4().hex
+    future = _get_executor().submit(_prefetch, pdf_path, question, top_k, tenant_id, ingest_job)
+    with _lock:
+        _pending[prefetch_id] = future
+        _stats["started"] += 1
+    return prefetch_id
+
+
+def _pop(prefetch_id):
+    if not prefetch_id:
+        return None
+    with _lock:
+        return _pending.pop(prefetch_id, None)
+
+
+def _result(future, waited: float):
+    try:
+        result = future.result()
+    except Exception:
+        _add(failed=1)
+        return None  # the caller retrieves inline
+    if result is None:
+        _add(skipped=1)
+        return None
+    _add(used=1, waited_s=waited, saved_s=max(result["seconds"] - waited, 0.0))
+    return result
+
+
+def _cancel(future) -> bool:
+    # True if it had not started yet: nothing was spent on it
+    if future.cancel():
+        _add(cancelled=1)
+        return True
+    return False
+
+
+def take(prefetch_id):
+    """
+    Result of a speculative retrieval ({"doc", "hits", "seconds"}), or None if
+    there is none / it failed / it had not started (still queued behind other
+    requests' prefetches: retrieving inline beats waiting).
+    """
+    future = _pop(prefetch_id)
+    if future is None or _cancel(future):
+        return None
+    t0 = time.perf_counter()
+    future.exception()  # wait
+    return _result(future, time.perf_counter() - t0)
+
+
+async def atake(prefetch_id):
+    future = _pop(prefetch_id)
+    if future is None or _cancel(future):
+        return None
+    t0 = time.perf_counter()
+    await asyncio.wait([asyncio.wrap_future(future)])
+    return _result(future, time.perf_counter() - t0)
+
+
+def _count_waste(future):
+    if not future.cancelled() and future.exception() is None and future.result() is not None:
+        _add(wasted_s=future.result()["seconds"])
+
+
+def discard(prefetch_id):
+    """The question was not a rag question: drop the speculative work (cancel it if not started)."""
+    future = _pop(prefetch_id)
+    if future is None:
+        return
+    if not _cancel(future):
+        _add(discarded=1)
+        future.add_done_callback(_count_waste)
+
+
+def speculation_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    stats["pending"] = len(_pending)
+    for k in ("saved_s", "waited_s", "wasted_s"):
+        stats[k] = round(stats[k], 4)
+    return stats
@@ -0,0 +1,119 @@
+# src/graph/streaming.py
+"""
+Stream the answer out of the compiled graph as the LLM produces it.
+
+`astream_answer` (async) and `stream_answer` (sync) run the graph with
+stream_mode=["messages", "values"] and yield events:
+  {"type": "token", "node": "weather"|"rag", "text": str}
+  {"type": "final", "state": AppState, "metrics": {"ttft_ms", "total_ms", "tokens", "streamed"}}
+Only tokens of the answer nodes are forwarded (the router's LLM call is not
+part of the answer). A cached answer arrives as a single token event.
+
+Time-to-first-token is the headline latency: the time from the call to the
+first answer text the user can see. `latency_stats()` reports p50/p95 over
+the last requests.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from src.graph.flow import get_graph
+
+ANSWER_NODES = ("weather", "rag")
+
+_latencies = deque(maxlen=1000)  # (ttft_s, total_s)
+_lock = threading.Lock()
+
+
+def _text(chunk) -> str:
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    # some chat models stream a list of content parts
+    return "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+
+
+class _Run:
+    """Turns raw (mode, payload) stream items into token / final events and times them."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.tokens = 0
+        self.state = {}
+
+    def on_item(self, mode, payload):
+        if mode == "values":
+            self.state = payload
+            return None
+        chunk, meta = payload
+        node = meta.get("langgraph_node")
+        text = _text(chunk)
+        if node not in ANSWER_NODES or not text:
+            return None
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.tokens += 1
+        return {"type": "token", "node": node, "text": text}
+
+    def finish(self):
+        events = []
+        streamed = self.tokens > 0
+        answer = self.state.get("answer")
+        if not streamed and answer:
+            # cached answer (or a model that does not stream): deliver it whole
+            self.first_token = time.perf_counter()
+            events.append({"type": "token", "node": self.state.get("mode"), "text": answer})
+        end = time.perf_counter()
+        ttft = (self.first_token or end) - self.start
+        with _lock:
+            _latencies.append((ttft, end - self.start))
+        metrics = {
+            "ttft_ms": round(ttft * 1000, 1),
+            "total_ms": round((end - self.start) * 1000, 1),
+            "tokens": self.tokens,
+            "streamed": streamed,
+        }
+        events.append({"type": "final", "state": self.state, "metrics": metrics})
+        return events
+
+
+async def astream_answer(state: dict, config: dict = None, graph=None):
+    """Async generator of token / final events for one question."""
+    graph = graph or get_graph()
+    run = _Run()
+    async for mode, payload in graph.astream(state, config=config, stream_mode=["messages", "values"]):
+        event = run.on_item(mode, payload)
+        if event:
+            yield event
+    for event in run.finish():
+        yield event
+
+
+def stream_answer(state: dict, config: dict = None, graph=None):
+    """Sync counterpart of astream_answer (runs the sync node bodies)."""
+    graph = graph or get_graph()
+    run = _Run()
+    for mode, payload in graph.stream(state, config=config, stream_mode=["messages", "values"]):
+        event = run.on_item(mode, payload)
+        if event:
+            yield event
+    yield from run.finish()
+
+
+def latency_stats() -> dict:
+    with _lock:
+        samples = np.array(_latencies, dtype=np.float64).reshape(-1, 2)
+    if not len(samples):
+        return {"count": 0}
+    ttft, total = samples[:, 0] * 1000, samples[:, 1] * 1000
+    return {
+        "count": len(samples),
+        "ttft_p50_ms": round(float(np.percentile(ttft, 50)), 1),
+        "ttft_p95_ms": round(float(np.percentile(ttft, 95)), 1),
+        "total_p50_ms": round(float(np.percentile(total, 50)), 1),
+        "total_p95_ms": round(float(np.percentile(total, 95)), 1),
+    }
@@ -0,0 +1,156 @@
+# src/pipelines/context.py
+"""
+Assemble the prompt context from retrieved hits.
+
+Joining the top-k payloads as-is repeats text: neighbouring chunks share
+CHUNK_OVERLAP words and a re-ingested document can return the same passage
+twice. `assemble_context`:
+  1. drops near-duplicate hits (word-shingle Jaccard >= CONTEXT_DEDUP_THRESHOLD),
+     keeping the higher-scored one
+  2. merges chunks of the same document whose spans overlap or touch into one
+     passage (the shared words appear once)
+  3. packs passages in score order until CONTEXT_TOKEN_BUDGET is reached
+and reports the prompt tokens saved compared with the plain join.
+"""
+
+from typing import Dict, List
+
+from src.utils.tracing import span, estimate_tokens
+from config.settings import CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD
+
+SEPARATOR = "\n\n---\n\n"
+CONTEXT_VERSION = 1
+
+
+def context_key(token_budget: int = CONTEXT_TOKEN_BUDGET,
+                dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> str:
+    """Identifies the assembly settings (part of the answer-cache scope)."""
+    return f"context.v{CONTEXT_VERSION}:{token_budget}:{dedup_threshold}"
+
+
+def _shingles(words: list, n: int = 3) -> set:
+    if len(words) < n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _word_overlap(a: list, b: list) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b`."""
+    if not a or not b:
+        return 0
+    first = b[0]
+    for k in range(min(len(a), len(b)), 0, -1):
+        if a[-k] == first and a[-k:] == b[:k]:
+            return k
+    return 0
+
+
+def _start(meta: dict):
+    if meta.get("page") is None or meta.get("offset") is None:
+        return None
+    return (meta["page"], meta["offset"])
+
+
+def _end(meta: dict):
+    if meta.get("page_end") is None or meta.get("offset_end") is None:
+        return None
+    return (meta["page_end"], meta["offset_end"])
+
+
+def _passage(hit: dict) -> dict:
+    payload = hit.get("payload") or {}
+    text = payload.get("text", "")
+    return {
+        "ids": [hit.get("id")],
+        "score": hit.get("score") or 0.0,
+        "document_id": payload.get("document_id"),
+        "start": _start(payload),
+        "end": _end(payload),
+        "words": text.split(),
+    }
+
+
+def _dedupe(passages: List[dict], threshold: float) -> List[dict]:
+    kept, kept_shingles = [], []
+    for p in sorted(passages, key=lambda p: -p["score"]):
+        sh = _shingles([w.lower() for w in p["words"]])
+        if any(len(sh & other) / max(len(sh | other), 1) >= threshold for other in kept_shingles):
+            continue
+        kept.append(p)
+        kept_shingles.append(sh)
+    return kept
+
+
+def _merge(passages: List[dict]) -> List[dict]:
+    """Merge same-document passages that overlap or are contiguous, in document order."""
+    by_doc: Dict[object, List[dict]] = {}
+    for p in passages:
+        by_doc.setdefault(p["document_id"], []).append(p)
+
+    merged = []
+    for group in by_doc.values():
+        positioned = sorted((p for p in group if p["start"] is not None), key=lambda p: p["start"])
+        merged.extend(p for p in group if p["start"] is None)
+        current = None
+        for p in positioned:
+            if current is not None and current["end"] is not None and p["start"] <= current["end"]:
+                k = _word_overlap(current["words"], p["words"])
+                current["words"] = current["words"] + p["words"][k:]
+                current["ids"] += p["ids"]
+                current["score"] = max(current["score"], p["score"])
+                current["end"] = max(current["end"], p["end"]) if p["end"] is not None else current["end"]
+                continue
+            if current is not None:
+                merged.append(current)
+            current = dict(p)
+        if current is not None:
+            merged.append(current)
+    return merged
+
+
+def assemble_context(hits: list, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                     dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> dict:
+    """
+    Returns:
+      - 'text': context for the prompt (passages joined by SEPARATOR)
+      - 'passages': [{"ids", "score", "document_id", "text"}] in the order packed
+      - 'tokens' / 'raw_tokens' / 'tokens_saved': estimated prompt tokens
+        for the assembled vs. the plain joined context
+      - 'dropped': hit ids left out (duplicates or over budget)
+    """
+    with span("context") as s:
+        ctx = _assemble(hits, token_budget, dedup_threshold)
+        s.update(items=len(ctx["passages"]), tokens=ctx["tokens"], tokens_saved=ctx["tokens_saved"])
+        return ctx
+
+
+def _assemble(hits: list, token_budget: int, dedup_threshold: float) -> dict:
+    raw_text = SEPARATOR.join((h.get("payload") or {}).get("text", "") for h in hits)
+    passages = _merge(_dedupe([_passage(h) for h in hits], dedup_threshold))
+    passages.sort(key=lambda p: -p["score"])
+
+    packed, used = [], 0
+    sep_tokens = estimate_tokens(SEPARATOR)
+    for p in passages:
+        text = " ".join(p["words"])
+        cost = estimate_tokens(text) + (sep_tokens if packed else 0)
+        if token_budget and used + cost > token_budget:
+            if packed:
+                continue  # a smaller, lower-scored passage may still fit
+            # always keep (the start of) the best passage
+            text = text[: max(token_budget, 1) * 4].rsplit(" ", 1)[0]
+            cost = estimate_tokens(text)
+        packed.append({"ids": p["ids"], "score": p["score"], "document_id": p["document_id"], "text": text})
+        used += cost
+
+    text = SEPARATOR.join(p["text"] for p in packed)
+    kept_ids = {i for p in packed for i in p["ids"]}
+    raw_tokens, tokens = estimate_tokens(raw_text), estimate_tokens(text)
+    return {
+        "text": text,
+        "passages": packed,
+        "tokens": tokens,
+        "raw_tokens": raw_tokens,
+        "tokens_saved": max(raw_tokens - tokens, 0),
+        "dropped": [h.get("id") for h in hits if h.get("id") not in kept_ids],
+    }
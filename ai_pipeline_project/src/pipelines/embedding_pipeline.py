@@ -2,52 +2,154 @@
 """
 Create embeddings for text chunks and upsert to Qdrant.
 This example uses sentence-transformers locally (stable & free).
+
+Ingestion streams: chunks are encoded in batches of EMBED_BATCH_SIZE and each
+batch is upserted on a background thread while the next one is encoded.
+At most one batch is encoding and one is in flight, so memory stays flat no
+matter how large the document is. Vectors stay float32 numpy arrays until the
+request to the vector store is built.
+
+Every batch is looked up in the persistent embedding cache first
+(utils/embedding_cache.py, keyed by model + text hash); only texts never
+encoded before reach the model, so re-ingesting a revised document or
+rebuilding a collection is mostly a read of cached vectors.
 """
 
-from sentence_transformers import SentenceTransformer
-from src.utils.qdrant_helper import upsert_documents, collection_exists, create_collection
-from config.settings import EMBEDDING_MODEL, QDRANT_COLLECTION
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from src.utils.encoder import get_encoder
+from src.utils.embedding_cache import get_embedding_cache, text_key
+from src.utils.qdrant_helper import upsert_batch, create_collection
+from src.utils.pdf_loader import chunk_id
+from src.utils.tracing import span
+from config.settings import QDRANT_COLLECTION, EMBED_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize_chunks(chunks, document_id: str):
+    """Yield {"id","text","meta"} dicts from strings / dicts / anything str()-able."""
+    for c in chunks:
+        if isinstance(c, str):
+            yield {"id": chunk_id(document_id, c), "text": c}
+        elif isinstance(c, dict):
+            text = c.get("text", "")
+            yield {"id": c.get("id") or chunk_id(document_id, text), "text": text, "meta": c.get("meta", {})}
+        else:
+            yield {"id": chunk_id(document_id, str(c)), "text": str(c)}
+
+
+def _batched(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _encode_model(texts: list, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    with span("embed", items=len(texts), bytes=sum(len(t) for t in texts)):
+        model = get_encoder()
+        vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+        return vectors.astype(np.float32, copy=False)
+
 
-_model = None
+def _encode(texts: list, batch_size: int = EMBED_BATCH_SIZE) -> np.ndarray:
+    """Vectors for texts: cached rows from the embedding cache, the rest from the model (then cached)."""
+    cache = get_embedding_cache()
+    if cache is None or not texts:
+        return _encode_model(texts, batch_size)
+    keys = [text_key(t) for t in texts]
+    with span("embed.cache", items=len(texts)) as s:
+        vectors, missing = cache.get_many(keys)
+        s["hits"] = len(texts) - len(missing)
+    if not missing:
+        return vectors
+    fresh = _encode_model([texts[i] for i in missing], batch_size)
+    cache.put_many([keys[i] for i in missing], fresh)
+    if vectors is None or vectors.shape[1] != fresh.shape[1]:
+        # empty cache, or the model's dimension changed: cached rows are unusable
+        return fresh if len(missing) == len(texts) else _encode_model(texts, batch_size)
+    vectors[missing] = fresh
+    return vectors
 
-def _get_model():
-    global _model
-    if _model is None:
-        _model = SentenceTransformer(EMBEDDING_MODEL)
-    return _model
 
 def chunks_to_embeddings(docs: list):
     """
     docs = list of {"id": str, "text": str, "meta": {...}}
-    returns list of {"id": id, "vector": [...], "payload": {...}}
+    returns list of {"id": id, "vector": float32 ndarray, "payload": {...}}
     """
-    model = _get_model()
-    texts = [d["text"] for d in docs]
-    vectors = model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
-    results = []
-    for d, vec in zip(docs, vectors):
-        results.append({"id": d["id"], "vector": vec.tolist(), "payload": {"text": d["text"], **(d.get("meta") or {})}})
-    return results
+    with span("chunks_to_embeddings", items=len(docs)):
+        vectors = _encode([d["text"] for d in docs])
+        results = []
+        for d, vec in zip(docs, vectors):
+            results.append({"id": d["id"], "vector": vec, "payload": {"text": d["text"], **(d.get("meta") or {})}})
+        return results
 
-def ensure_embeddings_upsert(chunks: list):
+
+def iter_embedding_batches(docs, batch_size: int = EMBED_BATCH_SIZE):
     """
-    chunks: list of strings OR list of dicts {"id","text"}.
-    This will create collection if not exists and upsert vectors.
+    docs: any iterable of {"id","text","meta"} (a generator is fine).
+    Yields {"ids": [...], "vectors": float32 ndarray (n, dim), "payloads": [...]} per batch.
     """
-    # normalize
-    docs = []
-    for i, c in enumerate(chunks):
-        if isinstance(c, str):
-            docs.append({"id": f"doc_{i}", "text": c})
-        elif isinstance(c, dict):
-            docs.append({"id": c.get("id", f"doc_{i}"), "text": c.get("text", ""), "meta": c.get("meta", {})})
-        else:
-            docs.append({"id": f"doc_{i}", "text": str(c)})
+    for batch in _batched(docs, batch_size):
+        yield {
+            "ids": [d["id"] for d in batch],
+            "vectors": _encode([d["text"] for d in batch], batch_size),
+            "payloads": [{"text": d["text"], **(d.get("meta") or {})} for d in batch],
+        }
+
+
+def stream_embeddings_upsert(chunks, document_id: str = "adhoc", batch_size: int = EMBED_BATCH_SIZE,
+                             on_progress=None) -> dict:
+    """
+    Encode + upsert `chunks` (list or generator) batch by batch.
+    Upsert of batch N overlaps with encoding of batch N+1.
+    on_progress(stats) is called after every batch with running totals.
+    Returns {"chunks", "batches", "seconds", "chunks_per_sec"}.
+    """
+    started = time.perf_counter()
+    stats = {"chunks": 0, "batches": 0, "seconds": 0.0, "chunks_per_sec": 0.0}
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="upsert") as pool:
+        pending = None
+        for batch in iter_embedding_batches(_normalize_chunks(chunks, document_id), batch_size):
+            if not stats["batches"]:
+                # sized from the model's actual output; a no-op (plus a dimension check) if it exists
+                create_collection(QDRANT_COLLECTION, batch["vectors"].shape[1])
+            # wait for the previous upsert before queueing another: bounds memory to ~2 batches
+            if pending is not None:
+                pending.result()
+            # copy_context: the upsert span joins the caller's trace
+            pending = pool.submit(contextvars.copy_context().run, upsert_batch,
+                                  QDRANT_COLLECTION, batch["ids"], batch["vectors"], batch["payloads"])
+
+            stats["chunks"] += len(batch["ids"])
+            stats["batches"] += 1
+            stats["seconds"] = time.perf_counter() - started
+            stats["chunks_per_sec"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+            if on_progress is not None:
+                on_progress(dict(stats))
+        if pending is not None:
+            pending.result()
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["chunks_per_sec"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+    logger.info("ingested %d chunks in %d batches (%.1f chunks/s)",
+                stats["chunks"], stats["batches"], stats["chunks_per_sec"])
+    return stats
 
-    # create collection if needed
-    if not collection_exists(QDRANT_COLLECTION):
-        create_collection(QDRANT_COLLECTION)
 
-    # prepare vectors
-    items = chunks_to_embeddings(docs)
-    upsert_documents(QDRANT_COLLECTION, items)
+def ensure_embeddings_upsert(chunks, document_id: str = "adhoc", on_progress=None) -> dict:
+    """
+    chunks: list (or generator) of strings OR dicts {"id","text"}.
+    This will create collection if not exists and upsert vectors.
+    Chunks without an id get a deterministic one from (document_id, text).
+    """
+    return stream_embeddings_upsert(chunks, document_id=document_id, on_progress=on_progress)
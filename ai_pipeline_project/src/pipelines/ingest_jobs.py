@@ -0,0 +1,178 @@
+# src/pipelines/ingest_jobs.py
+"""
+Uploads and background ingestion, off the question path.
+
+  - `store_upload` writes an uploaded PDF once, under its content hash
+    (UPLOAD_DIR/ab/abcdef....pdf): two users uploading different
+    "report.pdf" files get two files, re-uploads and reruns write nothing
+  - `submit_ingestion` queues `ensure_pdf_ingested` on a small worker pool
+    (INGEST_WORKERS) and returns a job id; the same file for the same
+    tenant / document id maps to the same job. Jobs for different documents
+    ingest in parallel (ingestion only serializes per document)
+  - `job_status` / `list_jobs` report progress; `wait_for_job` /
+    `await_job` return the manifest record once the job is done
+  - past MAX_JOBS the oldest finished jobs are dropped; the ids of dropped
+    done jobs (up to MAX_PRUNED) still resolve, from the ingestion manifest
+
+The graph takes the job id in the state ("ingest_job"): the first question
+after an upload waits for that job only, later ones get the finished
+record without touching the PDF.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src.pipelines.ingestion import ensure_pdf_ingested
+from src.utils.tracing import span
+from config.settings import UPLOAD_DIR, INGEST_WORKERS, DEFAULT_TENANT
+
+MAX_JOBS = 1000  # finished jobs kept for status queries
+MAX_PRUNED = 10 * MAX_JOBS  # dropped done jobs whose ids still resolve
+
+_jobs = {}      # job id -> status dict
+_futures = {}   # job id -> Future of the manifest record
+_by_key = {}    # (file, tenant, document id) -> job id
+_pruned = OrderedDict()  # job id -> status of a done job dropped from _jobs, oldest first
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(INGEST_WORKERS, 1), thread_name_prefix="ingest")
+    return _executor
+
+
+def store_upload(data: bytes, filename: str, document_id: str = None) -> dict:
+    """
+    Persist uploaded bytes content-addressed. Returns {"path", "sha256", "name", "document_id"}.
+    document_id defaults to "name@hash", which keeps same-named uploads from
+    different users apart, but makes every revision a new document: the old
+    version's chunks stay and nothing is diffed. Callers that upload revisions
+    of one document pass a stable document_id instead; a new content under it
+    is then ingested incrementally and replaces the previous version.
+    """
+    sha = hashlib.sha256(data).hexdigest()
+    directory = os.path.join(UPLOAD_DIR, sha[:2])
+    path = os.path.join(directory, f"{sha}.pdf")
+    with span("upload.store", bytes=len(data)) as s:
+        s["cache_hit"] = os.path.exists(path)
+        if not s["cache_hit"]:
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)  # concurrent writers of the same content race harmlessly
+    name = os.path.basename(filename or "upload.pdf")
+    return {"path": path, "sha256": sha, "name": name, "document_id": document_id or f"{name}@{sha[:12]}"}
+
+
+def _run(job: dict, future: Future):
+    # the job's future is ours, not the executor's: once running, no waiter can cancel it
+    if not future.set_running_or_notify_cancel():
+        job.update(state="cancelled", finished_at=time.time())
+        _prune()
+        return
+    job.update(state="running", started_at=time.time())
+    try:
+        record = ensure_pdf_ingested(job["pdf_path"], document_id=job["document_id"], tenant_id=job["tenant_id"])
+    except Exception as e:
+        job.update(state="failed", error=str(e), finished_at=time.time())
+        _prune()  # before waking the waiters, so they see the pruned table
+        future.set_exception(e)
+        return
+    job.update(state="done", finished_at=time.time(), document_id=record["document_id"],
+               result={k: record[k] for k in ("cached", "added", "removed", "moved")})
+    _prune()
+    future.set_result(record)
+
+
+def _prune():
+    with _lock:
+        finished = [j for j in _jobs.values() if j["state"] in ("done", "failed", "cancelled")]
+        for job in sorted(finished, key=lambda j: j["finished_at"])[:max(len(_jobs) - MAX_JOBS, 0)]:
+            del _jobs[job["id"]]
+            _futures.pop(job["id"], None)
+            _by_key.pop(job["key"], None)
+            if job["state"] == "done":
+                _pruned[job["id"]] = {k: v for k, v in job.items() if k != "key"}
+        while len(_pruned) > MAX_PRUNED:
+            _pruned.popitem(last=False)
+
+
+def submit_ingestion(pdf_path: str, document_id: str = None, tenant_id: str = None, sha256: str = None) -> str:
+    """Queue ingestion of pdf_path; returns the job id (an existing one if this file is already queued / done)."""
+    tenant_id = tenant_id or DEFAULT_TENANT
+    key = (sha256 or os.path.abspath(pdf_path), tenant_id, document_id)
+    executor = _get_executor()
+    with _lock:
+        job_id = _by_key.get(key)
+        if job_id is not None and _jobs[job_id]["state"] not in ("failed", "cancelled"):
+            return job_id
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "key": key, "state": "queued", "pdf_path": pdf_path,
+               "document_id": document_id, "tenant_id": tenant_id, "submitted_at": time.time(),
+               "started_at": None, "finished_at": None, "error": None, "result": None}
+        _jobs[job_id] = job
+        _by_key[key] = job_id
+        future = _futures[job_id] = Future()
+        executor.submit(_run, job, future)
+    return job_id
+
+
+def job_status(job_id: str):
+    """{"id", "state": queued|running|done|failed|cancelled, "document_id", "tenant_id", timestamps, "error", "result"} or None."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return dict(_pruned[job_id]) if job_id in _pruned else None
+        return {k: v for k, v in job.items() if k != "key"}
+
+
+def list_jobs(state: str = None) -> list:
+    with _lock:
+        jobs = [{k: v for k, v in j.items() if k != "key"} for j in _jobs.values()]
+    if state is not None:
+        jobs = [j for j in jobs if j["state"] == state]
+    return sorted(jobs, key=lambda j: j["submitted_at"], reverse=True)
+
+
+def _lookup(job_id: str):
+    """(future, None) for a job still tracked, (None, status) for a done job already pruned."""
+    with _lock:
+        future, pruned = _futures.get(job_id), _pruned.get(job_id)
+    if future is None and pruned is None:
+        raise KeyError(f"Unknown ingestion job '{job_id}'")
+    return future, pruned
+
+
+def _reload(job: dict) -> dict:
+    # the document of a done job is in the manifest: this is a lookup, not a re-ingest
+    return ensure_pdf_ingested(job["pdf_path"], document_id=job["document_id"], tenant_id=job["tenant_id"])
+
+
+def wait_for_job(job_id: str, timeout: float = None) -> dict:
+    """Manifest record of the job's document, blocking until it is ingested; re-raises a failure."""
+    future, pruned = _lookup(job_id)
+    with span("ingest.wait", ready=future is None or future.done()):
+        if future is None:
+            return _reload(pruned)
+        return future.result(timeout)
+
+
+async def await_job(job_id: str) -> dict:
+    future, pruned = _lookup(job_id)
+    with span("ingest.wait", ready=future is None or future.done()):
+        if future is None:
+            return await asyncio.to_thread(_reload, pruned)
+        # shielded: a cancelled waiter (request timeout, client gone) must not cancel the shared job
+        return await asyncio.shield(asyncio.wrap_future(future))
@@ -0,0 +1,280 @@
+# src/pipelines/ingestion.py
+"""
+Ingest a PDF into the vector store at most once.
+
+A small JSON manifest records, per document id, which version of the
+document (content hash + chunking params + embedding model + collection) is
+currently in the collection and which chunk ids it produced. The question
+path calls `ensure_pdf_ingested`, which is a cheap hash + lookup on a hit.
+
+On a miss (new document or a revised upload of a known one) the PDF is
+streamed page by page into the chunker and diffed against the recorded chunk
+ids as chunks come out: only new chunks go on to be embedded and upserted
+(while later pages are still being parsed), and chunks that disappeared are
+deleted at the end. Chunk ids are deterministic (see `pdf_loader.chunk_id`),
+so unchanged text keeps its id; if such a chunk moved (other page / offset)
+only its payload is patched.
+The manifest lives on disk so it survives process restarts.
+
+`_lock` only guards the in-memory manifest (reads, the record swap, the
+save). Parsing, embedding and store calls run outside it, under a lock per
+document key: two ingests of one document run one after the other, while
+other documents ingest in parallel and manifest hits never wait.
+
+Documents belong to a tenant (DEFAULT_TENANT unless given). Every chunk's
+payload carries "document_id" and "tenant_id", both payload-indexed, so
+retrieval can be scoped to one tenant / a set of documents. Manifest entries
+and chunk ids use `pdf_loader.document_key`, so the same file name under two
+tenants is two separate documents. `list_documents`, `delete_document` and
+`reingest_document` manage the lifecycle.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+from src.utils.pdf_loader import iter_pdf_text_chunks, document_key, CHUNKER_VERSION
+from src.utils.qdrant_helper import collection_exists, delete_points, update_payloads
+from src.pipelines.embedding_pipeline import ensure_embeddings_upsert
+from src.utils.tracing import span
+from config.settings import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    CHUNK_BOUNDARY,
+    EMBEDDING_MODEL,
+    QDRANT_COLLECTION,
+    INGEST_MANIFEST_PATH,
+    DEFAULT_TENANT,
+)
+
+_lock = threading.Lock()
+_manifest = None
+_document_locks = {}  # document key -> [lock, holders + waiters]
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in blocks so large PDFs are not loaded at once."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def manifest_key(content_hash: str, chunk_size: int, overlap: int,
+                 model: str = EMBEDDING_MODEL, collection: str = QDRANT_COLLECTION) -> str:
+    chunker = f"{CHUNK_BOUNDARY}.v{CHUNKER_VERSION}"
+    return f"{content_hash}:{chunk_size}:{overlap}:{chunker}:{model}:{collection}"
+
+
+def _load_manifest() -> dict:
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(INGEST_MANIFEST_PATH, "r", encoding="utf-8") as f:
+                _manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            _manifest = {}
+        _manifest.setdefault("documents", {})
+    return _manifest
+
+
+def _save_manifest():
+    # write to a temp file and swap so a crash never leaves a half-written manifest
+    os.makedirs(os.path.dirname(INGEST_MANIFEST_PATH) or ".", exist_ok=True)
+    tmp_path = f"{INGEST_MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_manifest, f)
+    os.replace(tmp_path, INGEST_MANIFEST_PATH)
+
+
+def _record(doc_key: str):
+    with _lock:
+        return _load_manifest()["documents"].get(doc_key)
+
+
+@contextlib.contextmanager
+def _document_lock(doc_key: str):
+    """Serialize ingestion / deletion of one document key; dropped once nobody holds or waits."""
+    with _lock:
+        entry = _document_locks.setdefault(doc_key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _document_locks[doc_key]
+
+
+def lookup(document_id: str, content_hash: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+           tenant_id: str = None):
+    """Manifest record if exactly this version of the document is ingested, else None."""
+    record = _record(document_key(document_id, tenant_id))
+    if record and record["key"] == manifest_key(content_hash, chunk_size, overlap):
+        return record
+    return None
+
+
+def ingested_record(pdf_path: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                    document_id: str = None, tenant_id: str = None):
+    """What `ensure_pdf_ingested` returns if this version of the PDF is already stored, else None; never ingests."""
+    doc_key = document_key(document_id or os.path.basename(pdf_path), tenant_id or DEFAULT_TENANT)
+    return _cached(_record(doc_key), manifest_key(file_sha256(pdf_path), chunk_size, overlap), False)
+
+
+def ensure_pdf_ingested(pdf_path: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                        document_id: str = None, tenant_id: str = None, force: bool = False) -> dict:
+    """
+    Make sure the current version of the PDF is in the collection.
+    document_id defaults to the file name; a different file content under the
+    same id is treated as a revision and ingested incrementally.
+    tenant_id defaults to DEFAULT_TENANT. force=True re-embeds every chunk
+    even if the manifest says this version is already stored.
+
+    Returns the manifest record plus:
+      - 'cached': True if nothing had to be done
+      - 'added' / 'removed' / 'moved': chunks upserted / deleted / payload-patched by this call
+    """
+    with span("ingest") as s:
+        result = _ensure_pdf_ingested(pdf_path, chunk_size, overlap, document_id,
+                                      tenant_id or DEFAULT_TENANT, force)
+        s.update(cache_hit=result["cached"], items=result["added"],
+                 removed=result["removed"], moved=result["moved"])
+        return result
+
+
+def _ensure_pdf_ingested(pdf_path: str, chunk_size: int, overlap: int, document_id: str,
+                         tenant_id: str, force: bool) -> dict:
+    document_id = document_id or os.path.basename(pdf_path)
+    doc_key = document_key(document_id, tenant_id)
+    content_hash = file_sha256(pdf_path)
+    key = manifest_key(content_hash, chunk_size, overlap)
+
+    hit = _cached(_record(doc_key), key, force)
+    if hit is not None:
+        return hit
+    with _document_lock(doc_key):
+        # re-read: another caller may have ingested this version while we waited
+        previous = _record(doc_key)
+        hit = _cached(previous, key, force)
+        if hit is not None:
+            return hit
+        # the manifest may outlive the collection (e.g. a fresh Qdrant container)
+        stored = previous is not None and collection_exists(QDRANT_COLLECTION)
+        # records written before tenancy have points without "tenant_id": patch them below
+        legacy = previous is not None and "tenant_id" not in previous
+
+        # diff against what this document already has in the same collection / model
+        if stored and previous["model"] == EMBEDDING_MODEL and previous["collection"] == QDRANT_COLLECTION:
+            previous_ids = previous["chunk_ids"]
+            old_locations = dict(zip(previous_ids, previous.get("locations") or [None] * len(previous_ids)))
+        else:
+            previous_ids, old_locations = [], {}
+        if force:
+            old_locations = {}
+
+        chunk_ids, locations, moved = [], [], []
+        added = 0
+
+        def new_chunks():
+            nonlocal added
+            # chunk ids come from the tenant-scoped key; payloads keep the plain id + tenant
+            for c in iter_pdf_text_chunks(pdf_path, chunk_size, overlap, document_id=doc_key):
+                meta = {**(c.get("meta") or {}), "document_id": document_id, "tenant_id": tenant_id}
+                location = [meta.get("page"), meta.get("offset"), meta.get("page_end"), meta.get("offset_end")]
+                chunk_ids.append(c["id"])
+                locations.append(location)
+                if c["id"] not in old_locations:
+                    added += 1
+                    yield {**c, "meta": meta}
+                elif legacy or old_locations[c["id"]] != location:
+                    moved.append((c["id"], meta))
+
+        ensure_embeddings_upsert(new_chunks(), document_id=doc_key)
+        if moved:
+            update_payloads(QDRANT_COLLECTION, [m[0] for m in moved], [m[1] for m in moved])
+        removed = list(set(previous_ids).difference(chunk_ids))
+        if removed:
+            delete_points(QDRANT_COLLECTION, removed)
+
+        record = {
+            "key": key,
+            "document_id": document_id,
+            "tenant_id": tenant_id,
+            "sha256": content_hash,
+            "source": os.path.basename(pdf_path),
+            "model": EMBEDDING_MODEL,
+            "collection": QDRANT_COLLECTION,
+            "chunk_ids": chunk_ids,
+            "locations": locations,  # [page, offset, page_end, offset_end] per chunk id
+            "ingested_at": time.time(),
+        }
+        with _lock:
+            _load_manifest()["documents"][doc_key] = record
+            _save_manifest()
+        return {**record, "cached": False, "added": added, "removed": len(removed),
+                "moved": len(moved)}
+
+
+def _cached(previous, key: str, force: bool):
+    """The cache-hit result if `previous` is this exact version and still stored, else None."""
+    # records written before tenancy have points without "tenant_id" and need patching
+    if force or previous is None or previous["key"] != key or "tenant_id" not in previous:
+        return None
+    # the manifest may outlive the collection (e.g. a fresh Qdrant container)
+    if not collection_exists(QDRANT_COLLECTION):
+        return None
+    return {**previous, "cached": True, "added": 0, "removed": 0, "moved": 0}
+
+
+def _summary(record: dict) -> dict:
+    return {
+        "document_id": record["document_id"],
+        "tenant_id": record.get("tenant_id", DEFAULT_TENANT),
+        "source": record.get("source"),
+        "sha256": record.get("sha256"),
+        "chunks": len(record.get("chunk_ids") or []),
+        "collection": record.get("collection"),
+        "ingested_at": record.get("ingested_at"),
+    }
+
+
+def list_documents(tenant_id: str = None) -> list:
+    """Ingested documents (all tenants if tenant_id is None), newest first."""
+    with _lock:
+        records = list(_load_manifest()["documents"].values())
+    docs = [_summary(r) for r in records]
+    if tenant_id is not None:
+        docs = [d for d in docs if d["tenant_id"] == tenant_id]
+    return sorted(docs, key=lambda d: d["ingested_at"] or 0, reverse=True)
+
+
+def delete_document(document_id: str, tenant_id: str = None) -> bool:
+    """Remove a document's chunks from the collection and its manifest entry. False if unknown."""
+    tenant_id = tenant_id or DEFAULT_TENANT
+    doc_key = document_key(document_id, tenant_id)
+    with span("ingest.delete") as s, _document_lock(doc_key):
+        record = _record(doc_key)
+        if record is None:
+            return False
+        collection = record.get("collection", QDRANT_COLLECTION)
+        if record.get("chunk_ids") and collection_exists(collection):
+            delete_points(collection, record["chunk_ids"])
+        with _lock:
+            _load_manifest()["documents"].pop(doc_key, None)
+            _save_manifest()
+        s["items"] = len(record.get("chunk_ids") or [])
+        return True
+
+
+def reingest_document(pdf_path: str, document_id: str = None, tenant_id: str = None,
+                      chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> dict:
+    """Re-embed a document from scratch (e.g. after changing the embedding model), replacing its chunks."""
+    return ensure_pdf_ingested(pdf_path, chunk_size, overlap, document_id=document_id,
+                               tenant_id=tenant_id, force=True)
@@ -3,15 +3,47 @@
 Retrieval utilities that talk to Qdrant and return hits
 """
 
-from src.utils.qdrant_helper import search
+from src.utils.qdrant_helper import search, asearch, search_batch
 from config.settings import QDRANT_COLLECTION
 
-def retrieve_top_k(query: str, top_k: int = 4):
+def scope_filters(document_ids=None, tenant_id: str = None) -> dict:
+    """Payload filter restricting retrieval to a tenant and/or a set of documents."""
+    filters = {}
+    if tenant_id is not None:
+        filters["tenant_id"] = tenant_id
+    if document_ids is not None:
+        filters["document_id"] = [document_ids] if isinstance(document_ids, str) else list(document_ids)
+    return filters or None
+
+def document_scope(doc: dict) -> dict:
+    """retrieve_top_k kwargs restricting a search to the ingested document `doc` (a manifest record)."""
+    if not doc or not doc.get("document_id"):
+        return {}
+    return {"document_ids": [doc["document_id"]], "tenant_id": doc.get("tenant_id")}
+
+def retrieve_top_k(query: str, top_k: int = 4, document_ids=None, tenant_id: str = None):
     """
     Currently uses the same sentence-transformer to embed the query via qdrant helper.
     Returns top_k hits list with structure matching qdrant response -> simplified.
+    document_ids / tenant_id restrict the search to those documents / that tenant.
     """
-    hits = search(collection_name=QDRANT_COLLECTION, query_text=query, top_k=top_k)
+    hits = search(collection_name=QDRANT_COLLECTION, query_text=query, top_k=top_k,
+                  filters=scope_filters(document_ids, tenant_id))
+    return _simplify(hits)
+
+async def aretrieve_top_k(query: str, top_k: int = 4, document_ids=None, tenant_id: str = None):
+    """Async retrieve_top_k (used by the async graph nodes)."""
+    hits = await asearch(collection_name=QDRANT_COLLECTION, query_text=query, top_k=top_k,
+                         filters=scope_filters(document_ids, tenant_id))
+    return _simplify(hits)
+
+def retrieve_top_k_batch(queries: list, top_k: int = 4, document_ids=None, tenant_id: str = None):
+    """retrieve_top_k for many queries at once (one encode call, one batched search)."""
+    results = search_batch(collection_name=QDRANT_COLLECTION, query_texts=list(queries), top_k=top_k,
+                           filters=scope_filters(document_ids, tenant_id))
+    return [_simplify(hits) for hits in results]
+
+def _simplify(hits):
     # standardize fields we expect
     simplified = []
     for h in hits:
@@ -0,0 +1,433 @@
+# src/server.py
+"""
+Headless HTTP API over the compiled graph, for calls from other services.
+
+    python -m src.server --port 8080 --workers 8
+
+  POST /query                 {"question", "job_id"? | "pdf_path"?, "tenant_id"?} -> final state (JSON)
+  POST /query/stream          same body -> NDJSON, one streaming.astream_answer event per line
+  POST /documents             raw PDF body (?filename=...&tenant_id=...&document_id=...) -> 202 {"job_id", "document_id", ...}
+  GET  /documents/jobs/<id>   ingestion job status (pipelines/ingest_jobs.py)
+  GET  /healthz               the process is serving
+  GET  /readyz                200 once warmup() has loaded the models, 503 before
+  GET  /metrics               tracing.metrics_text()
+
+Graph runs go through the async nodes on one event-loop thread, at most
+SERVER_WORKERS at a time (blocking work inside the nodes uses a pool of
+the same size). Up to SERVER_QUEUE_SIZE more wait for a worker; past that
+a request is answered 429 with Retry-After instead of piling up. A query
+still unfinished SERVER_REQUEST_TIMEOUT seconds after it was accepted is
+cancelled and answered 504 (in a stream: a final {"type": "error"} event).
+
+Documents come from POST /documents ("job_id"). A "pdf_path" is only
+accepted for a regular file under UPLOAD_DIR or SERVER_PDF_ROOTS, so a
+client cannot make the server read arbitrary files on the host.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.graph import speculation
+from src.graph.flow import get_graph, warmup as warmup_models
+from src.graph.streaming import astream_answer
+from src.pipelines.ingest_jobs import store_upload, submit_ingestion, job_status
+from src.utils.tracing import span, metrics_text, register_gauge
+from config.settings import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_QUEUE_SIZE,
+    SERVER_REQUEST_TIMEOUT,
+    SERVER_MAX_UPLOAD_MB,
+    SERVER_PDF_ROOTS,
+    UPLOAD_DIR,
+)
+
+logger = logging.getLogger("src.server")
+
+WARMUP_RETRY_S = 30            # a failed warmup (model download, API key) is retried this often
+MAX_JSON_BYTES = 1024 * 1024
+_HIDDEN_STATE = ("trace", "rag_hits", "prefetch_id")  # internal, or a copy of "sources"
+PDF_ROOTS = [UPLOAD_DIR, *SERVER_PDF_ROOTS]
+
+
+class Rejected(Exception):
+    """A request answered with an HTTP error status."""
+
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def public_state(state: dict) -> dict:
+    return {k: v for k, v in state.items() if k not in _HIDDEN_STATE}
+
+
+def allowed_pdf_path(path: str) -> str:
+    """The resolved path if it is a regular file inside PDF_ROOTS, else Rejected(403)."""
+    resolved = os.path.realpath(path)
+    for root in PDF_ROOTS:
+        root = os.path.realpath(root)
+        if os.path.commonpath([resolved, root]) == root and os.path.isfile(resolved):
+            return resolved
+    raise Rejected(403, "'pdf_path' must be a file under an allowed directory; upload it via POST /documents")
+
+
+def query_state(body: dict) -> dict:
+    """Graph input from a request body; "job_id" (from POST /documents) names an uploaded PDF."""
+    question = body.get("question")
+    if not isinstance(question, str) or not question.strip():
+        raise Rejected(400, "'question' is required")
+    state = {"question": question}
+    if body.get("job_id"):
+        job = job_status(body["job_id"])
+        if job is None:
+            raise Rejected(404, f"Unknown ingestion job '{body['job_id']}'")
+        state.update(pdf_path=job["pdf_path"], tenant_id=job["tenant_id"], ingest_job=job["id"])
+    else:
+        if body.get("pdf_path"):
+            state["pdf_path"] = allowed_pdf_path(str(body["pdf_path"]))
+        if body.get("tenant_id"):
+            state["tenant_id"] = body["tenant_id"]
+    return state
+
+
+class GraphService:
+    """Admission control, timeouts and readiness around one graph; transport-independent."""
+
+    def __init__(self, graph=None, workers: int = SERVER_WORKERS, queue_size: int = SERVER_QUEUE_SIZE,
+                 timeout: float = SERVER_REQUEST_TIMEOUT, warmup=warmup_models):
+        self.graph = graph
+        self.workers = max(workers, 1)
+        self.capacity = self.workers + max(queue_size, 0)
+        self.timeout = timeout or None
+        self.ready = threading.Event()
+        self.warm_status = {}
+        self._warmup = warmup
+        self._slots = asyncio.Semaphore(self.workers)
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(ThreadPoolExecutor(self.workers, thread_name_prefix="graph"))
+        speculation.set_workers(self.workers)
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"accepted": 0, "rejected": 0, "timeouts": 0, "pending": 0, "running": 0}
+
+    # ---------- lifecycle ----------
+    def start(self):
+        threading.Thread(target=self._loop.run_forever, name="graph-loop", daemon=True).start()
+        if self._warmup is None:
+            self.ready.set()
+        else:
+            threading.Thread(target=self._warm, name="warmup", daemon=True).start()
+        register_gauge("rag_server_pending", lambda: self.stats()["pending"],
+                       "Accepted queries not finished yet (running or waiting for a worker).")
+        register_gauge("rag_server_running", lambda: self.stats()["running"], "Graph runs in progress.")
+
+    def stop(self):
+        self._stopping.set()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _warm(self):
+        while not self._stopping.is_set():
+            try:
+                self.warm_status = self._warmup()
+            except Exception as e:
+                self.warm_status = {"error": str(e)}
+            if self.warm_status and all(v is True for v in self.warm_status.values()):
+                self.ready.set()
+                logger.info("ready: %s", self.warm_status)
+                return
+            logger.warning("warmup incomplete, retrying in %ss: %s", WARMUP_RETRY_S, self.warm_status)
+            self._stopping.wait(WARMUP_RETRY_S)
+
+    # ---------- admission ----------
+    def _add(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self._stats[k] += v
+
+    def _submit(self, coro) -> Future:
+        """Schedule coro on the loop (429 if the queue is full); its slot is freed when it ends."""
+        with self._lock:
+            if self._stats["pending"] >= self.capacity:
+                self._stats["rejected"] += 1
+                coro.close()
+                raise Rejected(429, "Server busy, retry later", {"Retry-After": "1"})
+            self._stats["pending"] += 1
+            self._stats["accepted"] += 1
+
+        async def run():
+            try:
+                return await asyncio.wait_for(coro, self.timeout)
+            except asyncio.TimeoutError:
+                self._add(timeouts=1)
+                raise
+            finally:
+                self._add(pending=-1)
+
+        return asyncio.run_coroutine_threadsafe(run(), self._loop)
+
+    @asynccontextmanager
+    async def _worker(self):
+        async with self._slots:
+            self._add(running=1)
+            try:
+                yield self.graph or get_graph()
+            finally:
+                self._add(running=-1)
+
+    # ---------- graph ----------
+    async def _ainvoke(self, state: dict) -> dict:
+        async with self._worker() as graph:
+            return await graph.ainvoke(state)
+
+    async def _astream(self, state: dict, events: queue.Queue):
+        async with self._worker() as graph:
+            async for event in astream_answer(state, graph=graph):
+                events.put(event)
+
+    def query(self, state: dict) -> dict:
+        """Final graph state; Rejected(429 / 504) when busy or too slow."""
+        future = self._submit(self._ainvoke(state))
+        try:
+            return future.result()
+        except asyncio.TimeoutError:
+            raise Rejected(504, f"Query did not finish within {self.timeout}s")
+
+    def stream(self, state: dict):
+        """
+        Rejected(429) now, or a generator of astream_answer events. A failed or
+        timed-out run ends with {"type": "error", "status", "error"}; closing the
+        generator early (client gone) cancels the run.
+        """
+        events = queue.Queue()
+        future = self._submit(self._astream(state, events))
+        future.add_done_callback(events.put)  # the finished future marks the end
+
+        def iterate():
+            try:
+                while True:
+                    item = events.get()
+                    if not isinstance(item, Future):
+                        yield item
+                        continue
+                    error = None if item.cancelled() else item.exception()
+                    if isinstance(error, asyncio.TimeoutError):
+                        yield {"type": "error", "status": 504,
+                               "error": f"Query did not finish within {self.timeout}s"}
+                    elif error is not None:
+                        yield {"type": "error", "status": 500, "error": str(error)}
+                    return
+            finally:
+                future.cancel()
+
+        return iterate()
+
+    # ---------- documents ----------
+    def upload(self, data: bytes, filename: str, tenant_id: str = None, document_id: str = None) -> dict:
+        """
+        Store the PDF and queue its ingestion; pass the returned job_id with questions about it.
+        A stable document_id makes the upload a revision of that document (see `store_upload`).
+        """
+        stored = store_upload(data, filename, document_id)
+        job_id = submit_ingestion(stored["path"], document_id=stored["document_id"], tenant_id=tenant_id,
+                                  sha256=stored["sha256"])
+        job = job_status(job_id) or {}
+        return {"job_id": job_id, "document_id": stored["document_id"], "sha256": stored["sha256"],
+                "tenant_id": job.get("tenant_id"), "state": job.get("state")}
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(workers=self.workers, capacity=self.capacity, ready=self.ready.is_set())
+        return stats
+
+
+# ---------- HTTP ----------
+_ROUTES = {
+    ("GET", "/healthz"): "healthz",
+    ("GET", "/readyz"): "readyz",
+    ("GET", "/metrics"): "metrics",
+    ("POST", "/query"): "query",
+    ("POST", "/query/stream"): "query_stream",
+    ("POST", "/documents"): "upload",
+}
+_JOB_PREFIX = "/documents/jobs/"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for JSON replies, chunked encoding for streams
+    server_version = "rag-pipeline"
+    timeout = 30                   # seconds to receive a request from a slow / idle client
+
+    @property
+    def service(self) -> GraphService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method: str):
+        url = urlparse(self.path)
+        self.params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        name, args = _ROUTES.get((method, url.path)), ()
+        if name is None and method == "GET" and url.path.startswith(_JOB_PREFIX):
+            name, args = "job", (url.path[len(_JOB_PREFIX):],)
+        with span(f"http.{name or 'unknown'}") as s:
+            try:
+                if name is None:
+                    raise Rejected(404, f"No route for {method} {url.path}")
+                s["status"] = getattr(self, name)(*args)
+            except Rejected as e:
+                s["status"] = self._send_json(e.status, {"error": e.message}, e.headers)
+            except Exception as e:
+                logger.exception("%s %s failed", method, url.path)
+                s["status"] = self._send_json(500, {"error": str(e)})
+
+    # ---------- request / response helpers ----------
+    def _body(self, limit: int) -> bytes:
+        if "chunked" in self.headers.get("Transfer-Encoding", ""):
+            self.close_connection = True
+            raise Rejected(411, "Content-Length required")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > limit:
+            self.close_connection = True  # the unread body would be parsed as the next request
+            raise Rejected(413, f"Body larger than {limit} bytes")
+        return self.rfile.read(length)
+
+    def _json_body(self) -> dict:
+        try:
+            body = json.loads(self._body(MAX_JSON_BYTES) or b"{}")
+        except ValueError:
+            raise Rejected(400, "Body must be JSON")
+        if not isinstance(body, dict):
+            raise Rejected(400, "Body must be a JSON object")
+        return body
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None) -> int:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def _send_json(self, status: int, obj, headers: dict = None) -> int:
+        return self._send(status, json.dumps(obj, default=str).encode("utf-8"), "application/json", headers)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    # ---------- endpoints ----------
+    def healthz(self) -> int:
+        return self._send_json(200, {"status": "ok"})
+
+    def readyz(self) -> int:
+        ready = self.service.ready.is_set()
+        return self._send_json(200 if ready else 503, {"ready": ready, "warmup": self.service.warm_status})
+
+    def metrics(self) -> int:
+        return self._send(200, metrics_text().encode("utf-8"), "text/plain; version=0.0.4")
+
+    def query(self) -> int:
+        state = self.service.query(query_state(self._json_body()))
+        return self._send_json(200, public_state(state))
+
+    def query_stream(self) -> int:
+        events = self.service.stream(query_state(self._json_body()))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for event in events:
+                if event["type"] == "final":
+                    event = {**event, "state": public_state(event["state"])}
+                self._write_chunk(json.dumps(event, default=str).encode("utf-8") + b"\n")
+            self._write_chunk(b"")
+        except OSError:  # client disconnected or stopped reading
+            self.close_connection = True
+        finally:
+            events.close()  # stops the graph run if the client went away
+        return 200
+
+    def upload(self) -> int:
+        data = self._body(int(SERVER_MAX_UPLOAD_MB * 1024 * 1024))
+        if not data.startswith(b"%PDF"):
+            raise Rejected(415, "Body must be a PDF")
+        filename = self.params.get("filename") or self.headers.get("X-Filename") or "upload.pdf"
+        tenant_id = self.params.get("tenant_id") or self.headers.get("X-Tenant-Id")
+        document_id = self.params.get("document_id") or self.headers.get("X-Document-Id")
+        return self._send_json(202, self.service.upload(data, filename, tenant_id, document_id))
+
+    def job(self, job_id: str) -> int:
+        status = job_status(job_id)
+        if status is None:
+            raise Rejected(404, f"Unknown ingestion job '{job_id}'")
+        return self._send_json(200, status)
+
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; admission control happens per query
+
+    def __init__(self, address, service: GraphService):
+        super().__init__(address, Handler)
+        self.service = service
+
+    def server_close(self):
+        super().server_close()
+        self.service.stop()
+
+
+def make_server(host: str = SERVER_HOST, port: int = SERVER_PORT, **service_kwargs) -> APIServer:
+    """Bound server with a started GraphService (port 0 picks a free port); call serve_forever()."""
+    service = GraphService(**service_kwargs)
+    service.start()
+    return APIServer((host, port), service)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the graph over HTTP.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="graph runs at once")
+    parser.add_argument("--queue-size", type=int, default=SERVER_QUEUE_SIZE, help="waiting runs before 429")
+    parser.add_argument("--timeout", type=float, default=SERVER_REQUEST_TIMEOUT, help="seconds per query (504)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    server = make_server(args.host, args.port, workers=args.workers, queue_size=args.queue_size,
+                         timeout=args.timeout)
+    logger.info("listening on http://%s:%s", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
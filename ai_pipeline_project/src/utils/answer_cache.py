@@ -0,0 +1,185 @@
+# src/utils/answer_cache.py
+"""
+Persistent cache of RAG answers (SQLite, stdlib only).
+
+An answer is reusable when it was produced for the same document version,
+the same retrieved chunks, the same prompt template and the same LLM, so the
+cache key is built from exactly those plus the normalized question:
+
+    scope = sha256(document hash, retrieved chunk ids, template, model)
+    key   = sha256(scope, normalized question)
+
+With ANSWER_CACHE_SIMILARITY > 0 a miss on the exact key falls back to the
+closest cached question *within the same scope* (cosine similarity of the
+query embeddings), so paraphrases that retrieve the same context also hit.
+Entries expire after ANSWER_CACHE_TTL seconds and the least recently used
+ones are evicted beyond ANSWER_CACHE_MAX_ENTRIES.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from src.utils.cache import normalize_text
+from config.settings import (
+    GEMINI_MODEL,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_SIMILARITY,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    qvec BLOB,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_scope ON answers(scope);
+CREATE INDEX IF NOT EXISTS answers_last_access ON answers(last_access);
+"""
+
+
+def _sha256(*parts) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def cache_scope(doc_hash: str, chunk_ids: list, template: str, model: str = GEMINI_MODEL) -> str:
+    return _sha256(doc_hash, ",".join(str(i) for i in chunk_ids), template, model)
+
+
+class AnswerCache:
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 0, similarity: float = 0.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl if self.ttl else 0.0
+
+    def get(self, scope: str, question: str, query_vector=None):
+        """Cached answer text or None."""
+        key = _sha256(scope, normalize_text(question))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer FROM answers WHERE key = ? AND created_at >= ?", (key, self._cutoff())
+            ).fetchone()
+            if row is None and self.similarity > 0 and query_vector is not None:
+                row = self._nearest(scope, query_vector)
+                if row is not None:
+                    key, row = row[0], row[1:]
+                    self.semantic_hits += 1
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def _nearest(self, scope: str, query_vector):
+        rows = self._conn.execute(
+            "SELECT key, answer, qvec FROM answers WHERE scope = ? AND qvec IS NOT NULL AND created_at >= ?",
+            (scope, self._cutoff()),
+        ).fetchall()
+        if not rows:
+            return None
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        mat = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+        sims = (mat @ q) / np.maximum(np.linalg.norm(mat, axis=1), 1e-12)
+        best = int(np.argmax(sims))
+        if sims[best] < self.similarity:
+            return None
+        return rows[best][0], rows[best][1]
+
+    def put(self, scope: str, question: str, answer: str, query_vector=None):
+        key = _sha256(scope, normalize_text(question))
+        qvec = None if query_vector is None else np.asarray(query_vector, dtype=np.float32).tobytes()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, scope, question, answer, qvec, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, scope, question, answer, qvec, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.ttl:
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (self._cutoff(),))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_access, rowid LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Process-wide AnswerCache, or None when ANSWER_CACHE_ENABLED is off."""
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache(
+                    ANSWER_CACHE_PATH,
+                    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                    ttl=ANSWER_CACHE_TTL,
+                    similarity=ANSWER_CACHE_SIMILARITY,
+                )
+    return _cache
+
+
+def set_answer_cache(cache):
+    """Swap the process-wide AnswerCache (tests, benchmarks); None re-creates it from settings."""
+    global _cache
+    _cache = cache
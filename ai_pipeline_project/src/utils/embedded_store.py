@@ -0,0 +1,362 @@
+# src/utils/embedded_store.py
+"""
+Embedded, in-process vector index (VECTOR_BACKEND="embedded").
+
+Meant for a single uploaded PDF or a small corpus, where an HTTP round-trip
+to Qdrant costs more than the search itself. Per collection directory:
+  - meta.json:    {"dim": int, "indexes": [payload field, ...]}
+  - vectors.f32:  L2-normalized float32 rows, memory-mapped, grown by doubling
+  - points.jsonl: append-only log of {"row", "id", "payload"} / {"row", "deleted"}
+                  replayed on open and compacted when mostly dead entries
+
+Cosine similarity is a single matrix-vector product over the mapped rows and
+top-k selection uses argpartition, so search is sub-millisecond for a few
+thousand chunks and needs no running service.
+
+Payload indexes are in-memory inverted maps (value -> rows) rebuilt on open;
+a filtered search scores only the candidate rows, so its cost follows the
+size of the selected documents rather than of the whole collection.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+from src.utils.vector_store import VectorStore, _check_dimension
+
+_MIN_CAPACITY = 1024
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class _Collection:
+    def __init__(self, path: str, dim: int, indexed: list = ()):
+        self.path = path
+        self.dim = dim
+        self.indexes = {field: {} for field in indexed}   # field -> value -> set(rows)
+        self.ids = []        # row -> point id (None for a free row)
+        self.payloads = []   # row -> payload
+        self.id_to_row = {}
+        self.free_rows = []
+        self.log_entries = 0
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._log_path = os.path.join(path, "points.jsonl")
+        self._replay()
+        for row, pid in enumerate(self.ids):
+            if pid is not None:
+                self._index_add(row)
+        self.live = np.array([i is not None for i in self.ids], dtype=bool)
+        self._map(max(_MIN_CAPACITY, len(self.ids)))
+
+    # ---------- persistence ----------
+    def _replay(self):
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.log_entries += 1
+                row = entry["row"]
+                while len(self.ids) <= row:
+                    self.ids.append(None)
+                    self.payloads.append(None)
+                old_id = self.ids[row]
+                if old_id is not None and self.id_to_row.get(old_id) == row:
+                    del self.id_to_row[old_id]
+                if entry.get("deleted"):
+                    self.ids[row], self.payloads[row] = None, None
+                else:
+                    self.ids[row], self.payloads[row] = entry["id"], entry.get("payload") or {}
+                    self.id_to_row[entry["id"]] = row
+        self.free_rows = [r for r, i in enumerate(self.ids) if i is None]
+
+    def _map(self, capacity: int):
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if size < capacity * row_bytes:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        else:
+            capacity = size // row_bytes
+        self.vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _append_log(self, entries: list):
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            for e in entries:
+                f.write(json.dumps(e))
+                f.write("\n")
+        self.log_entries += len(entries)
+        if self.log_entries > 2 * max(len(self.id_to_row), _MIN_CAPACITY):
+            self._compact_log()
+
+    def _compact_log(self):
+        tmp_path = f"{self._log_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row, pid in enumerate(self.ids):
+                if pid is not None:
+                    f.write(json.dumps({"row": row, "id": pid, "payload": self.payloads[row]}))
+                    f.write("\n")
+        os.replace(tmp_path, self._log_path)
+        self.log_entries = len(self.id_to_row)
+
+    # ---------- payload indexes ----------
+    def _index_add(self, row: int):
+        payload = self.payloads[row]
+        for field, index in self.indexes.items():
+            value = payload.get(field)
+            if isinstance(value, (str, int, bool)):
+                index.setdefault(value, set()).add(row)
+
+    def _index_remove(self, row: int):
+        payload = self.payloads[row]
+        if not payload:
+            return
+        for field, index in self.indexes.items():
+            value = payload.get(field)
+            rows = index.get(value) if isinstance(value, (str, int, bool)) else None
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del index[value]
+
+    def add_index(self, field: str):
+        if field in self.indexes:
+            return
+        self.indexes[field] = {}
+        index = self.indexes[field]
+        for row, pid in enumerate(self.ids):
+            value = self.payloads[row].get(field) if pid is not None else None
+            if isinstance(value, (str, int, bool)):
+                index.setdefault(value, set()).add(row)
+
+    def _candidates(self, filters: dict) -> np.ndarray:
+        """Live rows matching every filter; indexed fields are looked up, others scanned."""
+        selected = None
+        for field, value in filters.items():
+            values = list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+            index = self.indexes.get(field)
+            if index is not None:
+                rows = set().union(*(index.get(v, ()) for v in values))
+            else:
+                wanted = set(values)
+                pool = selected if selected is not None else self.id_to_row.values()
+                rows = {r for r in pool if self.payloads[r].get(field) in wanted}
+            selected = rows if selected is None else selected & rows
+            if not selected:
+                break
+        return np.fromiter(sorted(selected or ()), dtype=np.int64)
+
+    # ---------- writes ----------
+    def _allocate_row(self) -> int:
+        if self.free_rows:
+            return self.free_rows.pop()
+        row = len(self.ids)
+        self.ids.append(None)
+        self.payloads.append(None)
+        return row
+
+    def upsert(self, ids: list, vectors: np.ndarray, payloads: list):
+        vectors = _normalize(vectors).reshape(len(ids), self.dim)
+        last = {pid: i for i, pid in enumerate(ids)}
+        if len(last) < len(ids):
+            # a repeated id would get a second row and leave the first live but unreachable
+            keep = sorted(last.values())
+            ids, payloads, vectors = [ids[i] for i in keep], [payloads[i] for i in keep], vectors[keep]
+        rows = []
+        for pid in ids:
+            row = self.id_to_row.get(pid)
+            rows.append(self._allocate_row() if row is None else row)
+        if len(self.ids) > self.vectors.shape[0]:
+            self.vectors.flush()
+            self._map(max(len(self.ids), 2 * self.vectors.shape[0]))
+        if len(self.live) < len(self.ids):
+            self.live = np.concatenate([self.live, np.zeros(len(self.ids) - len(self.live), dtype=bool)])
+
+        rows_arr = np.asarray(rows, dtype=np.int64)
+        self.vectors[rows_arr] = vectors
+        self.vectors.flush()
+        self.live[rows_arr] = True
+        entries = []
+        for row, pid, payload in zip(rows, ids, payloads):
+            if self.ids[row] is not None:
+                self._index_remove(row)
+            self.ids[row], self.payloads[row] = pid, payload or {}
+            self.id_to_row[pid] = row
+            self._index_add(row)
+            entries.append({"row": row, "id": pid, "payload": payload or {}})
+        self._append_log(entries)
+
+    def delete(self, ids: list):
+        entries = []
+        for pid in ids:
+            row = self.id_to_row.pop(pid, None)
+            if row is None:
+                continue
+            self._index_remove(row)
+            self.ids[row], self.payloads[row] = None, None
+            self.live[row] = False
+            self.free_rows.append(row)
+            entries.append({"row": row, "deleted": True})
+        if entries:
+            self._append_log(entries)
+
+    def update_payloads(self, ids: list, payloads: list):
+        entries = []
+        for pid, payload in zip(ids, payloads):
+            row = self.id_to_row.get(pid)
+            if row is None:
+                continue
+            self._index_remove(row)
+            self.payloads[row] = {**self.payloads[row], **payload}
+            self._index_add(row)
+            entries.append({"row": row, "id": pid, "payload": self.payloads[row]})
+        if entries:
+            self._append_log(entries)
+
+    # ---------- reads ----------
+    def search_batch(self, vectors: np.ndarray, top_k: int, filters: dict = None) -> list:
+        """All queries scored in one matrix product over the (candidate) rows."""
+        n = len(self.ids)
+        if n == 0 or not self.id_to_row or top_k <= 0:
+            return [[] for _ in range(len(vectors))]
+        queries = _normalize(vectors).reshape(-1, self.dim)
+        if filters:
+            rows = self._candidates(filters)
+        else:
+            rows = np.flatnonzero(self.live[:n])
+        if not len(rows):
+            return [[] for _ in range(len(queries))]
+        scores = self.vectors[rows] @ queries.T          # (candidates, queries)
+        k = min(top_k, len(rows))
+        if k < len(rows):
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        else:
+            top = np.broadcast_to(np.arange(len(rows))[:, None], scores.shape)
+        results = []
+        for j in range(len(queries)):
+            col = top[:, j]
+            col = col[np.argsort(-scores[col, j])]
+            results.append([
+                {"id": self.ids[rows[i]], "score": float(scores[i, j]), "payload": self.payloads[rows[i]]}
+                for i in col
+            ])
+        return results
+
+    def search(self, vector: np.ndarray, top_k: int, filters: dict = None) -> list:
+        n = len(self.ids)
+        live_count = len(self.id_to_row)
+        if n == 0 or live_count == 0 or top_k <= 0:
+            return []
+        q = _normalize(vector).reshape(self.dim)
+        if filters:
+            rows = self._candidates(filters)
+            if not len(rows):
+                return []
+            scores = self.vectors[rows] @ q
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"id": self.ids[rows[i]], "score": float(scores[i]), "payload": self.payloads[rows[i]]}
+                for i in top
+            ]
+        scores = self.vectors[:n] @ q
+        scores[~self.live[:n]] = -np.inf
+        k = min(top_k, live_count)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top])][:k]
+        return [
+            {"id": self.ids[r], "score": float(scores[r]), "payload": self.payloads[r]}
+            for r in top
+        ]
+
+
+class EmbeddedStore(VectorStore):
+    def __init__(self, root: str):
+        self.root = root
+        self._collections = {}
+        self._lock = threading.RLock()
+
+    def _dir(self, collection_name: str) -> str:
+        return os.path.join(self.root, collection_name)
+
+    def _get(self, collection_name: str) -> _Collection:
+        col = self._collections.get(collection_name)
+        if col is None:
+            meta_path = os.path.join(self._dir(collection_name), "meta.json")
+            if not os.path.exists(meta_path):
+                raise ValueError(f"Collection '{collection_name}' does not exist")
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            col = _Collection(self._dir(collection_name), meta["dim"], meta.get("indexes", ()))
+            self._collections[collection_name] = col
+        return col
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self._dir(collection_name), "meta.json"))
+
+    def create_collection(self, collection_name: str, vector_size: int):
+        with self._lock:
+            if self.collection_exists(collection_name):
+                _check_dimension(collection_name, self.vector_size(collection_name), vector_size)
+                return
+            path = self._dir(collection_name)
+            os.makedirs(path, exist_ok=True)
+            for name in ("vectors.f32", "points.jsonl"):
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))  # leftovers of a half-deleted collection
+            with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"dim": vector_size}, f)
+            self._collections.pop(collection_name, None)
+
+    def vector_size(self, collection_name: str) -> int:
+        with self._lock:
+            return self._get(collection_name).dim
+
+    def delete_collection(self, collection_name: str):
+        with self._lock:
+            col = self._collections.pop(collection_name, None)
+            if col is not None:
+                del col.vectors  # release the mapping before unlinking
+            path = self._dir(collection_name)
+            # meta.json first: a crash midway leaves a "missing" collection, never a corrupt one
+            for name in ("meta.json", "vectors.f32", "points.jsonl", "points.jsonl.tmp"):
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+
+    def upsert(self, collection_name: str, ids: list, vectors, payloads: list):
+        with self._lock:
+            self._get(collection_name).upsert(list(ids), vectors, list(payloads))
+
+    def delete(self, collection_name: str, ids: list):
+        with self._lock:
+            self._get(collection_name).delete(list(ids))
+
+    def update_payloads(self, collection_name: str, ids: list, payloads: list):
+        with self._lock:
+            self._get(collection_name).update_payloads(list(ids), list(payloads))
+
+    def create_payload_index(self, collection_name: str, field_name: str):
+        with self._lock:
+            col = self._get(collection_name)
+            if field_name in col.indexes:
+                return
+            col.add_index(field_name)
+            with open(os.path.join(self._dir(collection_name), "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"dim": col.dim, "indexes": sorted(col.indexes)}, f)
+
+    def search(self, collection_name: str, vector, top_k: int = 4, filters: dict = None) -> list:
+        with self._lock:
+            return self._get(collection_name).search(vector, top_k, filters)
+
+    def search_batch(self, collection_name: str, vectors, top_k: int = 4, filters: dict = None) -> list:
+        with self._lock:
+            return self._get(collection_name).search_batch(vectors, top_k, filters)
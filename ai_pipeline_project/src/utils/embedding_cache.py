@@ -0,0 +1,259 @@
+# src/utils/embedding_cache.py
+"""
+Disk-backed cache of chunk embeddings, keyed by (model name, hash of the text).
+
+Re-ingesting a revised PDF, boilerplate shared across documents and a
+collection rebuilt after `delete_collection` all produce chunk texts that
+were encoded before. `embedding_pipeline` looks every batch up here first
+and only sends the misses to the model.
+
+One directory per model under EMBEDDING_CACHE_PATH:
+  - meta.json:   {"model", "dim"}
+  - vectors.f32: float32 rows, memory-mapped, grown by doubling
+  - keys.bin:    append-only 16-byte BLAKE2b digests of the texts, row order;
+                 a row counts only once its key is written (after its
+                 vector), so a crash mid-write leaves no half-written entry
+  - lock:        advisory flock taken by writers
+The key -> row map is rebuilt from keys.bin on open. Lookups are one
+fancy-indexed read of the mapped rows per batch.
+
+Several processes (server workers, a batch ingest) may share a directory:
+a writer holds the lock, first picks up the rows the others appended since
+it last looked, then appends its own after them.
+
+Entries are never evicted: at EMBEDDING_CACHE_MAX_ENTRIES the cache stops
+growing (delete the directory or call `clear()` to start over).
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one writer per directory
+    fcntl = None
+
+from config.settings import (
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 16
+_MIN_CAPACITY = 1024
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+def _model_dir(model: str) -> str:
+    # readable, but unique even when two model paths sanitize to the same name
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", model).strip("_") or "model"
+    return f"{safe[-64:]}-{hashlib.sha1(model.encode('utf-8')).hexdigest()[:8]}"
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, model: str = EMBEDDING_MODEL,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model = model
+        self.path = os.path.join(path, _model_dir(model))
+        self.max_entries = max_entries
+        self.dim = None
+        self.rows = {}        # key -> row
+        self.count = 0        # rows in keys.bin (a key written twice keeps its first row)
+        self.vectors = None   # memmap (capacity, dim)
+        self._vectors_inode = None  # a new file means another process cleared the cache
+        self._meta_path = os.path.join(self.path, "meta.json")
+        self._keys_path = os.path.join(self.path, "keys.bin")
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._lock_path = os.path.join(self.path, "lock")
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._open()
+
+    # ---------- persistence ----------
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive across processes sharing the directory; released when the file closes."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._lock_path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _open(self):
+        if not os.path.exists(self._meta_path):
+            return
+        with self._file_lock():
+            self._load()
+
+    def _load(self):
+        self.dim, self.rows, self.count, self.vectors = None, {}, 0, None
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model") != self.model:
+            return
+        self.dim = int(meta["dim"])
+        keys = b""
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "rb") as f:
+                keys = f.read()
+        vector_rows = os.path.getsize(self._vectors_path) // (self.dim * 4) if os.path.exists(self._vectors_path) else 0
+        count = min(len(keys) // KEY_BYTES, vector_rows)
+        if count * KEY_BYTES != len(keys):
+            with open(self._keys_path, "ab") as f:
+                f.truncate(count * KEY_BYTES)  # drop a torn tail
+        self._add_rows(keys[:count * KEY_BYTES])
+        self._map(max(_MIN_CAPACITY, count))
+
+    def _add_rows(self, keys: bytes):
+        for i in range(0, len(keys), KEY_BYTES):
+            self.rows.setdefault(keys[i:i + KEY_BYTES], self.count)
+            self.count += 1
+
+    def _sync(self):
+        """Take in what other processes wrote since the last look (file lock held)."""
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                dim = json.load(f).get("dim")
+            inode = os.stat(self._vectors_path).st_ino
+        except FileNotFoundError:
+            dim = inode = None
+        if self.dim is None or dim != self.dim or inode != self._vectors_inode:
+            self._load()  # created, cleared or re-dimensioned elsewhere
+            return
+        size = os.path.getsize(self._keys_path) if os.path.exists(self._keys_path) else 0
+        if size % KEY_BYTES:
+            size -= size % KEY_BYTES
+            with open(self._keys_path, "ab") as f:
+                f.truncate(size)  # a writer died mid-key; its complete keys stand
+        if size // KEY_BYTES > self.count:
+            with open(self._keys_path, "rb") as f:
+                f.seek(self.count * KEY_BYTES)
+                self._add_rows(f.read((size // KEY_BYTES - self.count) * KEY_BYTES))
+            if self.count > self.vectors.shape[0]:
+                self._map(self.count)
+
+    def _map(self, capacity: int):
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if size < capacity * row_bytes:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        else:
+            capacity = size // row_bytes
+        self.vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._vectors_inode = os.stat(self._vectors_path).st_ino
+
+    def _create(self, dim: int):
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors = None  # release the old mapping before its file goes
+        for p in (self._keys_path, self._vectors_path):
+            if os.path.exists(p):
+                os.remove(p)
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "dim": dim}, f)
+        os.replace(tmp_path, self._meta_path)
+        self.dim, self.rows, self.count = dim, {}, 0
+        self._map(_MIN_CAPACITY)
+
+    # ---------- lookups ----------
+    def get_many(self, keys: list):
+        """
+        (vectors, missing): float32 (len(keys), dim) with the cached rows filled
+        in, and the positions not in the cache. vectors is None while the cache is empty.
+        """
+        with self._lock:
+            rows = [self.rows.get(k, -1) for k in keys]
+            missing = [i for i, r in enumerate(rows) if r < 0]
+            self._stats["hits"] += len(keys) - len(missing)
+            self._stats["misses"] += len(missing)
+            if self.dim is None:
+                return None, list(range(len(keys)))
+            vectors = np.empty((len(keys), self.dim), dtype=np.float32)
+            hit = np.flatnonzero(np.asarray(rows) >= 0)
+            if len(hit):
+                vectors[hit] = self.vectors[np.asarray(rows)[hit]]
+            return vectors, missing
+
+    def put_many(self, keys: list, vectors: np.ndarray) -> int:
+        """Store rows not cached yet; returns how many were added."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return 0
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim != vectors.shape[1]:
+                if self.dim is not None:
+                    logger.warning("embedding dimension of %s changed (%s -> %s), clearing its cache",
+                                   self.model, self.dim, vectors.shape[1])
+                self._create(vectors.shape[1])
+            new = {}
+            for key, vec in zip(keys, vectors):
+                if key not in self.rows and key not in new:
+                    new[key] = vec
+            room = max(self.max_entries - self.count, 0)
+            new = dict(list(new.items())[:room])
+            if not new:
+                return 0
+            start = self.count
+            if start + len(new) > self.vectors.shape[0]:
+                self.vectors.flush()
+                self._map(max(2 * self.vectors.shape[0], start + len(new)))
+            self.vectors[start:start + len(new)] = np.stack(list(new.values()))
+            self.vectors.flush()
+            with open(self._keys_path, "ab") as f:  # written last: commits the rows
+                f.write(b"".join(new))
+            self._add_rows(b"".join(new))
+            self._stats["writes"] += len(new)
+            return len(new)
+
+    def clear(self):
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim is not None:
+                self._create(self.dim)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self.rows), "dim": self.dim, "model": self.model}
+
+
+_UNSET = object()
+_cache = _UNSET
+_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide cache for EMBEDDING_MODEL, or None when EMBEDDING_CACHE_ENABLED is false."""
+    global _cache
+    if _cache is _UNSET:
+        with _lock:
+            if _cache is _UNSET:
+                _cache = EmbeddingCache() if EMBEDDING_CACHE_ENABLED else None
+    return _cache
+
+
+def set_embedding_cache(cache):
+    """Swap the process-wide cache (tests, benchmarks); None disables it."""
+    global _cache
+    _cache = cache
+
+
+def embedding_cache_stats() -> dict:
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
@@ -0,0 +1,67 @@
+# src/utils/encoder.py
+"""
+Process-wide sentence-transformer registry.
+Ingestion (embedding_pipeline) and query embedding (qdrant_helper) share the
+same loaded model, so each process / Streamlit replica pays the load cost once.
+"""
+
+import threading
+from typing import TYPE_CHECKING
+
+from config.settings import EMBEDDING_MODEL, EMBEDDING_DEVICE, EMBEDDING_NUM_THREADS
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+_models = {}
+_lock = threading.Lock()
+_threads_configured = False
+
+
+def _configure_threads():
+    global _threads_configured
+    if _threads_configured:
+        return
+    if EMBEDDING_NUM_THREADS > 0:
+        import torch
+        torch.set_num_threads(EMBEDDING_NUM_THREADS)
+    _threads_configured = True
+
+
+def get_encoder(model_name: str = EMBEDDING_MODEL, device: str = EMBEDDING_DEVICE) -> "SentenceTransformer":
+    """
+    Return the shared model for (model_name, device), loading it on first use.
+    Safe to call from several threads: only one of them loads the model.
+    sentence_transformers (and torch) are imported here, not at module import.
+    """
+    key = (model_name, device)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                _configure_threads()
+                model = SentenceTransformer(model_name, device=device)
+                _models[key] = model
+    return model
+
+
+def warmup(model_name: str = EMBEDDING_MODEL, device: str = EMBEDDING_DEVICE) -> "SentenceTransformer":
+    """Load the model and run one tiny encode so the first real request is not the slow one."""
+    model = get_encoder(model_name, device)
+    model.encode(["warmup"], show_progress_bar=False)
+    return model
+
+
+def set_encoder(model, model_name: str = EMBEDDING_MODEL, device: str = EMBEDDING_DEVICE):
+    """Register an already-built encoder for (model_name, device) (tests, benchmarks); None removes it."""
+    with _lock:
+        if model is None:
+            _models.pop((model_name, device), None)
+        else:
+            _models[(model_name, device)] = model
+
+
+def loaded_models() -> list:
+    return [{"model": name, "device": device} for name, device in _models]
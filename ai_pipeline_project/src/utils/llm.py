@@ -1,12 +1,68 @@
 # src/utils/llm.py
-from langchain_google_genai import ChatGoogleGenerativeAI
+"""
+Process-wide LLM clients: one per (model, temperature), created on first use
+and reused by every graph run instead of being rebuilt per node per request.
+The provider SDKs are imported with the first client, not with this module.
+Calls go through utils/llm_gateway.py, which owns rate limiting and retries.
+"""
+import threading
+from typing import TYPE_CHECKING
+
 from config.settings import GEMINI_API_KEY, GEMINI_MODEL
 
-def get_gemini_chat(temperature: float = 0.2) -> ChatGoogleGenerativeAI:
-    if not GEMINI_API_KEY:
-        raise RuntimeError("GEMINI_API_KEY is not set")
-    return ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
-        google_api_key=GEMINI_API_KEY,
-        temperature=temperature,
-    )
+if TYPE_CHECKING:
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+_chat_clients = {}
+_genai_models = {}
+_lock = threading.Lock()
+
+def get_gemini_chat(temperature: float = 0.2, model: str = GEMINI_MODEL) -> "ChatGoogleGenerativeAI":
+    key = (model, float(temperature))
+    client = _chat_clients.get(key)
+    if client is None:
+        if not GEMINI_API_KEY:
+            raise RuntimeError("GEMINI_API_KEY is not set")
+        with _lock:
+            client = _chat_clients.get(key)
+            if client is None:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                client = ChatGoogleGenerativeAI(
+                    model=model,
+                    google_api_key=GEMINI_API_KEY,
+                    temperature=temperature,
+                    max_retries=1,  # retried by the gateway, inside the rate limit
+                )
+                _chat_clients[key] = client
+    return client
+
+def get_genai_model(model: str = GEMINI_MODEL):
+    """Shared google.generativeai GenerativeModel (used by rag_agent.answer_from_docs)."""
+    client = _genai_models.get(model)
+    if client is None:
+        if not GEMINI_API_KEY:
+            raise RuntimeError("GEMINI_API_KEY not set in environment for LLM calls.")
+        with _lock:
+            client = _genai_models.get(model)
+            if client is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                client = genai.GenerativeModel(model)
+                _genai_models[model] = client
+    return client
+
+def set_chat_model(client, temperature: float = 0.2, model: str = GEMINI_MODEL):
+    """Use `client` for (model, temperature) instead of Gemini (tests, benchmarks); None removes it."""
+    with _lock:
+        if client is None:
+            _chat_clients.pop((model, float(temperature)), None)
+        else:
+            _chat_clients[(model, float(temperature))] = client
+
+def set_genai_model(client, model: str = GEMINI_MODEL):
+    """Same as set_chat_model for the google.generativeai client used by rag_agent."""
+    with _lock:
+        if client is None:
+            _genai_models.pop(model, None)
+        else:
+            _genai_models[model] = client
@@ -0,0 +1,309 @@
+# src/utils/llm_gateway.py
+"""
+One gateway in front of every Gemini call (graph chains and rag_agent).
+
+  - token buckets for requests/min (LLM_RPM) and tokens/min (LLM_TPM): each
+    call reserves one request plus its estimated tokens (prompt +
+    LLM_OUTPUT_TOKENS_ESTIMATE) and waits its turn, so a burst queues on the
+    client instead of coming back as 429s; the token reservation is settled
+    with the usage the response reports
+  - rate-limit / unavailable errors are retried with full-jitter exponential
+    backoff (LLM_BACKOFF_BASE doubling up to LLM_BACKOFF_MAX, LLM_MAX_RETRIES
+    times), honouring a retry delay given by the server
+  - single flight: calls with the same key while one is in flight share that
+    upstream call and its result
+  - `gateway_stats()`, plus rag_llm_queue_depth / rag_llm_in_flight gauges in
+    tracing.metrics_text()
+
+Buckets allow a burst of a tenth of the per-minute limit, which keeps any
+rolling minute within ~10% of the quota.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+from src.utils.tracing import record, register_gauge
+from config.settings import (
+    LLM_RPM,
+    LLM_TPM,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+)
+
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+                    "InternalServerError", "RateLimitError"}
+_RETRYABLE_TEXT = ("429", "rate limit", "quota", "resource exhausted", "resource_exhausted",
+                   "503", "unavailable", "overloaded")
+_RETRY_DELAY = re.compile(r"retry(?:_delay| in| after)\D{0,20}?(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+class TokenBucket:
+    """`rate` units per second with bursts up to `capacity`; rate <= 0 means unlimited."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` now (the level may go negative); returns the seconds to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= min(amount, self.capacity)  # larger than the bucket would never fit
+            return max(0.0, -self.level / self.rate)
+
+    def settle(self, amount: float):
+        """Return (amount > 0) or take (amount < 0) units once the real cost is known."""
+        if self.rate <= 0 or not amount:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level + amount)
+
+
+def _per_minute(limit: float) -> TokenBucket:
+    return TokenBucket(limit / 60.0, max(1.0, limit / 10.0))
+
+
+def _causes(exc):
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limiting, overload or a transient server error (checked along the exception chain)."""
+    for e in _causes(exc):
+        for attr in ("status_code", "code", "status"):
+            value = getattr(e, attr, None)
+            if isinstance(value, int) and value in _RETRYABLE_STATUS:
+                return True
+        if type(e).__name__ in _RETRYABLE_NAMES:
+            return True
+        text = str(e).lower()
+        if any(s in text for s in _RETRYABLE_TEXT):
+            return True
+    return False
+
+
+def usage_tokens(result) -> int:
+    """Total tokens reported by a LangChain message or a google.generativeai response (0 if unknown)."""
+    usage = getattr(result, "usage_metadata", None)
+    if not usage:
+        return 0
+    if isinstance(usage, dict):
+        return usage.get("total_tokens") or (usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+    return getattr(usage, "total_token_count", 0) or 0
+
+
+class LLMGateway:
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, max_retries: int = LLM_MAX_RETRIES,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX):
+        self.requests = _per_minute(rpm)
+        self.tokens = _per_minute(tpm)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._inflight = {}  # key -> Future shared by the callers of that key
+        self._leaders = set()  # async leader tasks (held so they are not garbage-collected mid-call)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "upstream_calls": 0, "coalesced": 0, "retries": 0, "failures": 0,
+                       "throttled_s": 0.0, "queue_depth": 0, "max_queue_depth": 0, "in_flight": 0}
+
+    # ---------- bookkeeping ----------
+    def _add(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self._stats[k] += v
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._stats["queue_depth"])
+
+    def _join(self, key):
+        """(future, is_leader): the first caller of a key runs it, later ones wait on its future."""
+        self._add(requests=1)
+        if key is None:
+            return Future(), True
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            future.set_running_or_notify_cancel()  # from here on no caller can cancel the shared future
+            return future, True
+
+    def _finish(self, key, future: Future, result=None, error: BaseException = None):
+        if key is not None:
+            with self._lock:
+                self._inflight.pop(key, None)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _reserve(self, tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        hint = _RETRY_DELAY.search(str(error))
+        return max(delay, min(float(hint.group(1)), self.backoff_max)) if hint else delay
+
+    def _failed(self, attempt: int, tokens: int, error: Exception) -> float:
+        """Seconds to back off before retrying, or re-raise if this error / attempt is final."""
+        self.tokens.settle(tokens)  # a rejected call used no tokens
+        if attempt >= self.max_retries or not is_retryable(error):
+            self._add(failures=1)
+            raise error
+        self._add(retries=1)
+        return self._backoff(attempt, error)
+
+    def _settle(self, result, tokens: int, usage):
+        actual = usage(result) if usage else 0
+        if actual:
+            self.tokens.settle(tokens - actual)
+
+    # ---------- sync ----------
+    def _sleep(self, seconds: float, name: str):
+        self._add(queue_depth=1)
+        try:
+            time.sleep(seconds)
+        finally:
+            self._add(queue_depth=-1, throttled_s=seconds)
+        record(name, seconds)
+
+    def _upstream(self, fn, tokens: int, usage):
+        for attempt in range(self.max_retries + 1):
+            wait = self._reserve(tokens)
+            if wait:
+                self._sleep(wait, "llm.queue")
+            self._add(upstream_calls=1, in_flight=1)
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._failed(attempt, tokens, e)
+            else:
+                self._settle(result, tokens, usage)
+                return result
+            finally:
+                self._add(in_flight=-1)
+            self._sleep(delay, "llm.backoff")
+
+    def call(self, fn, key=None, tokens: int = 0, usage=usage_tokens):
+        """
+        fn() through the limiter with retries. Callers passing the same hashable
+        `key` while it runs share one upstream call. `tokens` is the estimated cost.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = self._upstream(fn, tokens, usage)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    # ---------- async ----------
+    async def _asleep(self, seconds: float, name: str):
+        self._add(queue_depth=1)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._add(queue_depth=-1, throttled_s=seconds)
+        record(name, seconds)
+
+    async def _aupstream(self, afn, tokens: int, usage):
+        for attempt in range(self.max_retries + 1):
+            wait = self._reserve(tokens)
+            if wait:
+                await self._asleep(wait, "llm.queue")
+            self._add(upstream_calls=1, in_flight=1)
+            try:
+                result = await afn()
+            except Exception as e:
+                delay = self._failed(attempt, tokens, e)
+            else:
+                self._settle(result, tokens, usage)
+                return result
+            finally:
+                self._add(in_flight=-1)
+            await self._asleep(delay, "llm.backoff")
+
+    async def acall(self, afn, key=None, tokens: int = 0, usage=usage_tokens):
+        """
+        Async call(): afn is a coroutine function; waiting never blocks the event loop.
+        With a key, the upstream call runs in its own task and every caller awaits
+        the shared result shielded: a cancelled caller (request timeout, client
+        gone) stops waiting without cancelling the call the others wait for.
+        """
+        future, leader = self._join(key)
+        if key is None:
+            return await self._aupstream(afn, tokens, usage)
+        if leader:
+            task = asyncio.ensure_future(self._alead(key, future, afn, tokens, usage))
+            self._leaders.add(task)
+            task.add_done_callback(self._leaders.discard)
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    async def _alead(self, key, future: Future, afn, tokens: int, usage):
+        try:
+            result = await self._aupstream(afn, tokens, usage)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        self._finish(key, future, result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["throttled_s"] = round(stats["throttled_s"], 3)
+        return stats
+
+
+_gateway = None
+_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        with _lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+def set_gateway(gateway: LLMGateway):
+    """Swap the process-wide gateway (tests, benchmarks)."""
+    global _gateway
+    _gateway = gateway
+
+
+def gateway_stats() -> dict:
+    return get_gateway().stats()
+
+
+register_gauge("rag_llm_queue_depth", lambda: gateway_stats()["queue_depth"],
+               "LLM calls waiting on the rate limiter or a retry backoff.")
+register_gauge("rag_llm_in_flight", lambda: gateway_stats()["in_flight"], "LLM calls currently upstream.")
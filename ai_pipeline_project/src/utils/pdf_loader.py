@@ -1,42 +1,293 @@
 # src/utils/pdf_loader.py
 """
 Loads PDF and splits text into chunks.
-Simple chunker: concatenates page texts and splits by approx token/word count.
+Chunker: sliding window of word spans over the page texts (approx token
+count), optionally snapped to sentence ends; every chunk records the page and
+character offset it starts / ends at.
+Chunk IDs are deterministic (document id + chunk text), so re-ingesting the
+same document overwrites its points instead of adding copies.
+
+Pages are streamed (`iter_pdf_pages`) and the chunker consumes them
+incrementally, so chunks come out before the last page is parsed and the
+whole document is never held as one string. Large PDFs are extracted in page
+ranges on a process pool (PDF_WORKERS / PDF_PAGES_PER_TASK). The pool is one
+per process, shared by concurrent ingestions, and its workers are started by
+forkserver (spawn where that is missing): forking a process that already runs
+threads and has torch loaded can deadlock the child.
 """
 
-from typing import List
-from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pypdf import PdfReader
-import re
+import multiprocessing
+import os
+import threading
+import time
 import uuid
 
-def _clean_text(s: str) -> str:
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+import numpy as np
 
-def load_pdf_text(pdf_path: str) -> str:
+from src.utils.tracing import span, record
+from config.settings import PDF_WORKERS, PDF_PAGES_PER_TASK, CHUNK_BOUNDARY, DEFAULT_TENANT
+
+# bump when chunk boundaries / metadata change so manifests re-ingest
+CHUNKER_VERSION = 2
+
+# fixed namespace so the same (document, text) always maps to the same point id
+_CHUNK_NAMESPACE = uuid.UUID("6f1c2d4e-8a3b-5c7d-9e0f-1a2b3c4d5e6f")
+
+def _extract_page(page) -> str:
+    try:
+        text = page.extract_text() or ""
+    except Exception:
+        return ""
+    # broken font maps can yield lone surrogates, which chunk ids / cache keys cannot UTF-8 encode
+    return text.encode("utf-8", "replace").decode("utf-8")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS or os.cpu_count() or 1,
+                                            mp_context=multiprocessing.get_context(method))
+    return _pool
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    # runs in a worker process: each worker opens its own reader
     reader = PdfReader(pdf_path)
-    pages = []
-    for p in reader.pages:
-        try:
-            pages.append(p.extract_text() or "")
-        except Exception:
-            pages.append("")
-    return "\n".join(pages)
+    return [_extract_page(reader.pages[i]) for i in range(start, stop)]
+
+def iter_pdf_pages(pdf_path: str, workers: int = PDF_WORKERS,
+                   pages_per_task: int = PDF_PAGES_PER_TASK) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) in page order, page_number starting at 1.
+    workers > 1 extracts page ranges on the shared process pool; at most
+    2 * workers ranges are in flight so memory stays bounded when the consumer
+    is slower. workers = 0 uses all cores.
+    """
+    reader = PdfReader(pdf_path)
+    n_pages = len(reader.pages)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1 or n_pages <= pages_per_task:
+        for i, page in enumerate(reader.pages):
+            yield i + 1, _extract_page(page)
+        return
+
+    global _pool
+    pool = _get_pool()
+    ranges = deque((s, min(s + pages_per_task, n_pages)) for s in range(0, n_pages, pages_per_task))
+    pending = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < 2 * workers:
+                start, stop = ranges.popleft()
+                pending.append((start, pool.submit(_extract_page_range, pdf_path, start, stop)))
+            start, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                yield start + offset + 1, text
+    except BrokenProcessPool:
+        with _pool_lock:  # a worker died; the next caller starts a fresh pool
+            if _pool is pool:
+                _pool = None
+        raise
+    finally:
+        for _, future in pending:  # consumer stopped early
+            future.cancel()
+
+def load_pdf_text(pdf_path: str) -> str:
+    return "\n".join(text for _, text in iter_pdf_pages(pdf_path))
+
+# code point lookup tables; code points past the table are never whitespace / punctuation
+_TABLE_SIZE = 0x3002
+_SPACE = np.array([chr(i).isspace() for i in range(_TABLE_SIZE)], dtype=bool)  # same set str.split() uses
+_SENTENCE_END = np.zeros(_TABLE_SIZE, dtype=bool)
+_SENTENCE_END[[ord(c) for c in ".!?"]] = True
+_CLOSER = np.zeros(_TABLE_SIZE, dtype=bool)
+_CLOSER[[ord(c) for c in "\"')]\u201d\u2019"]] = True
+
+def _word_spans(text: str):
+    """
+    Character spans of the whitespace-separated words of `text`, computed with
+    NumPy over the code points instead of building a Python string per word.
+    Returns (starts, ends, sentence_end) arrays, one entry per word.
+    """
+    # surrogatepass: extracted text can hold lone surrogates; they stay one code point each
+    codes = np.minimum(np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32), _TABLE_SIZE - 1)
+    is_word = ~_SPACE[codes]
+    padded = np.concatenate(([False], is_word, [False]))
+    starts = np.flatnonzero(is_word & ~padded[:-2])
+    ends = np.flatnonzero(is_word & ~padded[2:]) + 1
+    if len(ends) == 0:
+        return starts, ends, np.zeros(0, dtype=bool)
+    last = codes[ends - 1]
+    before = codes[np.maximum(ends - 2, 0)]
+    sentence_end = _SENTENCE_END[last] | (_CLOSER[last] & _SENTENCE_END[before] & (ends - starts >= 2))
+    return starts, ends, sentence_end
+
+class _Segment:
+    """Words [pos, len) of one page that are still inside the chunking window."""
+    __slots__ = ("page", "text", "starts", "ends", "sentence_end", "pos")
+
+    def __init__(self, page: int, text: str):
+        self.page, self.text = page, text
+        self.starts, self.ends, self.sentence_end = _word_spans(text)
+        self.pos = 0
+
+    def __len__(self):
+        return len(self.starts) - self.pos
+
+def _head(window: deque, n: int) -> list:
+    """(segment, first, stop) word ranges covering the first n words of the window."""
+    ranges = []
+    for seg in window:
+        if n <= 0:
+            break
+        take = min(n, len(seg))
+        ranges.append((seg, seg.pos, seg.pos + take))
+        n -= take
+    return ranges
+
+def _cut_point(window: deque, chunk_size: int, overlap: int, boundary: str) -> int:
+    """Number of words of the window that make up the next chunk."""
+    if boundary == "sentence":
+        # prefer the last sentence end in the final quarter of the window
+        lowest = max(overlap + 1, (chunk_size * 3) // 4)
+        if lowest <= chunk_size:
+            flags = np.concatenate([seg.sentence_end[a:b] for seg, a, b in _head(window, chunk_size)])
+            found = np.flatnonzero(flags[lowest - 1:chunk_size])
+            if len(found):
+                return lowest + int(found[-1])
+    return chunk_size
+
+def _materialize(ranges: list) -> dict:
+    """Slice the chunk out of the page texts (one slice per page) and normalize whitespace once."""
+    parts = [seg.text[seg.starts[a]:seg.ends[b - 1]] for seg, a, b in ranges]
+    first, last = ranges[0], ranges[-1]
+    return {
+        "text": " ".join(" ".join(parts).split()),
+        "page": first[0].page,
+        "offset": int(first[0].starts[first[1]]),
+        "page_end": last[0].page,
+        "offset_end": int(last[0].ends[last[2] - 1]),
+    }
+
+def _advance(window: deque, n: int):
+    """Drop the first n words from the window."""
+    while n > 0 and window:
+        seg = window[0]
+        take = min(n, len(seg))
+        seg.pos += take
+        n -= take
+        if not len(seg):
+            window.popleft()
+
+def iter_chunk_spans(pages: Iterable[Tuple[int, str]], chunk_size: int = 400, overlap: int = 50,
+                     boundary: str = "word") -> Iterator[dict]:
+    """
+    Sliding window of up to chunk_size words over a stream of (page_number, text).
+    The window only holds word offsets into the page texts; chunk text is
+    sliced out when a chunk is emitted. Yields
+    {"text", "page", "offset", "page_end", "offset_end"} (offsets are character
+    positions within the start / end page).
+
+    boundary="word" cuts every chunk_size words (step chunk_size - overlap);
+    boundary="sentence" ends a chunk at the last sentence end found in its
+    final quarter when there is one, keeping `overlap` words of context.
+    """
+    step = max(1, chunk_size - overlap)
+    window = deque()
+    size = 0
+    for page_no, text in pages:
+        seg = _Segment(page_no, text)
+        if not len(seg):
+            continue
+        window.append(seg)
+        size += len(seg)
+        while size >= chunk_size:
+            cut = _cut_point(window, chunk_size, overlap, boundary)
+            yield _materialize(_head(window, cut))
+            drop = max(1, cut - overlap)
+            _advance(window, drop)
+            size -= drop
+    # tail: same windows the whole-text version produces past the last full one
+    while size > 0:
+        yield _materialize(_head(window, chunk_size))
+        _advance(window, step)
+        size -= min(step, size)
+
+def iter_text_chunks(pages: Iterable[Tuple[int, str]], chunk_size: int = 400, overlap: int = 50) -> Iterator[str]:
+    """Chunk texts only (word boundaries), for callers that do not need provenance."""
+    for chunk in iter_chunk_spans(pages, chunk_size, overlap):
+        yield chunk["text"]
 
 def split_text_to_chunks(text: str, chunk_size: int = 400, overlap: int = 50) -> List[str]:
     """
     chunk_size measured in words (approx). Simple sliding window.
     """
-    words = text.split()
-    chunks = []
-    i = 0
-    while i < len(words):
-        chunk_words = words[i:i+chunk_size]
-        chunks.append(" ".join(chunk_words))
-        i += chunk_size - overlap
-    return [ _clean_text(c) for c in chunks if c.strip() ]
-
-def load_pdf_text_chunks(pdf_path: str, chunk_size: int = 400, overlap: int = 50):
-    text = load_pdf_text(pdf_path)
-    return [{"id": str(uuid.uuid4()), "text": chunk} for chunk in split_text_to_chunks(text, chunk_size, overlap)]
+    return list(iter_text_chunks([(1, text)], chunk_size, overlap))
+
+def _timed(iterator, stats: dict, size=len):
+    """Re-yield items, adding the time spent producing them (not consuming) to stats."""
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stats["seconds"] += time.perf_counter() - t0
+            return
+        stats["seconds"] += time.perf_counter() - t0
+        stats["items"] += 1
+        stats["bytes"] += size(item)
+        yield item
+
+def document_key(document_id: str, tenant_id: str = None) -> str:
+    """Collection-wide document key: the id itself for the default tenant, else 'tenant/id'."""
+    if not tenant_id or tenant_id == DEFAULT_TENANT:
+        return document_id
+    return f"{tenant_id}/{document_id}"
+
+def chunk_id(document_id: str, text: str) -> str:
+    """Stable Qdrant point id (UUID) for a chunk of a given document."""
+    return str(uuid.uuid5(_CHUNK_NAMESPACE, f"{document_id}\n{text}"))
+
+def iter_pdf_text_chunks(pdf_path: str, chunk_size: int = 400, overlap: int = 50,
+                         document_id: str = None, workers: int = PDF_WORKERS,
+                         boundary: str = CHUNK_BOUNDARY) -> Iterator[dict]:
+    """
+    Stream {"id", "text", "meta"} chunks while pages are still being extracted.
+    meta carries document_id plus page / offset provenance for citations.
+    document_id defaults to the file name, so a revised upload of the same file
+    keeps the ids of every chunk whose text did not change.
+    Identical chunks within a document collapse to one (same id).
+    """
+    document_id = document_id or os.path.basename(pdf_path)
+    seen = set()
+    parsing = {"seconds": 0.0, "items": 0, "bytes": 0}
+    chunking = {"seconds": 0.0, "items": 0, "bytes": 0}
+    pages = _timed(iter_pdf_pages(pdf_path, workers), parsing, size=lambda p: len(p[1]))
+    chunks = _timed(iter_chunk_spans(pages, chunk_size, overlap, boundary), chunking, size=lambda c: len(c["text"]))
+    for chunk in chunks:
+        text = chunk.pop("text")
+        cid = chunk_id(document_id, text)
+        if cid in seen:
+            continue
+        seen.add(cid)
+        yield {"id": cid, "text": text, "meta": {"document_id": document_id, **chunk}}
+    # chunker time excludes the page extraction it pulled through
+    record("pdf.parse", parsing["seconds"], items=parsing["items"], bytes=parsing["bytes"])
+    record("pdf.chunk", chunking["seconds"] - parsing["seconds"], items=chunking["items"], bytes=chunking["bytes"])
+
+def load_pdf_text_chunks(pdf_path: str, chunk_size: int = 400, overlap: int = 50, document_id: str = None,
+                         boundary: str = CHUNK_BOUNDARY):
+    with span("load_pdf_text_chunks") as s:
+        chunks = list(iter_pdf_text_chunks(pdf_path, chunk_size, overlap, document_id, boundary=boundary))
+        s["items"] = len(chunks)
+    return chunks
@@ -1,55 +1,169 @@
 # src/utils/qdrant_helper.py
-from qdrant_client import QdrantClient
-from qdrant_client.http import models as rest
-from config.settings import QDRANT_URL, QDRANT_API_KEY, EMBEDDING_MODEL
+"""
+Vector-store helpers used by the pipelines.
+The actual store (Qdrant server or the embedded index) comes from
+vector_store.get_store(), selected by VECTOR_BACKEND in config/settings.py.
+
+Collections are created on demand with the embedding model's dimension and
+the QDRANT_* storage settings (quantization, on-disk vectors, HNSW); nothing
+here drops an existing collection. `migrate_collection` applies changed
+storage settings to a collection that already exists.
+"""
+import asyncio
+import threading
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
-
-_client = None
-_model = None
-
-def _get_client():
-    global _client
-    if _client is None:
-        url = QDRANT_URL
-        api_key = QDRANT_API_KEY
-        if api_key:
-            _client = QdrantClient(url=url, api_key=api_key, prefer_grpc=False)
-        else:
-            _client = QdrantClient(url=url)
-    return _client
-
-def _get_model():
-    global _model
-    if _model is None:
-        _model = SentenceTransformer(EMBEDDING_MODEL)  # Use same model everywhere
-    return _model
+
+from config.settings import EMBEDDING_MODEL, QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+from src.utils.encoder import get_encoder
+from src.utils.cache import TTLCache, normalize_text
+from src.utils.vector_store import get_store, _check_dimension
+from src.utils.tracing import span
+
+# normalized query text -> float32 query vector (repeats skip the encoder)
+_query_cache = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+
+# keyword payload fields every chunk carries; indexed so per-tenant /
+# per-document searches do not scan the whole collection
+PAYLOAD_INDEX_FIELDS = ("tenant_id", "document_id")
+_indexed = set()   # (store id, collection)
+_index_lock = threading.Lock()
 
 def collection_exists(collection_name: str) -> bool:
-    client = _get_client()
-    try:
-        return any(c.name == collection_name for c in client.get_collections().collections)
-    except Exception:
-        return False
-
-def create_collection(collection_name: str, vector_size: int = 384):
-    client = _get_client()
-    client.recreate_collection(
-        collection_name=collection_name,
-        vectors_config=rest.VectorParams(size=vector_size, distance=rest.Distance.COSINE)
-    )
+    return get_store().collection_exists(collection_name)
+
+def embedding_dimension() -> int:
+    return get_encoder().get_sentence_embedding_dimension()
+
+def create_collection(collection_name: str, vector_size: int = None):
+    """Create the collection if missing (vector_size defaults to the embedding model's); never drops data."""
+    if vector_size is None:
+        vector_size = embedding_dimension()
+    store = get_store()
+    if not store.collection_exists(collection_name):
+        with _index_lock:
+            _indexed.discard((id(store), collection_name))  # a dropped and re-created collection
+    store.create_collection(collection_name, vector_size)
+    ensure_payload_indexes(collection_name)
+
+def ensure_payload_indexes(collection_name: str):
+    """Create the PAYLOAD_INDEX_FIELDS indexes once per collection (idempotent on the store)."""
+    store = get_store()
+    key = (id(store), collection_name)
+    if key in _indexed:
+        return
+    with _index_lock:
+        if key in _indexed:
+            return
+        for field in PAYLOAD_INDEX_FIELDS:
+            store.create_payload_index(collection_name, field)
+        _indexed.add(key)
+
+def migrate_collection(collection_name: str, vector_size: int = None) -> dict:
+    """
+    Bring an existing collection to the current QDRANT_* storage settings in place
+    (no re-embedding), or create it. A different embedding dimension cannot be
+    migrated in place: point QDRANT_COLLECTION at a new collection and the
+    ingestion manifest re-ingests documents there on their next use.
+    """
+    if vector_size is None:
+        vector_size = embedding_dimension()
+    store = get_store()
+    if not store.collection_exists(collection_name):
+        create_collection(collection_name, vector_size)
+        return {"created": True, "vector_size": vector_size}
+    _check_dimension(collection_name, store.vector_size(collection_name), vector_size)
+    applied = store.configure_collection(collection_name)
+    ensure_payload_indexes(collection_name)
+    return {"created": False, "vector_size": vector_size, **applied}
 
 def upsert_documents(collection_name: str, items: list):
-    client = _get_client()
-    points = [
-        rest.PointStruct(id=it["id"], vector=it["vector"], payload=it.get("payload", {}))
-        for it in items
-    ]
-    client.upsert(collection_name=collection_name, points=points)
-
-def search(collection_name: str, query_text: str, top_k: int = 4):
-    model = _get_model()
-    qvec = model.encode([query_text])[0].tolist()
-    client = _get_client()
-    hits = client.search(collection_name=collection_name, query_vector=qvec, limit=top_k)
-    return [{"id": h.id, "score": h.score, "payload": h.payload} for h in hits]
+    if not items:
+        return
+    vectors = np.stack([np.asarray(it["vector"], dtype=np.float32) for it in items])
+    with span("upsert_documents", items=len(items), bytes=vectors.nbytes):
+        get_store().upsert(
+            collection_name,
+            [it["id"] for it in items],
+            vectors,
+            [it.get("payload", {}) for it in items],
+        )
+
+def upsert_batch(collection_name: str, ids: list, vectors, payloads: list):
+    """Column-oriented upsert of one batch; vectors is an (n, dim) float32 array."""
+    with span("upsert", items=len(ids), bytes=getattr(vectors, "nbytes", 0)):
+        get_store().upsert(collection_name, ids, vectors, payloads)
+
+def delete_points(collection_name: str, ids: list):
+    get_store().delete(collection_name, ids)
+
+def update_payloads(collection_name: str, ids: list, payloads: list):
+    """Patch payload fields of existing points (no re-embedding)."""
+    get_store().update_payloads(collection_name, ids, payloads)
+
+def embed_query(query_text: str) -> np.ndarray:
+    """Query vector (float32), served from the LRU cache when the same question was seen recently."""
+    with span("embed_query") as s:
+        key = (EMBEDDING_MODEL, normalize_text(query_text))
+        qvec = _query_cache.get(key)
+        s["cache_hit"] = qvec is not None
+        if qvec is None:
+            qvec = get_encoder().encode([query_text], convert_to_numpy=True)[0].astype(np.float32)
+            qvec.setflags(write=False)  # shared between callers
+            if QUERY_CACHE_SIZE > 0:
+                _query_cache.set(key, qvec)
+        return qvec
+
+def embed_queries(texts: list, batch_size: int = 64) -> np.ndarray:
+    """
+    Query vectors for many texts: cached ones are reused, the rest go through
+    the encoder in a few large batches instead of one call per text. The new
+    vectors are cached, so later `embed_query` calls for the same texts hit.
+    """
+    with span("embed_query", items=len(texts), batch=True) as s:
+        keys = [(EMBEDDING_MODEL, normalize_text(t)) for t in texts]
+        vectors = [_query_cache.get(k) for k in keys]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        s["cache_hit"] = not missing
+        if missing:
+            encoded = get_encoder().encode(missing, batch_size=batch_size, show_progress_bar=False,
+                                           convert_to_numpy=True).astype(np.float32)
+            fresh = {}
+            for text, vec in zip(missing, encoded):
+                vec.setflags(write=False)
+                fresh[normalize_text(text)] = vec
+                if QUERY_CACHE_SIZE > 0:
+                    _query_cache.set((EMBEDDING_MODEL, normalize_text(text)), vec)
+            vectors = [v if v is not None else fresh[k[1]] for v, k in zip(vectors, keys)]
+        if not vectors:
+            return np.zeros((0, embedding_dimension()), dtype=np.float32)
+        return np.stack(vectors)
+
+def query_cache_stats() -> dict:
+    return _query_cache.stats()
+
+def _hit_bytes(hits: list) -> int:
+    return sum(len((h.get("payload") or {}).get("text", "")) for h in hits)
+
+def search(collection_name: str, query_text: str, top_k: int = 4, filters: dict = None):
+    """filters: {payload field: value or [values]}, e.g. {"tenant_id": "acme", "document_id": [...]}."""
+    qvec = embed_query(query_text)
+    with span("search", top_k=top_k, filtered=bool(filters)) as s:
+        hits = get_store().search(collection_name, qvec, top_k, filters)
+        s.update(items=len(hits), bytes=_hit_bytes(hits))
+        return hits
+
+def search_batch(collection_name: str, query_texts: list, top_k: int = 4, filters: dict = None) -> list:
+    """search() for many queries: one batched encode and one batched store request."""
+    qvecs = embed_queries(query_texts)
+    with span("search", top_k=top_k, filtered=bool(filters), batch=len(query_texts)) as s:
+        results = get_store().search_batch(collection_name, qvecs, top_k, filters)
+        s.update(items=sum(len(h) for h in results), bytes=sum(_hit_bytes(h) for h in results))
+        return results
+
+async def asearch(collection_name: str, query_text: str, top_k: int = 4, filters: dict = None):
+    qvec = await asyncio.to_thread(embed_query, query_text)  # encoder is CPU-bound
+    with span("search", top_k=top_k, filtered=bool(filters)) as s:
+        hits = await get_store().asearch(collection_name, qvec, top_k, filters)
+        s.update(items=len(hits), bytes=_hit_bytes(hits))
+        return hits
@@ -0,0 +1,95 @@
+# src/utils/startup.py
+"""
+Keeping process start cheap.
+
+torch (via sentence_transformers), qdrant_client, google.generativeai and
+langchain_google_genai take seconds to import. The modules that use them
+import them at first use instead (inside get_encoder / get_gemini_chat /
+QdrantStore, or through `lazy_module`), so importing the app, the graph or
+an agent — and every test — only pays for what a request actually touches.
+
+`import_report` measures that: it imports modules in a fresh interpreter
+with `-X importtime` and returns the per-module cost.
+
+    python -m src.utils.startup src.app src.server --top 15
+"""
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+from typing import List
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "qdrant_client", "google.generativeai",
+                 "langchain_google_genai")
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class lazy_module:
+    """Module stand-in that imports `name` on first attribute access (`rest = lazy_module("pkg.mod")`)."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def _parse_importtime(stderr: str) -> List[dict]:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip())) // 2,
+                     "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return rows
+
+
+def import_report(modules: List[str], top: int = 20) -> dict:
+    """
+    Import `modules` in a fresh interpreter. Returns:
+      - 'total_ms': cumulative time of the requested imports
+      - 'modules': {module: cumulative ms} for each requested module
+      - 'slowest': the `top` costliest imports by self time
+      - 'heavy_loaded': the HEAVY_MODULES that ended up imported
+    """
+    probe = "import sys\n" + "".join(f"import {m}\n" for m in modules) + (
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [_ROOT, os.environ.get("PYTHONPATH")]))}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=_ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    rows = _parse_importtime(proc.stderr)
+    # the interpreter's own startup imports come first; the first requested module may already be among them
+    requested = {r["module"]: r["cumulative_ms"] for r in rows if r["module"] in modules and r["depth"] == 0}
+    return {
+        "total_ms": round(sum(requested.values()), 1),
+        "modules": {m: round(ms, 1) for m, ms in requested.items()},
+        "slowest": sorted(rows, key=lambda r: -r["self_ms"])[:top],
+        "heavy_loaded": [m for m in proc.stdout.strip().split(",") if m],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-module import cost of the given modules.")
+    parser.add_argument("modules", nargs="*", default=["src.app"])
+    parser.add_argument("--top", type=int, default=20, help="slowest imports to list")
+    args = parser.parse_args(argv)
+
+    report = import_report(args.modules, args.top)
+    for module, ms in report["modules"].items():
+        print(f"{ms:10.1f} ms  {module}")
+    print(f"{report['total_ms']:10.1f} ms  total")
+    print(f"heavy modules loaded: {', '.join(report['heavy_loaded']) or 'none'}\n")
+    print(f"{'self ms':>10}  {'cumul. ms':>10}  module")
+    for r in report["slowest"]:
+        print(f"{r['self_ms']:10.1f}  {r['cumulative_ms']:10.1f}  {r['module']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,263 @@
+# src/utils/tracing.py
+"""
+Built-in per-stage instrumentation.
+
+    with span("search", top_k=4) as s:
+        hits = ...
+        s["items"] = len(hits)
+
+Every finished span:
+  - updates process-wide metrics (count / latency histogram per span name,
+    plus counters for the conventional attributes below), exported in the
+    Prometheus text format by `metrics_text()`
+  - is appended to the active trace, if any. Graph nodes run inside
+    `collect()`, and the spans they record end up in the returned state
+    under "trace"; each node's trace is also logged as one JSON line on the
+    "src.trace" logger (TRACE_LOG).
+
+Conventional span attributes (anything else is kept in the trace only):
+  cache_hit: bool      -> rag_cache_requests_total{span, result="hit"|"miss"}
+  tokens_in/tokens_out -> rag_tokens_total{span, direction="in"|"out"}
+  bytes: int           -> rag_payload_bytes_total{span}
+  items: int           -> rag_items_total{span}
+
+Point-in-time values (queue depths and the like) are exported as gauges:
+`register_gauge(name, fn)` samples fn() whenever metrics_text() runs.
+
+With TRACING_ENABLED=false, `span()` returns a shared no-op object.
+"""
+
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+
+from config.settings import TRACING_ENABLED, TRACE_LOG
+
+logger = logging.getLogger("src.trace")
+
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_trace = contextvars.ContextVar("rag_trace", default=None)
+_parent = contextvars.ContextVar("rag_span_parent", default=None)
+
+
+class Trace:
+    """Spans recorded while this trace was active (possibly from several threads)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            self.spans.append(record)
+
+    def extend(self, records: list):
+        with self._lock:
+            self.spans.extend(records)
+
+
+class _Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = {}      # name -> {"count", "errors", "sum", "buckets": [...]}
+            self.counters = {}   # (metric, labels tuple) -> value
+
+    def observe(self, name: str, seconds: float, error: bool, attrs: dict):
+        with self._lock:
+            m = self.spans.get(name)
+            if m is None:
+                m = self.spans[name] = {"count": 0, "errors": 0, "sum": 0.0, "buckets": [0] * len(_BUCKETS)}
+            m["count"] += 1
+            m["errors"] += error
+            m["sum"] += seconds
+            i = bisect.bisect_left(_BUCKETS, seconds)
+            if i < len(_BUCKETS):
+                m["buckets"][i] += 1
+            if not attrs:
+                return
+            if "cache_hit" in attrs:
+                self._inc("rag_cache_requests_total", (("span", name), ("result", "hit" if attrs["cache_hit"] else "miss")), 1)
+            for key, direction in (("tokens_in", "in"), ("tokens_out", "out")):
+                if attrs.get(key):
+                    self._inc("rag_tokens_total", (("span", name), ("direction", direction)), attrs[key])
+            if attrs.get("bytes"):
+                self._inc("rag_payload_bytes_total", (("span", name),), attrs["bytes"])
+            if attrs.get("items"):
+                self._inc("rag_items_total", (("span", name),), attrs["items"])
+
+    def _inc(self, metric: str, labels: tuple, value):
+        key = (metric, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+
+_metrics = _Metrics()
+_gauges = {}  # metric name -> (help, fn)
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start", "_token")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> dict:
+        self._token = _parent.set(self.name)
+        self.start = time.perf_counter()
+        return self.attrs
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _parent.reset(self._token)
+        _finish(self.name, self.start, end, self.attrs, exc_type is not None, _parent.get())
+        return False
+
+
+class _NoopAttrs(dict):
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NoopSpan:
+    _attrs = _NoopAttrs()
+
+    def __enter__(self):
+        return self._attrs
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def _finish(name, start, end, attrs, error, parent):
+    seconds = end - start
+    _metrics.observe(name, seconds, error, attrs)
+    trace = _trace.get()
+    if trace is not None:
+        record = {"name": name, "ms": round(seconds * 1000, 3),
+                  "start_ms": round((start - trace.started) * 1000, 3)}
+        if parent:
+            record["parent"] = parent
+        if error:
+            record["error"] = True
+        record.update(attrs)
+        trace.add(record)
+
+
+def span(name: str, **attrs):
+    """Time a block; the yielded dict collects attributes for the span."""
+    if not TRACING_ENABLED:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def record(name: str, seconds: float, **attrs):
+    """Record a span that was timed elsewhere (e.g. in another process)."""
+    if TRACING_ENABLED:
+        end = time.perf_counter()
+        _finish(name, end - seconds, end, attrs, False, _parent.get())
+
+
+class collect:
+    """Context manager: spans recorded inside (same context / copied contexts) go to a new Trace."""
+
+    def __init__(self, name: str = None):
+        self.name = name
+        self.trace = Trace()
+
+    def __enter__(self) -> Trace:
+        self._token = _trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _trace.reset(self._token)
+        if TRACE_LOG and self.name and self.trace.spans:
+            logger.info(json.dumps({"event": "trace", "scope": self.name, "spans": self.trace.spans}, default=str))
+        return False
+
+
+def register_gauge(name: str, fn, help: str = ""):
+    """Export fn() (a number) as the gauge `name` in metrics_text()."""
+    _gauges[name] = (help, fn)
+
+
+def current_trace():
+    return _trace.get()
+
+
+def estimate_tokens(text) -> int:
+    """Rough token count (~4 characters per token) when the provider does not report usage."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _labels(labels: tuple) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def metrics_text() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _metrics._lock:
+        spans = {k: {**v, "buckets": list(v["buckets"])} for k, v in _metrics.spans.items()}
+        counters = dict(_metrics.counters)
+
+    lines = [
+        "# HELP rag_span_seconds Wall time of pipeline stages and graph nodes.",
+        "# TYPE rag_span_seconds histogram",
+    ]
+    for name in sorted(spans):
+        m = spans[name]
+        cumulative = 0
+        for bound, n in zip(_BUCKETS, m["buckets"]):
+            cumulative += n
+            lines.append(f'rag_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'rag_span_seconds_bucket{{span="{name}",le="+Inf"}} {m["count"]}')
+        lines.append(f'rag_span_seconds_sum{{span="{name}"}} {m["sum"]:.6f}')
+        lines.append(f'rag_span_seconds_count{{span="{name}"}} {m["count"]}')
+    lines += ["# HELP rag_span_errors_total Spans that raised.", "# TYPE rag_span_errors_total counter"]
+    for name in sorted(spans):
+        lines.append(f'rag_span_errors_total{{span="{name}"}} {spans[name]["errors"]}')
+
+    metrics = sorted({metric for metric, _ in counters})
+    for metric in metrics:
+        lines.append(f"# TYPE {metric} counter")
+        for (m, labels), value in sorted(counters.items()):
+            if m == metric:
+                lines.append(f"{metric}{_labels(labels)} {value}")
+
+    for name, (help_text, fn) in sorted(_gauges.items()):
+        try:
+            value = fn()
+        except Exception:
+            continue  # a broken gauge must not break the scrape
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def metrics_snapshot() -> dict:
+    """Per span name: count, errors, total and mean milliseconds."""
+    with _metrics._lock:
+        return {
+            name: {"count": m["count"], "errors": m["errors"], "total_ms": round(m["sum"] * 1000, 3),
+                   "mean_ms": round(m["sum"] * 1000 / m["count"], 3) if m["count"] else 0.0}
+            for name, m in _metrics.spans.items()
+        }
+
+
+def reset_metrics():
+    _metrics.reset()
@@ -0,0 +1,278 @@
+# src/utils/vector_store.py
+"""
+Vector-store backends behind the functions in qdrant_helper.
+
+Every backend implements the small `VectorStore` interface below. The one
+used by the pipeline is picked by VECTOR_BACKEND in config/settings.py:
+  - "qdrant":   remote Qdrant server (QDRANT_URL), the default
+  - "embedded": in-process NumPy index on a memory-mapped file
+                (see embedded_store.py), no server needed
+
+`create_collection` never drops data: an existing collection is kept as-is
+(and a dimension mismatch is an error). Dropping is the explicit
+`delete_collection`.
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+
+from src.utils.startup import lazy_module
+from config.settings import (
+    QDRANT_URL,
+    QDRANT_API_KEY,
+    QDRANT_ON_DISK,
+    QDRANT_QUANTIZATION,
+    QDRANT_QUANTIZATION_RESCORE,
+    QDRANT_QUANTIZATION_OVERSAMPLING,
+    QDRANT_HNSW_M,
+    QDRANT_HNSW_EF_CONSTRUCT,
+    QDRANT_HNSW_EF,
+    VECTOR_BACKEND,
+    EMBEDDED_STORE_PATH,
+)
+
+rest = lazy_module("qdrant_client.http.models")  # qdrant_client is imported with the first Qdrant call
+
+
+class VectorStore:
+    """Interface used by qdrant_helper. Vectors are float32 arrays, one row per point."""
+
+    def collection_exists(self, collection_name: str) -> bool:
+        raise NotImplementedError
+
+    def create_collection(self, collection_name: str, vector_size: int):
+        """Create the collection if missing; an existing one with the same dimension is left untouched."""
+        raise NotImplementedError
+
+    def vector_size(self, collection_name: str) -> int:
+        raise NotImplementedError
+
+    def delete_collection(self, collection_name: str):
+        raise NotImplementedError
+
+    def configure_collection(self, collection_name: str) -> dict:
+        """Apply the backend's storage / index settings to an existing collection; returns them."""
+        return {}
+
+    def upsert(self, collection_name: str, ids: list, vectors: np.ndarray, payloads: list):
+        raise NotImplementedError
+
+    def delete(self, collection_name: str, ids: list):
+        raise NotImplementedError
+
+    def update_payloads(self, collection_name: str, ids: list, payloads: list):
+        """Merge each payload dict into its point's payload, leaving vectors untouched."""
+        raise NotImplementedError
+
+    def create_payload_index(self, collection_name: str, field_name: str):
+        """Index a keyword payload field so filtered searches only touch matching points."""
+        raise NotImplementedError
+
+    def search(self, collection_name: str, vector: np.ndarray, top_k: int = 4, filters: dict = None) -> list:
+        """
+        Returns [{"id", "score", "payload"}] sorted by descending score.
+        filters: {field: value or [values]}; a point matches if, for every field,
+        its payload value is one of the given values.
+        """
+        raise NotImplementedError
+
+    async def asearch(self, collection_name: str, vector: np.ndarray, top_k: int = 4, filters: dict = None) -> list:
+        """Async search; by default the blocking `search` runs in a worker thread."""
+        return await asyncio.to_thread(self.search, collection_name, vector, top_k, filters)
+
+    def search_batch(self, collection_name: str, vectors: np.ndarray, top_k: int = 4, filters: dict = None) -> list:
+        """One hit list per row of `vectors` (same filters for all); by default one `search` per row."""
+        return [self.search(collection_name, v, top_k, filters) for v in vectors]
+
+
+def _as_list(vector):
+    # vectors travel as float32 numpy arrays; JSON needs plain floats
+    return vector.tolist() if isinstance(vector, np.ndarray) else list(vector)
+
+
+def _filter_values(value) -> list:
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+def _qdrant_filter(filters: dict):
+    if not filters:
+        return None
+    must = []
+    for field, value in filters.items():
+        values = _filter_values(value)
+        match = rest.MatchValue(value=values[0]) if len(values) == 1 else rest.MatchAny(any=values)
+        must.append(rest.FieldCondition(key=field, match=match))
+    return rest.Filter(must=must)
+
+
+class DimensionMismatch(ValueError):
+    pass
+
+
+def _check_dimension(collection_name: str, existing: int, wanted: int):
+    if existing != wanted:
+        raise DimensionMismatch(
+            f"Collection '{collection_name}' holds {existing}-d vectors but {wanted}-d were requested; "
+            f"ingest into a new QDRANT_COLLECTION or delete_collection() it first"
+        )
+
+
+_QUANTIZATION_KINDS = ("none", "scalar", "product")
+
+
+def _quantization_config(kind: str):
+    if kind not in _QUANTIZATION_KINDS:
+        raise ValueError(f"Unknown QDRANT_QUANTIZATION '{kind}' (expected one of {_QUANTIZATION_KINDS})")
+    # quantized copies stay in RAM; full vectors (possibly on disk) are only read to rescore
+    if kind == "scalar":
+        return rest.ScalarQuantization(scalar=rest.ScalarQuantizationConfig(
+            type=rest.ScalarType.INT8, quantile=0.99, always_ram=True))
+    if kind == "product":
+        return rest.ProductQuantization(product=rest.ProductQuantizationConfig(
+            compression=rest.CompressionRatio.X16, always_ram=True))
+    return None
+
+
+class QdrantStore(VectorStore):
+    def __init__(self, url: str = QDRANT_URL, api_key: str = QDRANT_API_KEY,
+                 on_disk: bool = QDRANT_ON_DISK, quantization: str = QDRANT_QUANTIZATION,
+                 rescore: bool = QDRANT_QUANTIZATION_RESCORE,
+                 oversampling: float = QDRANT_QUANTIZATION_OVERSAMPLING,
+                 hnsw_m: int = QDRANT_HNSW_M, hnsw_ef_construct: int = QDRANT_HNSW_EF_CONSTRUCT,
+                 hnsw_ef: int = QDRANT_HNSW_EF):
+        self.url = url
+        self.api_key = api_key
+        self.on_disk = on_disk
+        self.quantization = quantization
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construct = hnsw_ef_construct
+        self._quantization_config = _quantization_config(quantization)
+        quant_params = (rest.QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+                        if self._quantization_config is not None else None)
+        self._search_params = (rest.SearchParams(hnsw_ef=hnsw_ef or None, quantization=quant_params)
+                               if hnsw_ef or quant_params else None)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from qdrant_client import QdrantClient
+            if self.api_key:
+                self._client = QdrantClient(url=self.url, api_key=self.api_key, prefer_grpc=False)
+            else:
+                self._client = QdrantClient(url=self.url)
+        return self._client
+
+    def collection_exists(self, collection_name: str) -> bool:
+        # a timeout / connection error raises: callers must not take an outage for a missing collection
+        return self.client.collection_exists(collection_name)
+
+    def _hnsw_config(self):
+        return rest.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct, on_disk=self.on_disk)
+
+    def create_collection(self, collection_name: str, vector_size: int):
+        if self.collection_exists(collection_name):
+            _check_dimension(collection_name, self.vector_size(collection_name), vector_size)
+            return
+        self.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=rest.VectorParams(size=vector_size, distance=rest.Distance.COSINE, on_disk=self.on_disk),
+            hnsw_config=self._hnsw_config(),
+            quantization_config=self._quantization_config,
+            on_disk_payload=self.on_disk,
+        )
+
+    def vector_size(self, collection_name: str) -> int:
+        return self.client.get_collection(collection_name).config.params.vectors.size
+
+    def delete_collection(self, collection_name: str):
+        self.client.delete_collection(collection_name=collection_name)
+
+    def configure_collection(self, collection_name: str) -> dict:
+        # Qdrant applies these in place and rebuilds segments in the background
+        self.client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": rest.VectorParamsDiff(on_disk=self.on_disk)},
+            hnsw_config=self._hnsw_config(),
+            quantization_config=self._quantization_config or rest.Disabled.DISABLED,
+            collection_params=rest.CollectionParamsDiff(on_disk_payload=self.on_disk),
+        )
+        return {"on_disk": self.on_disk, "quantization": self.quantization,
+                "hnsw_m": self.hnsw_m, "hnsw_ef_construct": self.hnsw_ef_construct}
+
+    def upsert(self, collection_name: str, ids: list, vectors, payloads: list):
+        self.client.upsert(
+            collection_name=collection_name,
+            points=rest.Batch(ids=list(ids), vectors=_as_list(vectors), payloads=list(payloads)),
+        )
+
+    def delete(self, collection_name: str, ids: list):
+        self.client.delete(collection_name=collection_name, points_selector=rest.PointIdsList(points=list(ids)))
+
+    def update_payloads(self, collection_name: str, ids: list, payloads: list):
+        self.client.batch_update_points(
+            collection_name=collection_name,
+            update_operations=[
+                rest.SetPayloadOperation(set_payload=rest.SetPayload(payload=payload, points=[pid]))
+                for pid, payload in zip(ids, payloads)
+            ],
+        )
+
+    def create_payload_index(self, collection_name: str, field_name: str):
+        self.client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=rest.PayloadSchemaType.KEYWORD,
+        )
+
+    def search(self, collection_name: str, vector, top_k: int = 4, filters: dict = None) -> list:
+        hits = self.client.query_points(
+            collection_name=collection_name,
+            query=_as_list(vector),
+            query_filter=_qdrant_filter(filters),
+            search_params=self._search_params,
+            limit=top_k,
+        ).points
+        return [{"id": h.id, "score": h.score, "payload": h.payload} for h in hits]
+
+    def search_batch(self, collection_name: str, vectors, top_k: int = 4, filters: dict = None) -> list:
+        if not len(vectors):
+            return []
+        query_filter = _qdrant_filter(filters)
+        responses = self.client.query_batch_points(
+            collection_name=collection_name,
+            requests=[
+                rest.QueryRequest(query=_as_list(v), filter=query_filter, params=self._search_params,
+                                  limit=top_k, with_payload=True)
+                for v in vectors
+            ],
+        )
+        return [[{"id": h.id, "score": h.score, "payload": h.payload} for h in r.points] for r in responses]
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_store() -> VectorStore:
+    """Process-wide store for VECTOR_BACKEND."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                if VECTOR_BACKEND == "embedded":
+                    from src.utils.embedded_store import EmbeddedStore
+                    _store = EmbeddedStore(EMBEDDED_STORE_PATH)
+                elif VECTOR_BACKEND == "qdrant":
+                    _store = QdrantStore()
+                else:
+                    raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}' (expected 'qdrant' or 'embedded')")
+    return _store
+
+
+def set_store(store: VectorStore):
+    """Swap the process-wide store (tests, benchmarks)."""
+    global _store
+    _store = store
@@ -0,0 +1,22 @@
+# tests/conftest.py
+import pytest
+
+from src.utils import llm_gateway, embedding_cache
+
+
+@pytest.fixture(autouse=True)
+def unlimited_llm_gateway():
+    # tests talk to fake chat models: no client-side quota (test_llm_gateway builds its own)
+    previous = llm_gateway._gateway
+    llm_gateway.set_gateway(llm_gateway.LLMGateway(rpm=0, tpm=0))
+    yield
+    llm_gateway.set_gateway(previous)
+
+
+@pytest.fixture(autouse=True)
+def no_embedding_cache():
+    # fake encoders must not fill the persistent cache (test_embedding_cache builds its own)
+    previous = embedding_cache._cache
+    embedding_cache.set_embedding_cache(None)
+    yield
+    embedding_cache.set_embedding_cache(previous)
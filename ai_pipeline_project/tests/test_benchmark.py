@@ -0,0 +1,28 @@
+# tests/test_benchmark.py
+"""
+The offline benchmark runs end to end without network and flags regressions.
+"""
+import copy
+
+from src.evaluation import benchmark
+from src.utils import encoder, vector_store
+
+
+def test_benchmark_runs_offline():
+    models_before, store_before = dict(encoder._models), vector_store._store
+    report = benchmark.run(pages=(2,), questions=3)
+    run = report["runs"]["2p"]
+    assert run["ingest"]["chunks"] > 0 and set(run["ingest"]["stages_s"]) == {"parse", "chunk", "embed", "upsert"}
+    for name in ("graph_rag", "graph_weather", "rag_agent"):
+        q = run["queries"][name]
+        assert q["n"] == 3 and q["p50_ms"] <= q["p99_ms"] and not q.get("errors")
+    assert run["queries"]["graph_rag"]["stages_ms"]["search"] > 0
+    # the process-wide encoder / store are put back afterwards
+    assert encoder._models == models_before and vector_store._store is store_before
+
+    slower = copy.deepcopy(report)
+    slower["runs"]["2p"]["queries"]["graph_rag"]["p95_ms"] += 100
+    slower["runs"]["2p"]["ingest"]["chunks_per_sec"] /= 2
+    flagged = {r["metric"] for r in benchmark.compare(slower, report)}
+    assert flagged == {"2p.queries.graph_rag.p95_ms", "2p.ingest.chunks_per_sec"}
+    assert benchmark.compare(report, report) == []
@@ -0,0 +1,56 @@
+# tests/test_cache.py
+"""
+In-process caches: LRU eviction, TTL expiry and hit/miss accounting.
+"""
+import time
+
+from src.utils.cache import TTLCache, normalize_text
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1      # "a" becomes most recent
+    cache.set("c", 3)               # evicts "b"
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = TTLCache(maxsize=4, ttl=0.01)
+    cache.set("q", "v")
+    time.sleep(0.02)
+    assert cache.get("q") is None and len(cache) == 0
+
+
+def test_normalize_text():
+    assert normalize_text("  What IS   the\ttopic? ") == "what is the topic?"
+
+
+def test_answer_cache_exact_semantic_and_scope(tmp_path):
+    from src.utils.answer_cache import AnswerCache, cache_scope
+
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), max_entries=10, similarity=0.9)
+    scope = cache_scope("doc-v1", ["c1", "c2"], "template", "model")
+    cache.put(scope, "What is the budget?", "42 crore", query_vector=[1.0, 0.0])
+
+    assert cache.get(scope, "  what is the BUDGET? ") == "42 crore"
+    # paraphrase with a close embedding, same retrieved context
+    assert cache.get(scope, "How large is the budget?", query_vector=[0.99, 0.05]) == "42 crore"
+    assert cache.get(scope, "Who wrote it?", query_vector=[0.0, 1.0]) is None
+    # a new document version is a different scope
+    other = cache_scope("doc-v2", ["c1", "c2"], "template", "model")
+    assert cache.get(other, "What is the budget?", query_vector=[1.0, 0.0]) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_answer_cache_evicts_least_recently_used(tmp_path):
+    from src.utils.answer_cache import AnswerCache
+
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), max_entries=2)
+    for q in ("q1", "q2", "q3"):
+        cache.put("scope", q, q.upper())
+    assert cache.stats()["size"] == 2
+    assert cache.get("scope", "q1") is None and cache.get("scope", "q3") == "Q3"
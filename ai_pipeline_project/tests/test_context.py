@@ -0,0 +1,34 @@
+# tests/test_context.py
+"""
+Context assembly: overlapping chunks merge, duplicates drop, the budget holds.
+"""
+from src.pipelines.context import assemble_context, estimate_tokens
+from src.utils.pdf_loader import iter_chunk_spans
+
+
+def _hits(text, chunk_size=20, overlap=5):
+    hits = []
+    for i, c in enumerate(iter_chunk_spans([(1, text)], chunk_size, overlap)):
+        meta = {k: c[k] for k in ("page", "offset", "page_end", "offset_end")}
+        hits.append({"id": f"c{i}", "score": 0.9 - i * 0.01, "payload": {"text": c["text"], "document_id": "d", **meta}})
+    return hits
+
+
+def test_overlapping_chunks_merge_and_duplicates_drop():
+    text = " ".join(f"w{i}" for i in range(50))
+    hits = _hits(text)
+    hits.append({"id": "dup", "score": 0.5, "payload": dict(hits[0]["payload"], offset=None)})  # re-ingested copy
+
+    ctx = assemble_context(hits, token_budget=0)
+    assert [p["text"] for p in ctx["passages"]] == [text]
+    assert ctx["dropped"] == ["dup"]
+    assert ctx["tokens"] == estimate_tokens(text) and ctx["tokens_saved"] > 0
+
+
+def test_budget_packs_in_score_order():
+    a = _hits(" ".join(f"a{i}" for i in range(20)))[0]
+    b = {"id": "b", "score": 0.95, "payload": {"text": " ".join(f"b{i}" for i in range(200)), "document_id": "e"}}
+    c = {"id": "c", "score": 0.7, "payload": {"text": "short note", "document_id": "f"}}
+    ctx = assemble_context([a, b, c], token_budget=estimate_tokens(b["payload"]["text"]) + 10)
+    assert [p["ids"] for p in ctx["passages"]] == [["b"], ["c"]]  # a no longer fits, c still does
+    assert ctx["dropped"] == ["c0"] and ctx["tokens"] <= estimate_tokens(b["payload"]["text"]) + 10
@@ -0,0 +1,101 @@
+# tests/test_embedded_store.py
+"""
+Embedded vector index: same contract as the Qdrant backend, no server.
+"""
+import numpy as np
+import pytest
+
+from src.utils.embedded_store import EmbeddedStore
+from src.utils.vector_store import DimensionMismatch
+
+
+def _vec(*xs):
+    return np.asarray(xs, dtype=np.float32)
+
+
+def test_upsert_search_delete_and_reopen(tmp_path):
+    store = EmbeddedStore(str(tmp_path))
+    assert not store.collection_exists("docs")
+    store.create_collection("docs", 3)
+
+    store.upsert("docs", ["a", "b", "c"],
+                 np.stack([_vec(1, 0, 0), _vec(0, 1, 0), _vec(0.9, 0.1, 0)]),
+                 [{"text": "A"}, {"text": "B"}, {"text": "C"}])
+    hits = store.search("docs", _vec(1, 0, 0), top_k=2)
+    assert [h["id"] for h in hits] == ["a", "c"]
+    assert abs(hits[0]["score"] - 1.0) < 1e-6
+
+    # upsert of an existing id overwrites in place, delete hides the row
+    store.upsert("docs", ["c"], _vec(0, 0, 1)[None, :], [{"text": "C2"}])
+    store.delete("docs", ["a"])
+    hits = store.search("docs", _vec(1, 0, 0), top_k=5)
+    assert sorted(h["id"] for h in hits) == ["b", "c"]
+
+    # a new process sees the same data
+    reopened = EmbeddedStore(str(tmp_path))
+    hits = reopened.search("docs", _vec(0, 0, 1), top_k=1)
+    assert hits[0]["id"] == "c" and hits[0]["payload"] == {"text": "C2"}
+
+
+def test_repeated_ids_in_one_batch_use_one_row(tmp_path):
+    store = EmbeddedStore(str(tmp_path))
+    store.create_collection("docs", 3)
+    store.upsert("docs", ["a", "a"], np.stack([_vec(1, 0, 0), _vec(0.9, 0.1, 0)]),
+                 [{"text": "first"}, {"text": "last"}])
+    hits = store.search("docs", _vec(1, 0, 0), top_k=5)
+    assert [(h["id"], h["payload"]["text"]) for h in hits] == [("a", "last")]
+
+    store.delete("docs", ["a"])
+    assert store.search("docs", _vec(1, 0, 0), top_k=5) == []
+    assert EmbeddedStore(str(tmp_path)).search("docs", _vec(1, 0, 0), top_k=5) == []
+
+
+def test_grows_past_initial_capacity(tmp_path):
+    store = EmbeddedStore(str(tmp_path))
+    store.create_collection("docs", 4)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((3000, 4)).astype(np.float32)
+    store.upsert("docs", [str(i) for i in range(3000)], vectors, [{} for _ in range(3000)])
+    assert store.search("docs", vectors[2500], top_k=1)[0]["id"] == "2500"
+
+
+def test_filtered_search_uses_payload_indexes(tmp_path):
+    store = EmbeddedStore(str(tmp_path))
+    store.create_collection("docs", 2)
+    store.create_payload_index("docs", "tenant_id")
+    store.create_payload_index("docs", "document_id")
+    store.upsert("docs", ["a1", "a2", "b1", "c1"],
+                 np.stack([_vec(1, 0), _vec(0.8, 0.2), _vec(1, 0.01), _vec(1, 0)]),
+                 [{"tenant_id": "acme", "document_id": "a.pdf"}, {"tenant_id": "acme", "document_id": "a.pdf"},
+                  {"tenant_id": "acme", "document_id": "b.pdf"}, {"tenant_id": "other", "document_id": "a.pdf"}])
+
+    hits = store.search("docs", _vec(1, 0), top_k=5, filters={"tenant_id": "acme", "document_id": ["a.pdf"]})
+    assert [h["id"] for h in hits] == ["a1", "a2"]
+    hits = store.search("docs", _vec(1, 0), top_k=1, filters={"tenant_id": "acme"})
+    assert [h["id"] for h in hits] == ["a1"]
+    # unindexed fields fall back to a payload scan
+    assert store.search("docs", _vec(1, 0), filters={"lang": "de"}) == []
+
+    # the index follows payload patches and deletes, and survives a reopen
+    store.update_payloads("docs", ["a2"], [{"document_id": "b.pdf"}])
+    store.delete("docs", ["b1"])
+    reopened = EmbeddedStore(str(tmp_path))
+    assert reopened._get("docs").indexes.keys() == {"tenant_id", "document_id"}
+    hits = reopened.search("docs", _vec(1, 0), filters={"document_id": "b.pdf"})
+    assert [h["id"] for h in hits] == ["a2"]
+
+
+def test_create_collection_never_drops_data(tmp_path):
+    store = EmbeddedStore(str(tmp_path))
+    store.create_collection("docs", 2)
+    store.upsert("docs", ["a"], _vec(1, 0)[None, :], [{"text": "A"}])
+
+    store.create_collection("docs", 2)
+    assert [h["id"] for h in store.search("docs", _vec(1, 0))] == ["a"]
+    with pytest.raises(DimensionMismatch):
+        store.create_collection("docs", 3)
+
+    store.delete_collection("docs")
+    assert not store.collection_exists("docs")
+    store.create_collection("docs", 3)
+    assert store.vector_size("docs") == 3 and store.search("docs", _vec(1, 0, 0)) == []
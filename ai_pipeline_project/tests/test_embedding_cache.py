@@ -0,0 +1,85 @@
+# tests/test_embedding_cache.py
+"""
+Chunk embeddings are cached on disk by (model, text hash): texts seen before
+skip the encoder, across cache instances and collection rebuilds.
+"""
+import threading
+
+import numpy as np
+
+from src.evaluation.benchmark import HashEncoder, Timings
+from src.pipelines import embedding_pipeline
+from src.utils import embedding_cache, encoder
+from src.utils.embedding_cache import EmbeddingCache, text_key
+
+
+def test_cache_persists_grows_and_survives_a_torn_write(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedding_cache, "_MIN_CAPACITY", 4)
+    cache = EmbeddingCache(str(tmp_path), model="m")
+    texts = [f"chunk {i}" for i in range(10)]
+    vectors = np.random.default_rng(0).random((10, 8), dtype=np.float32)
+    assert cache.put_many([text_key(t) for t in texts[:6]], vectors[:6]) == 6
+    assert cache.put_many([text_key(t) for t in texts], vectors) == 4  # grows past the initial 4 rows
+
+    with open(cache._keys_path, "ab") as f:
+        f.write(b"torn")  # an interrupted key write
+    reopened = EmbeddingCache(str(tmp_path), model="m")
+    got, missing = reopened.get_many([text_key(t) for t in texts + ["new"]])
+    assert missing == [10] and np.array_equal(got[:10], vectors)
+    assert reopened.stats()["entries"] == 10
+
+    assert EmbeddingCache(str(tmp_path), model="other").get_many([text_key("chunk 0")]) == (None, [0])
+
+
+def test_writers_sharing_a_directory_keep_keys_and_rows_aligned(monkeypatch, tmp_path):
+    # one instance per writer, each with its own lock file handle, as separate processes would have
+    monkeypatch.setattr(embedding_cache, "_MIN_CAPACITY", 4)
+    writers = [EmbeddingCache(str(tmp_path), model="m") for _ in range(4)]
+    texts = [f"chunk {i}" for i in range(120)]
+    vectors = np.random.default_rng(1).random((120, 8), dtype=np.float32)
+
+    def write(w):
+        for start in range(w * 10, 120, 30):  # overlapping batches, interleaved with the others
+            writers[w].put_many([text_key(t) for t in texts[start:start + 15]], vectors[start:start + 15])
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    reopened = EmbeddingCache(str(tmp_path), model="m")
+    got, missing = reopened.get_many([text_key(t) for t in texts])
+    assert missing == [] and np.array_equal(got, vectors)
+    assert reopened.stats()["entries"] == 120
+    assert writers[0].put_many([text_key(texts[0])], vectors[:1]) == 0
+
+    writers[1].clear()  # another writer starts over: the rest notice on their next write
+    assert writers[2].put_many([text_key("fresh")], vectors[:1]) == 1
+    got, missing = EmbeddingCache(str(tmp_path), model="m").get_many([text_key("fresh"), text_key(texts[0])])
+    assert missing == [1] and np.array_equal(got[0], vectors[0])
+
+
+def test_reingest_encodes_only_new_texts(monkeypatch, tmp_path):
+    timings = Timings()
+    model = HashEncoder(timings)
+    encoded = []
+    original_encode = model.encode
+
+    def counting_encode(texts, **kwargs):
+        encoded.extend(texts)
+        return original_encode(texts, **kwargs)
+    monkeypatch.setattr(model, "encode", counting_encode)
+    monkeypatch.setattr(encoder, "_models", {})
+    encoder.set_encoder(model)
+    embedding_cache.set_embedding_cache(EmbeddingCache(str(tmp_path)))
+
+    docs = [{"id": i, "text": f"shared boilerplate {i}"} for i in range(5)]
+    first = embedding_pipeline.chunks_to_embeddings(docs)
+    revised = docs[:4] + [{"id": 9, "text": "a revised paragraph"}]
+    second = embedding_pipeline.chunks_to_embeddings(revised)
+
+    assert encoded == [d["text"] for d in docs] + ["a revised paragraph"]
+    for a, b in zip(first[:4], second[:4]):
+        assert np.array_equal(a["vector"], b["vector"])
+    assert np.allclose(second[4]["vector"], original_encode(["a revised paragraph"])[0])
+    assert embedding_cache.embedding_cache_stats()["hits"] == 4
@@ -0,0 +1,46 @@
+# tests/test_embedding_pipeline.py
+"""
+Streaming ingestion: a chunk generator is encoded and upserted batch by batch,
+float32 all the way, with one upsert in flight behind the encoder.
+"""
+import threading
+import time
+
+import numpy as np
+
+from src.evaluation.benchmark import HashEncoder, Timings
+from src.pipelines import embedding_pipeline
+from src.utils import encoder
+
+
+def test_generator_is_upserted_in_float32_batches_one_at_a_time(monkeypatch):
+    monkeypatch.setattr(encoder, "_models", {})
+    encoder.set_encoder(HashEncoder(Timings()))
+    lock, in_flight, produced, upserts, collections = threading.Lock(), [0], [0], [], []
+
+    def slow_upsert(collection, ids, vectors, payloads):
+        with lock:
+            in_flight[0] += 1
+            upserts.append({"ids": ids, "dtype": vectors.dtype, "shape": vectors.shape,
+                            "in_flight": in_flight[0], "produced": produced[0]})
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+    monkeypatch.setattr(embedding_pipeline, "upsert_batch", slow_upsert)
+    monkeypatch.setattr(embedding_pipeline, "create_collection", lambda name, size: collections.append(size))
+
+    def chunks():
+        for i in range(10):
+            produced[0] += 1
+            yield {"id": f"c{i}", "text": f"chunk number {i}", "meta": {"page": 1}}
+
+    progress = []
+    stats = embedding_pipeline.stream_embeddings_upsert(chunks(), batch_size=4, on_progress=progress.append)
+
+    assert [u["ids"] for u in upserts] == [[f"c{i}" for i in range(s, min(s + 4, 10))] for s in (0, 4, 8)]
+    assert all(u["dtype"] == np.float32 for u in upserts) and upserts[0]["shape"][1] == collections[0]
+    assert max(u["in_flight"] for u in upserts) == 1
+    # the generator is pulled one batch ahead of the upserts, not drained up front
+    assert upserts[0]["produced"] <= 8
+    assert [(p["chunks"], p["batches"]) for p in progress] == [(4, 1), (8, 2), (10, 3)]
+    assert stats["chunks"] == 10 and stats["batches"] == 3 and len(collections) == 1
@@ -0,0 +1,62 @@
+# tests/test_encoder.py
+"""
+One sentence-transformer per (model, device) per process: concurrent first
+calls load it once, and ingestion and query embedding share the instance.
+"""
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+from src.pipelines import embedding_pipeline
+from src.utils import encoder, qdrant_helper
+
+
+class FakeSentenceTransformer:
+    loads = []
+
+    def __init__(self, model_name, device=None):
+        time.sleep(0.05)  # a slow load widens the race
+        self.loads.append((model_name, device))
+        self.calls = []
+
+    def get_sentence_embedding_dimension(self):
+        self.calls.append("dimension")
+        return 4
+
+    def encode(self, texts, **kwargs):
+        self.calls.append("encode")
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_concurrent_first_calls_load_once_and_share_the_model(monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer))
+    monkeypatch.setattr(FakeSentenceTransformer, "loads", [])
+    monkeypatch.setattr(encoder, "_models", {})
+
+    keys = [("m", None), ("m", "cpu")] * 8
+    start, got = threading.Barrier(len(keys)), [None] * len(keys)
+
+    def first_call(i):
+        start.wait()
+        got[i] = encoder.get_encoder(*keys[i])
+    threads = [threading.Thread(target=first_call, args=(i,)) for i in range(len(keys))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(FakeSentenceTransformer.loads, key=str) == [("m", "cpu"), ("m", None)]
+    for key in set(keys):
+        assert len({id(m) for m, k in zip(got, keys) if k == key}) == 1
+    assert got[0] is not got[1]
+
+    # query embedding and ingestion go through the same default-model instance
+    qdrant_helper.embedding_dimension()
+    embedding_pipeline._encode_model(["a chunk"])
+    model = encoder.get_encoder()
+    assert model.calls == ["dimension", "encode"]
+    assert len(FakeSentenceTransformer.loads) == 3
@@ -0,0 +1,19 @@
+# tests/test_graph.py
+"""
+The compiled graph and the LLM clients are built once per process.
+"""
+import src.utils.llm as llm
+from src.graph import flow
+
+
+def test_graph_compiled_once():
+    assert flow.get_graph() is flow.get_graph()
+
+
+def test_llm_clients_pooled(monkeypatch):
+    monkeypatch.setattr(llm, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "_chat_clients", {})
+    monkeypatch.setattr(flow, "_chains", {})
+    assert llm.get_gemini_chat(0.2) is llm.get_gemini_chat(temperature=0.2)
+    assert llm.get_gemini_chat(0.0) is not llm.get_gemini_chat(0.2)
+    assert flow.get_chain("rag", 0.2) is flow.get_chain("rag", 0.2)
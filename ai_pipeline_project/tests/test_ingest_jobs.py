@@ -0,0 +1,194 @@
+# tests/test_ingest_jobs.py
+"""
+Uploads are stored content-addressed and ingested by background jobs;
+questions wait for the job instead of ingesting.
+"""
+import asyncio
+import itertools
+import threading
+
+import pytest
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+import src.pipelines.ingest_jobs as jobs
+import src.pipelines.ingestion as ingestion
+import src.utils.pdf_loader as pdf_loader
+from src.graph import flow
+
+
+def _isolate(monkeypatch, tmp_path, ingest):
+    monkeypatch.setattr(jobs, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(jobs, "ensure_pdf_ingested", ingest)
+    monkeypatch.setattr(jobs, "_jobs", {})
+    monkeypatch.setattr(jobs, "_futures", {})
+    monkeypatch.setattr(jobs, "_by_key", {})
+    monkeypatch.setattr(jobs, "_pruned", jobs.OrderedDict())
+
+
+def test_uploads_are_content_addressed(monkeypatch, tmp_path):
+    _isolate(monkeypatch, tmp_path, None)
+    a = jobs.store_upload(b"%PDF-1 first", "report.pdf")
+    b = jobs.store_upload(b"%PDF-1 second", "report.pdf")
+    again = jobs.store_upload(b"%PDF-1 first", "other-name.pdf")
+
+    assert a["path"] != b["path"] and a["document_id"] != b["document_id"]
+    assert again["path"] == a["path"]
+    # a stable id makes the second content a revision of the same document
+    assert jobs.store_upload(b"%PDF-1 second", "report.pdf", document_id="report")["document_id"] == "report"
+    with open(a["path"], "rb") as f:
+        assert f.read() == b"%PDF-1 first"
+
+
+def test_job_runs_once_and_questions_wait_for_it(monkeypatch, tmp_path):
+    release, calls = threading.Event(), []
+
+    def slow_ingest(path, document_id=None, tenant_id=None):
+        calls.append(path)
+        release.wait(5)
+        return {"document_id": document_id, "tenant_id": tenant_id, "sha256": "abc",
+                "cached": False, "added": 3, "removed": 0, "moved": 0}
+
+    _isolate(monkeypatch, tmp_path, slow_ingest)
+    upload = jobs.store_upload(b"%PDF-1 body", "report.pdf")
+    job = jobs.submit_ingestion(upload["path"], document_id=upload["document_id"], sha256=upload["sha256"])
+    # a rerun / second user with the same file reuses the job
+    assert jobs.submit_ingestion(upload["path"], document_id=upload["document_id"], sha256=upload["sha256"]) == job
+    assert jobs.job_status(job)["state"] in ("queued", "running")
+
+    release.set()
+    record = jobs.wait_for_job(job, timeout=5)
+    assert record["document_id"] == upload["document_id"] and record["tenant_id"] == "default"
+    status = jobs.job_status(job)
+    assert status["state"] == "done" and status["result"]["added"] == 3
+    assert jobs.wait_for_job(job) is record and len(calls) == 1
+    assert [j["id"] for j in jobs.list_jobs("done")] == [job]
+
+
+def test_rag_node_uses_the_job_instead_of_ingesting(monkeypatch, tmp_path):
+    record = {"document_id": "report.pdf@abc", "tenant_id": "default", "sha256": "abc",
+              "cached": False, "added": 1, "removed": 0, "moved": 0}
+    _isolate(monkeypatch, tmp_path, lambda path, **kw: record)
+    job = jobs.submit_ingestion(str(tmp_path / "report.pdf"))
+
+    scopes = []
+    llm = GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="It covers Q3.")))
+    monkeypatch.setattr(flow, "get_chain", lambda name, temperature: flow._PROMPTS[name] | llm)
+    monkeypatch.setattr(flow, "SPECULATIVE_RETRIEVAL", False)
+    monkeypatch.setattr(flow, "get_answer_cache", lambda: None)
+    monkeypatch.setattr(flow, "ensure_pdf_ingested", lambda *a, **k: (_ for _ in ()).throw(AssertionError("ingested")))
+    monkeypatch.setattr(flow, "retrieve_top_k", lambda q, top_k=4, **scope: scopes.append(scope) or
+                        [{"id": "c1", "score": 0.9, "payload": {"text": "The report covers Q3."}}])
+
+    out = flow.build_graph().invoke({"question": "summarize the pdf", "pdf_path": str(tmp_path / "report.pdf"),
+                                     "ingest_job": job})
+    assert out["answer"] == "It covers Q3." and not out.get("error")
+    assert scopes == [{"document_ids": ["report.pdf@abc"], "tenant_id": "default"}]
+
+
+def test_cancelled_waiter_does_not_kill_the_job(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    release = threading.Event()
+
+    def slow_ingest(path, document_id=None, tenant_id=None):
+        release.wait(5)
+        return {"document_id": document_id, "tenant_id": tenant_id, "sha256": path,
+                "cached": False, "added": 1, "removed": 0, "moved": 0}
+
+    _isolate(monkeypatch, tmp_path, slow_ingest)
+    monkeypatch.setattr(jobs, "_executor", ThreadPoolExecutor(max_workers=1))
+    running = jobs.submit_ingestion(str(tmp_path / "a.pdf"), document_id="a")
+    queued = jobs.submit_ingestion(str(tmp_path / "b.pdf"), document_id="b")  # waits behind the first
+
+    async def impatient():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(jobs.await_job(queued), 0.05)
+    asyncio.run(impatient())
+
+    assert jobs.job_status(queued)["state"] == "queued"
+    assert jobs.submit_ingestion(str(tmp_path / "b.pdf"), document_id="b") == queued
+    release.set()
+    assert jobs.wait_for_job(queued, timeout=5)["document_id"] == "b"
+    assert jobs.wait_for_job(running, timeout=5)["document_id"] == "a"
+    assert jobs.job_status(queued)["state"] == "done"
+
+
+def test_pruned_job_ids_still_resolve(monkeypatch, tmp_path):
+    calls = []
+
+    def ingest(path, document_id=None, tenant_id=None):
+        calls.append((path, document_id, tenant_id))
+        if document_id == "bad":
+            raise RuntimeError("unreadable")
+        return {"document_id": document_id, "tenant_id": tenant_id, "sha256": path,
+                "cached": bool(calls[:-1].count(calls[-1])), "added": 1, "removed": 0, "moved": 0}
+
+    _isolate(monkeypatch, tmp_path, ingest)
+    monkeypatch.setattr(jobs, "MAX_JOBS", 1)
+    first = jobs.submit_ingestion(str(tmp_path / "a.pdf"), document_id="a")
+    jobs.wait_for_job(first, timeout=5)
+    failed = jobs.submit_ingestion(str(tmp_path / "x.pdf"), document_id="bad")
+    with pytest.raises(RuntimeError):
+        jobs.wait_for_job(failed, timeout=5)
+    # the failure pruned the done job; its id still answers, from the manifest
+    assert jobs.list_jobs() and first not in [j["id"] for j in jobs.list_jobs()]
+    assert jobs.job_status(first)["state"] == "done"
+    assert jobs.wait_for_job(first)["cached"] is True
+    assert asyncio.run(jobs.await_job(first))["document_id"] == "a"
+    assert calls[-1] == (str(tmp_path / "a.pdf"), "a", "default")
+
+    jobs.submit_ingestion(str(tmp_path / "c.pdf"), document_id="c")
+    jobs.wait_for_job(jobs.list_jobs()[0]["id"], timeout=5)
+    with pytest.raises(KeyError):  # a pruned failure is gone: resubmit it
+        jobs.wait_for_job(failed)
+
+
+def test_jobs_for_different_documents_run_at_the_same_time(monkeypatch, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # the real ensure_pdf_ingested, with the parser and the store patched out
+    _isolate(monkeypatch, tmp_path, ingestion.ensure_pdf_ingested)
+    monkeypatch.setattr(jobs, "_executor", ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(ingestion, "INGEST_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(ingestion, "_manifest", None)
+    monkeypatch.setattr(ingestion, "collection_exists", lambda name: True)
+    monkeypatch.setattr(ingestion, "iter_pdf_text_chunks", lambda path, size, overlap, document_id: (
+        {"id": pdf_loader.chunk_id(document_id, t), "text": t} for t in ["intro", "results"]))
+    both_embedding = threading.Barrier(2, timeout=5)
+
+    def upsert(chunks, **kw):
+        list(chunks)
+        both_embedding.wait()  # breaks (and fails both jobs) unless the two ingests overlap
+    monkeypatch.setattr(ingestion, "ensure_embeddings_upsert", upsert)
+
+    ids = []
+    for name in ("big.pdf", "small.pdf"):
+        upload = jobs.store_upload(b"%PDF-1 " + name.encode(), name)
+        ids.append(jobs.submit_ingestion(upload["path"], document_id=upload["document_id"], sha256=upload["sha256"]))
+    records = [jobs.wait_for_job(job, timeout=10) for job in ids]
+    assert [r["cached"] for r in records] == [False, False]
+
+
+def test_async_rag_ingests_a_new_pdf_on_the_ingestion_pool(monkeypatch, tmp_path):
+    threads = []
+    record = {"document_id": "report.pdf", "tenant_id": "default", "sha256": "abc",
+              "cached": False, "added": 1, "removed": 0, "moved": 0}
+    _isolate(monkeypatch, tmp_path, lambda path, **kw: threads.append(threading.current_thread().name) or record)
+    llm = GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="It covers Q3.")))
+    monkeypatch.setattr(flow, "get_chain", lambda name, temperature: flow._PROMPTS[name] | llm)
+    monkeypatch.setattr(flow, "SPECULATIVE_RETRIEVAL", False)
+    monkeypatch.setattr(flow, "get_answer_cache", lambda: None)
+    monkeypatch.setattr(flow, "ingested_record", lambda path, **kw: None)  # not ingested yet
+    monkeypatch.setattr(flow, "ensure_pdf_ingested", lambda *a, **k: (_ for _ in ()).throw(AssertionError("inline")))
+
+    async def aretrieve(q, top_k=4, **scope):
+        return [{"id": "c1", "score": 0.9, "payload": {"text": "The report covers Q3."}}]
+    monkeypatch.setattr(flow, "aretrieve_top_k", aretrieve)
+
+    out = asyncio.run(flow.build_graph().ainvoke({"question": "summarize the pdf",
+                                                  "pdf_path": str(tmp_path / "report.pdf")}))
+    assert out["answer"] == "It covers Q3." and not out.get("error")
+    assert len(threads) == 1 and threads[0].startswith("ingest")
+    assert [j["state"] for j in jobs.list_jobs()] == ["done"]
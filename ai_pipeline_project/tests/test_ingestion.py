@@ -0,0 +1,130 @@
+# tests/test_ingestion.py
+"""
+Ingestion manifest: a PDF is parsed/embedded once, later questions hit the manifest.
+No Qdrant or embedding model needed: the store-facing calls are patched out.
+"""
+import os
+import threading
+
+import src.pipelines.ingestion as ingestion
+import src.utils.pdf_loader as pdf_loader
+
+PDF = os.path.join(os.path.dirname(__file__), "..", "data", "pdfs", "Abstract SIH 2023final.pdf")
+
+
+def _isolate(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingestion, "INGEST_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(ingestion, "_manifest", None)
+    monkeypatch.setattr(ingestion, "collection_exists", lambda name: True)
+    upserts, deletes = [], []
+    monkeypatch.setattr(ingestion, "ensure_embeddings_upsert", lambda chunks, **kw: upserts.append(list(chunks)))
+    monkeypatch.setattr(ingestion, "delete_points", lambda name, ids: deletes.append(sorted(ids)))
+    return upserts, deletes
+
+
+def test_second_ingest_is_a_manifest_hit(monkeypatch, tmp_path):
+    upserts, _ = _isolate(monkeypatch, tmp_path)
+
+    first = ingestion.ensure_pdf_ingested(PDF)
+    second = ingestion.ensure_pdf_ingested(PDF)
+
+    assert first["cached"] is False and second["cached"] is True
+    assert len(upserts) == 1
+    assert first["sha256"] == second["sha256"]
+
+
+def test_manifest_survives_restart(monkeypatch, tmp_path):
+    upserts, _ = _isolate(monkeypatch, tmp_path)
+    ingestion.ensure_pdf_ingested(PDF)
+
+    # simulate a new process: drop the in-memory copy
+    monkeypatch.setattr(ingestion, "_manifest", None)
+    assert ingestion.ensure_pdf_ingested(PDF)["cached"] is True
+    # different chunking params are a different manifest key
+    assert ingestion.ensure_pdf_ingested(PDF, chunk_size=200)["cached"] is False
+    assert len(upserts) == 2
+
+
+def test_revised_document_only_touches_the_diff(monkeypatch, tmp_path):
+    upserts, deletes = _isolate(monkeypatch, tmp_path)
+    pdf = tmp_path / "report.pdf"
+
+    def fake_chunks(texts):
+        return lambda path, size, overlap, document_id: (
+            {"id": pdf_loader.chunk_id(document_id, t), "text": t} for t in texts
+        )
+
+    pdf.write_bytes(b"v1")
+    monkeypatch.setattr(ingestion, "iter_pdf_text_chunks", fake_chunks(["intro", "methods", "results"]))
+    ingestion.ensure_pdf_ingested(str(pdf))
+
+    pdf.write_bytes(b"v2")
+    monkeypatch.setattr(ingestion, "iter_pdf_text_chunks", fake_chunks(["intro", "methods", "discussion"]))
+    info = ingestion.ensure_pdf_ingested(str(pdf))
+
+    assert [c["text"] for c in upserts[-1]] == ["discussion"]
+    assert deletes == [[pdf_loader.chunk_id("report.pdf", "results")]]
+    assert (info["added"], info["removed"]) == (1, 1)
+
+
+def test_chunk_ids_are_stable_and_scoped_to_document():
+    assert pdf_loader.chunk_id("a.pdf", "same text") == pdf_loader.chunk_id("a.pdf", "same text")
+    assert pdf_loader.chunk_id("a.pdf", "same text") != pdf_loader.chunk_id("b.pdf", "same text")
+
+
+def test_tenants_are_isolated_and_documents_can_be_deleted(monkeypatch, tmp_path):
+    upserts, deletes = _isolate(monkeypatch, tmp_path)
+    pdf = tmp_path / "report.pdf"
+    pdf.write_bytes(b"v1")
+    monkeypatch.setattr(ingestion, "iter_pdf_text_chunks", lambda path, size, overlap, document_id: (
+        {"id": pdf_loader.chunk_id(document_id, t), "text": t} for t in ["intro", "results"]
+    ))
+
+    ingestion.ensure_pdf_ingested(str(pdf))
+    acme = ingestion.ensure_pdf_ingested(str(pdf), tenant_id="acme")
+
+    # same file under another tenant: separate chunk ids, tenant in every payload
+    assert acme["cached"] is False and len(upserts) == 2
+    assert {c["id"] for c in upserts[0]}.isdisjoint(c["id"] for c in upserts[1])
+    assert all(c["meta"] == {"document_id": "report.pdf", "tenant_id": "acme"} for c in upserts[1])
+    assert [d["tenant_id"] for d in ingestion.list_documents()] == ["acme", "default"]
+    assert [d["document_id"] for d in ingestion.list_documents("acme")] == ["report.pdf"]
+
+    assert ingestion.delete_document("report.pdf", tenant_id="acme") is True
+    assert deletes == [sorted(acme["chunk_ids"])]
+    assert ingestion.delete_document("report.pdf", tenant_id="acme") is False
+    assert [d["tenant_id"] for d in ingestion.list_documents()] == ["default"]
+
+    # re-ingest re-embeds everything even though the manifest says it is current
+    again = ingestion.reingest_document(str(pdf))
+    assert (again["cached"], again["added"], again["removed"]) == (False, 2, 0)
+
+
+def test_manifest_hits_do_not_wait_for_another_documents_ingest(monkeypatch, tmp_path):
+    upserts, _ = _isolate(monkeypatch, tmp_path)
+    monkeypatch.setattr(ingestion, "iter_pdf_text_chunks", lambda path, size, overlap, document_id: (
+        {"id": pdf_loader.chunk_id(document_id, t), "text": t} for t in ["intro", "results"]))
+    small, big = tmp_path / "small.pdf", tmp_path / "big.pdf"
+    small.write_bytes(b"small")
+    big.write_bytes(b"big")
+    ingestion.ensure_pdf_ingested(str(small))
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_upsert(chunks, **kw):
+        started.set()
+        release.wait(5)
+        upserts.append(list(chunks))  # the big document is only done from here on
+    monkeypatch.setattr(ingestion, "ensure_embeddings_upsert", slow_upsert)
+    ingesting = threading.Thread(target=ingestion.ensure_pdf_ingested, args=(str(big),))
+    ingesting.start()
+    assert started.wait(5)
+
+    # answered while the other ingest is still held inside its upsert
+    assert ingestion.ensure_pdf_ingested(str(small))["cached"] is True
+    assert [d["document_id"] for d in ingestion.list_documents()] == ["small.pdf"]
+    assert len(upserts) == 1
+    release.set()
+    ingesting.join(5)
+    assert ingestion.ensure_pdf_ingested(str(big))["cached"] is True and len(upserts) == 2
+    assert ingestion._document_locks == {}
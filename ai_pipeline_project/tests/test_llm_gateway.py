@@ -0,0 +1,113 @@
+# tests/test_llm_gateway.py
+"""
+LLM gateway: token-bucket pacing, retry with backoff, single-flight coalescing.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.utils.llm_gateway import LLMGateway, TokenBucket, is_retryable
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+def test_bucket_paces_after_the_burst():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve(1) == 0 and bucket.reserve(1) == 0
+    assert 0.08 < bucket.reserve(1) <= 0.1
+    bucket.settle(1)  # e.g. the call used fewer tokens than reserved
+    assert bucket.reserve(1) <= 0.1
+
+
+def test_identical_in_flight_calls_are_coalesced():
+    gateway, calls, gate = LLMGateway(rpm=0, tpm=0), [], threading.Event()
+
+    def upstream():
+        calls.append(1)
+        gate.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(gateway.call, upstream, key="same prompt") for _ in range(5)]
+        while gateway.stats()["requests"] < 5:
+            time.sleep(0.01)
+        gate.set()
+        assert [f.result() for f in futures] == ["answer"] * 5
+    stats = gateway.stats()
+    assert len(calls) == 1 and stats["coalesced"] == 4 and stats["upstream_calls"] == 1
+    # nothing in flight any more: the next call goes upstream again
+    assert gateway.call(upstream, key="same prompt") == "answer" and len(calls) == 2
+
+
+def test_rate_limit_errors_are_retried_with_backoff():
+    gateway = LLMGateway(rpm=0, tpm=0, max_retries=3, backoff_base=0.01, backoff_max=0.05)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited("429 Resource has been exhausted (e.g. check quota).")
+        return "ok"
+
+    assert gateway.call(flaky) == "ok"
+    assert gateway.stats()["retries"] == 2 and len(attempts) == 3
+
+    with pytest.raises(ValueError):
+        gateway.call(lambda: (_ for _ in ()).throw(ValueError("bad prompt")))
+    assert gateway.stats()["failures"] == 1 and gateway.stats()["retries"] == 2
+    assert is_retryable(RuntimeError("wrapped")) is False
+    try:
+        raise RuntimeError("RAG call failed") from RateLimited("slow down")
+    except RuntimeError as e:
+        assert is_retryable(e)
+
+
+def test_async_calls_queue_on_the_request_bucket():
+    gateway = LLMGateway(rpm=1200, tpm=0)  # 20/s after a burst of 120
+
+    async def upstream(i):
+        return i
+
+    async def main():
+        return await asyncio.gather(*(gateway.acall(lambda i=i: upstream(i), key=i) for i in range(124)))
+
+    started = time.perf_counter()
+    assert asyncio.run(main()) == list(range(124))
+    assert time.perf_counter() - started >= 0.15
+    stats = gateway.stats()
+    assert stats["upstream_calls"] == 124 and stats["max_queue_depth"] >= 1 and stats["throttled_s"] > 0
+
+
+def test_cancelled_callers_do_not_cancel_the_shared_call():
+    gateway, calls = LLMGateway(rpm=0, tpm=0), []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def upstream():
+            calls.append(1)
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.ensure_future(gateway.acall(upstream, key="k"))
+        follower = asyncio.ensure_future(gateway.acall(upstream, key="k"))
+        other = asyncio.ensure_future(gateway.acall(upstream, key="k"))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        leader.cancel()  # e.g. the request that started the call timed out
+        await asyncio.sleep(0.01)
+        release.set()
+        assert await other == "answer"
+        for task in (leader, follower):
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        assert await gateway.acall(upstream, key="k") == "answer"  # the key is free again
+
+    asyncio.run(main())
+    stats = gateway.stats()
+    assert len(calls) == 2 and stats["coalesced"] == 2 and stats["failures"] == 0
@@ -0,0 +1,83 @@
+# tests/test_pdf_loader.py
+"""
+Span-based chunker: word windows match the classic split/join sliding window,
+sentence mode snaps to sentence ends, and provenance points back into the page.
+Pages stream into the chunker, and the shared extraction pool keeps page order.
+"""
+from src.evaluation.benchmark import make_pdf
+from src.utils import pdf_loader
+from src.utils.pdf_loader import iter_chunk_spans, iter_pdf_pages, split_text_to_chunks
+
+
+def _sliding_window(text, chunk_size, overlap):
+    words, chunks, i = text.split(), [], 0
+    while i < len(words):
+        chunks.append(" ".join(words[i:i + chunk_size]))
+        i += chunk_size - overlap
+    return chunks
+
+
+def test_word_mode_matches_sliding_window():
+    text = "\n".join(" ".join(f"w{p}_{i}" for i in range(37)) for p in range(9))
+    for chunk_size, overlap in [(400, 50), (20, 5), (7, 0)]:
+        assert split_text_to_chunks(text, chunk_size, overlap) == _sliding_window(text, chunk_size, overlap)
+
+
+def test_provenance_across_pages():
+    pages = [(1, "alpha beta\ngamma"), (2, "  delta epsilon zeta")]
+    chunks = list(iter_chunk_spans(pages, chunk_size=4, overlap=1))
+    first = chunks[0]
+    assert first["text"] == "alpha beta gamma delta"
+    assert (first["page"], first["offset"]) == (1, 0)
+    assert (first["page_end"], first["offset_end"]) == (2, len("  delta"))
+    second = chunks[1]
+    assert second["text"] == "delta epsilon zeta"
+    assert pages[1][1][second["offset"]:second["offset_end"]] == second["text"]
+
+
+def test_sentence_mode_ends_on_sentence():
+    text = "One two three four five six seven. Eight nine ten eleven twelve"
+    chunks = list(iter_chunk_spans([(1, text)], chunk_size=8, overlap=1, boundary="sentence"))
+    assert chunks[0]["text"] == "One two three four five six seven."
+    assert chunks[1]["text"].startswith("seven. Eight")
+
+
+def test_lone_surrogates_do_not_break_chunking():
+    text = "broken \ud835 glyph and\udc00more words"
+    chunks = list(iter_chunk_spans([(1, text)], chunk_size=3, overlap=0))
+    assert [c["text"] for c in chunks] == ["broken \ud835 glyph", "and\udc00more words"]
+    assert text[chunks[1]["offset"]:chunks[1]["offset_end"]] == "and\udc00more words"
+
+    class Page:
+        def extract_text(self):
+            return text
+    assert pdf_loader._extract_page(Page()) == "broken ? glyph and?more words"
+
+
+def test_chunks_come_out_before_the_last_page_is_read():
+    pulled = []
+
+    def pages():
+        for p in range(1, 6):
+            pulled.append(p)
+            yield p, " ".join(f"p{p}w{i}" for i in range(10))
+
+    chunks = iter_chunk_spans(pages(), chunk_size=8, overlap=0)
+    assert next(chunks)["page"] == 1 and pulled == [1]
+    assert len(list(chunks)) > 1 and pulled == [1, 2, 3, 4, 5]
+
+
+def test_pool_extraction_keeps_page_order(tmp_path):
+    path = str(tmp_path / "doc.pdf")
+    make_pdf(path, pages=7, words_per_page=40)
+    serial = list(iter_pdf_pages(path, workers=1))
+    assert [p for p, _ in serial] == list(range(1, 8))
+
+    assert list(iter_pdf_pages(path, workers=2, pages_per_task=2)) == serial
+    pool = pdf_loader._pool
+    assert pool is not None
+    first = iter_pdf_pages(path, workers=2, pages_per_task=1)
+    assert next(first) == serial[0]
+    first.close()  # abandoned mid-document: its queued ranges are dropped
+    assert list(iter_pdf_pages(path, workers=3, pages_per_task=3)) == serial
+    assert pdf_loader._pool is pool  # one pool, shared across documents
@@ -0,0 +1,45 @@
+# tests/test_router.py
+"""
+Tiered router: keywords first, embedding centroids next, LLM only when unsure.
+"""
+import logging
+
+import src.agents.decision_agent as decision_agent
+
+
+def test_keyword_tier_skips_llm():
+    calls = []
+    out = decision_agent.route_question("Will it rain in Pune?", llm_classify=lambda q: calls.append(q) or "rag")
+    assert (out["action"], out["tier"]) == ("weather", "keyword")
+    assert decision_agent.decide_action("open the window")["confidence"] == 0.0  # no "wind" substring match
+    assert calls == []
+
+
+def test_embedding_tier_then_llm(monkeypatch):
+    monkeypatch.setattr(decision_agent, "classify_by_embedding",
+                        lambda q: {"action": "weather", "confidence": 0.97 if "umbrella" in q else 0.55})
+    out = decision_agent.route_question("Do I need an umbrella?", llm_classify=lambda q: "rag")
+    assert (out["action"], out["tier"]) == ("weather", "embedding")
+
+    out = decision_agent.route_question("Tell me about Mumbai", llm_classify=lambda q: "rag")
+    assert (out["action"], out["tier"]) == ("rag", "llm")
+    assert decision_agent.router_stats()["llm"] >= 1
+
+
+def test_embedding_tier_failures_are_counted_and_logged(monkeypatch, caplog):
+    def no_encoder(q):
+        raise ImportError("No module named 'sentence_transformers'")
+    monkeypatch.setattr(decision_agent, "classify_by_embedding", no_encoder)
+    before = decision_agent.router_stats()["embedding_errors"]
+    with caplog.at_level(logging.DEBUG, logger=decision_agent.__name__):
+        out = decision_agent.route_question("Tell me about Mumbai", llm_classify=lambda q: "rag")
+    assert (out["action"], out["tier"]) == ("rag", "llm")
+    assert [r.levelno for r in caplog.records] == [logging.DEBUG]
+
+    def broken(q):
+        raise ValueError("shapes (384,) and (768,) not aligned")
+    monkeypatch.setattr(decision_agent, "classify_by_embedding", broken)
+    caplog.clear()
+    assert decision_agent.route_question("Tell me about Mumbai")["tier"] == "fallback"
+    assert caplog.records[0].levelno == logging.WARNING and caplog.records[0].exc_info
+    assert decision_agent.router_stats()["embedding_errors"] == before + 2
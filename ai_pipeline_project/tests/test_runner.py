@@ -0,0 +1,67 @@
+# tests/test_runner.py
+"""
+Batched retrieval matches per-query retrieval, and the evaluation runner
+pushes a question file through the graph concurrently (offline stand-ins).
+"""
+import asyncio
+import json
+
+import numpy as np
+
+from src.evaluation import benchmark, runner
+from src.utils import qdrant_helper
+from src.utils.cache import TTLCache, normalize_text
+from src.pipelines.ingestion import ensure_pdf_ingested
+from src.pipelines.retervial import retrieve_top_k, retrieve_top_k_batch, document_scope
+
+
+def test_batch_retrieval_and_runner(tmp_path):
+    timings = benchmark.Timings()
+    with benchmark.offline_env(str(tmp_path), timings):
+        pdf = str(tmp_path / "doc.pdf")
+        questions = benchmark.make_questions(benchmark.make_pdf(pdf, pages=3), 6)
+
+        scope = document_scope(ensure_pdf_ingested(pdf))
+        batched = retrieve_top_k_batch(questions, top_k=3, **scope)
+        single = [retrieve_top_k(q, top_k=3, **scope) for q in questions]
+        # same ranking (ties between equal-score chunks may order either way)
+        assert np.allclose([[h["score"] for h in hits] for hits in batched],
+                           [[h["score"] for h in hits] for hits in single], atol=1e-5)
+        assert [hits[0]["id"] for hits in batched] == [hits[0]["id"] for hits in single]
+
+        qfile = tmp_path / "questions.jsonl"
+        lines = [json.dumps({"question": q}) for q in questions] + ["What's the weather in Pune?"]
+        qfile.write_text("\n".join(lines), encoding="utf-8")
+        report = runner.run(runner.load_questions(str(qfile), pdf_path=pdf), concurrency=4)
+
+    summary = report["summary"]
+    assert summary["questions"] == 7 and summary["errors"] == 0
+    assert summary["routes"]["rag"]["n"] == 6 and summary["routes"]["weather"]["n"] == 1
+    assert summary["throughput_qps"] > 0 and summary["mean_score"] > 0
+    assert [r["index"] for r in report["results"]] == list(range(7))
+    assert report["prepare"]["documents"] == 1
+
+
+class CacheProbeGraph:
+    """Records, per question, whether its query vector was cached when the question ran."""
+
+    def __init__(self):
+        self.cached = {}
+
+    async def ainvoke(self, state):
+        key = (qdrant_helper.EMBEDDING_MODEL, normalize_text(state["question"]))
+        self.cached[state["question"]] = qdrant_helper._query_cache.get(key) is not None
+        await asyncio.sleep(0)
+        return {**state, "mode": "rag", "answer": "ok"}
+
+
+def test_more_questions_than_the_query_cache_holds(tmp_path):
+    with benchmark.offline_env(str(tmp_path), benchmark.Timings()):
+        qdrant_helper._query_cache = TTLCache(maxsize=12)
+        assert runner.embed_window() == 4
+        questions = [f"question number {i}?" for i in range(30)]
+        graph = CacheProbeGraph()
+        report = runner.run([{"question": q} for q in questions], concurrency=3, graph=graph)
+
+    assert [r["index"] for r in report["results"]] == list(range(30))
+    assert graph.cached == {q: True for q in questions}
@@ -0,0 +1,138 @@
+# tests/test_server.py
+"""
+Headless HTTP API: query / streaming endpoints, backpressure, timeouts and
+readiness.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src import server as api
+from src.graph import flow
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**kwargs):
+        kwargs.setdefault("warmup", None)
+        srv = api.make_server("127.0.0.1", 0, **kwargs)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+        return "http://127.0.0.1:%d" % srv.server_address[1]
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+def _request(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def _pending(url):
+    text = _request(url + "/metrics")[1].decode()
+    return float(next(line for line in text.splitlines() if line.startswith("rag_server_pending ")).split()[1])
+
+
+class SlowGraph:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    async def ainvoke(self, state):
+        await asyncio.sleep(self.seconds)
+        return {**state, "answer": "done", "trace": []}
+
+
+def test_query_and_stream(monkeypatch, serve):
+    llm = GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="Sunny and 30 C in Pune")))
+    monkeypatch.setattr(flow, "get_chain", lambda name, temperature: flow._PROMPTS[name] | llm)
+
+    async def afetch(city):
+        return {"city": "Pune", "temp": 30}
+    monkeypatch.setattr(flow, "afetch_weather_by_city", afetch)
+    url = serve()
+
+    status, body = _request(url + "/query", {"question": "weather in Pune"})
+    state = json.loads(body)
+    assert status == 200 and state["answer"] == "Sunny and 30 C in Pune" and state["mode"] == "weather"
+    assert "trace" not in state
+
+    status, body = _request(url + "/query/stream", {"question": "weather in Pune"})
+    events = [json.loads(line) for line in body.splitlines()]
+    tokens = [e["text"] for e in events if e["type"] == "token"]
+    assert status == 200 and len(tokens) > 1
+    assert "".join(tokens) == events[-1]["state"]["answer"] == "Sunny and 30 C in Pune"
+
+    assert _request(url + "/query", {"pdf_path": "x.pdf"})[0] == 400
+    assert _request(url + "/query", {"question": "q", "job_id": "nope"})[0] == 404
+    assert _request(url + "/query", {"question": "q", "pdf_path": "/etc/passwd"})[0] == 403
+    assert _request(url + "/query", {"question": "q", "pdf_path": "/dev/zero"})[0] == 403
+    assert b"rag_span_seconds" in _request(url + "/metrics")[1]
+
+
+def test_full_queue_is_rejected_and_slow_queries_time_out(serve):
+    url = serve(graph=SlowGraph(0.5), workers=1, queue_size=0, timeout=5)
+    first = threading.Thread(target=_request, args=(url + "/query", {"question": "a"}))
+    first.start()
+    for _ in range(100):  # until the first query holds the only slot
+        if _pending(url):
+            break
+        threading.Event().wait(0.01)
+    status, _ = _request(url + "/query", {"question": "b"})
+    first.join()
+    assert status == 429
+    assert _request(url + "/query", {"question": "c"})[0] == 200  # the slot is free again
+
+    url = serve(graph=SlowGraph(1.0), workers=1, timeout=0.1)
+    status, body = _request(url + "/query", {"question": "slow"})
+    assert status == 504 and "did not finish" in json.loads(body)["error"]
+
+
+def test_ready_only_after_warmup(serve):
+    release = threading.Event()
+
+    def warmup():
+        release.wait(5)
+        return {"graph": True, "encoder": True, "llm": True}
+
+    url = serve(warmup=warmup, graph=SlowGraph(0))
+    assert _request(url + "/healthz")[0] == 200
+    assert _request(url + "/readyz")[0] == 503
+    release.set()
+    for _ in range(100):
+        status, body = _request(url + "/readyz")
+        if status == 200:
+            break
+        threading.Event().wait(0.02)
+    assert status == 200 and json.loads(body)["warmup"]["encoder"] is True
+
+
+def test_pdf_path_must_be_a_file_under_an_allowed_root(monkeypatch, tmp_path):
+    allowed, outside = tmp_path / "uploads", tmp_path / "other"
+    allowed.mkdir()
+    outside.mkdir()
+    (allowed / "a.pdf").write_bytes(b"%PDF-1")
+    (outside / "b.pdf").write_bytes(b"%PDF-1")
+    monkeypatch.setattr(api, "PDF_ROOTS", [str(allowed)])
+
+    assert api.query_state({"question": "q", "pdf_path": str(allowed / "a.pdf")})["pdf_path"] == str(allowed / "a.pdf")
+    for path in (outside / "b.pdf", allowed / ".." / "other" / "b.pdf", allowed / "missing.pdf", allowed):
+        with pytest.raises(api.Rejected) as e:
+            api.query_state({"question": "q", "pdf_path": str(path)})
+        assert e.value.status == 403
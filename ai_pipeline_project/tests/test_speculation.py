@@ -0,0 +1,132 @@
+# tests/test_speculation.py
+"""
+Speculative retrieval overlaps routing; rag uses it, weather drops it.
+"""
+import itertools
+import threading
+import time
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.graph import flow, speculation
+
+HITS = [{"id": "c1", "score": 0.9, "payload": {"text": "The report covers Q3."}}]
+
+
+def _patch(monkeypatch, action, overlapped=None):
+    calls, retrieved = [], threading.Event()
+
+    def slow_route(question, llm_classify=None):
+        # e.g. the LLM tier; with `overlapped`, routing lasts until the prefetch has finished
+        if overlapped is not None:
+            overlapped.append(retrieved.wait(5))
+        else:
+            time.sleep(0.3)
+        return {"action": action, "tier": "llm", "confidence": 1.0}
+
+    def slow_retrieve(question, top_k=4, **scope):
+        calls.append(question)
+        time.sleep(0.3)
+        retrieved.set()
+        return HITS
+
+    llm = GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="It covers Q3.")))
+    monkeypatch.setattr(flow, "get_chain", lambda name, temperature: flow._PROMPTS[name] | llm)
+    monkeypatch.setattr(flow, "route_question", slow_route)
+    monkeypatch.setattr(flow, "get_answer_cache", lambda: None)
+    monkeypatch.setattr(flow, "retrieve_top_k", lambda *a, **k: (_ for _ in ()).throw(AssertionError("not prefetched")))
+    monkeypatch.setattr(flow, "fetch_weather_by_city", lambda city: {"city": city})
+    monkeypatch.setattr(speculation, "ingested_record", lambda path, **kw: {"sha256": "abc"})
+    monkeypatch.setattr(speculation, "retrieve_top_k", slow_retrieve)
+    return calls
+
+
+def test_rag_uses_prefetched_hits(monkeypatch):
+    overlapped = []
+    calls = _patch(monkeypatch, "rag", overlapped)
+    before = speculation.speculation_stats()
+    out = flow.build_graph().invoke({"question": "what is in it?", "pdf_path": "doc.pdf"})
+
+    assert out["answer"] == "It covers Q3." and out["sources"] == HITS
+    assert calls == ["what is in it?"]
+    assert overlapped == [True]  # the retrieval ran, and finished, while routing was still deciding
+    after = speculation.speculation_stats()
+    assert after["used"] == before["used"] + 1
+    assert after["saved_s"] > before["saved_s"]
+
+
+def test_weather_discards_prefetch(monkeypatch):
+    _patch(monkeypatch, "weather")
+    before = speculation.speculation_stats()
+    out = flow.build_graph().invoke({"question": "how is it in Pune", "pdf_path": "doc.pdf"})
+    assert out["mode"] == "weather"
+    time.sleep(0.1)  # let the in-flight retrieval finish
+    after = speculation.speculation_stats()
+    assert after["discarded"] + after["cancelled"] == before["discarded"] + before["cancelled"] + 1
+    assert after["pending"] == 0
+
+
+def test_failed_routing_drops_the_prefetch(monkeypatch):
+    import asyncio
+
+    import pytest
+
+    _patch(monkeypatch, "rag")
+
+    def broken_route(question, llm_classify=None):
+        raise RuntimeError("GEMINI_API_KEY is not set")
+
+    async def abroken_route(question, llm_classify=None):
+        broken_route(question)
+    monkeypatch.setattr(flow, "route_question", broken_route)
+    monkeypatch.setattr(flow, "aroute_question", abroken_route)
+    state = {"question": "summarize the pdf", "pdf_path": "report.pdf"}
+    discarded = speculation.speculation_stats()["discarded"] + speculation.speculation_stats()["cancelled"]
+
+    with pytest.raises(RuntimeError):
+        flow.build_graph().invoke(state)
+    with pytest.raises(RuntimeError):
+        asyncio.run(flow.build_graph().ainvoke(state))
+
+    stats = speculation.speculation_stats()
+    assert stats["pending"] == 0 and stats["discarded"] + stats["cancelled"] == discarded + 2
+
+
+def test_queued_prefetch_is_cancelled_not_waited_for(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    calls = _patch(monkeypatch, "rag")
+    monkeypatch.setattr(speculation, "_executor", ThreadPoolExecutor(max_workers=1))
+    busy = threading.Event()
+    speculation._executor.submit(busy.wait, 5)  # another request's prefetch holds the only worker
+    cancelled = speculation.speculation_stats()["cancelled"]
+
+    prefetch_id = speculation.start("doc.pdf", "what is in it?")
+    assert speculation.take(prefetch_id) is None  # the rag node retrieves inline
+    busy.set()
+    assert calls == [] and speculation.speculation_stats()["cancelled"] == cancelled + 1
+
+
+def test_prefetch_never_ingests(monkeypatch, tmp_path):
+    from src.pipelines import ingestion
+
+    calls = _patch(monkeypatch, "rag")
+    monkeypatch.setattr(ingestion, "INGEST_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(ingestion, "_manifest", None)
+    monkeypatch.setattr(speculation, "ingested_record", ingestion.ingested_record)
+    monkeypatch.setattr(ingestion, "ensure_embeddings_upsert", lambda *a, **k: (_ for _ in ()).throw(
+        AssertionError("speculative ingest")))
+    pdf = tmp_path / "new.pdf"
+    pdf.write_bytes(b"%PDF-1 not ingested yet")
+    skipped = speculation.speculation_stats()["skipped"]
+
+    prefetch_id = speculation.start(str(pdf), "what is in it?")
+    speculation._pending[prefetch_id].exception(5)  # let it run rather than be cancelled as queued
+    assert speculation.take(prefetch_id) is None
+    assert calls == [] and speculation.speculation_stats()["skipped"] == skipped + 1
+
+    # an upload whose job is still running is not speculated on at all
+    monkeypatch.setattr(speculation, "job_status", lambda job_id: {"state": "running"})
+    assert speculation.start(str(pdf), "what is in it?", ingest_job="j1") is None
@@ -0,0 +1,28 @@
+# tests/test_startup.py
+"""
+Importing the core modules must not pull in torch, qdrant_client or the
+Gemini SDKs, and stays within an import-time budget.
+"""
+from src.utils.startup import import_report, lazy_module
+
+CORE_MODULES = [
+    "src.graph.flow",
+    "src.agents.rag_agent",
+    "src.utils.qdrant_helper",
+    "src.pipelines.embedding_pipeline",
+    "src.utils.llm",
+]
+IMPORT_BUDGET_MS = 4000  # ~1.5 s today; the eager imports took ~10 s
+
+
+def test_core_modules_import_lazily_and_fast():
+    report = import_report(CORE_MODULES)
+    assert report["heavy_loaded"] == []
+    assert set(report["modules"]) <= set(CORE_MODULES) and report["slowest"]
+    assert report["total_ms"] < IMPORT_BUDGET_MS, report["slowest"][:10]
+
+
+def test_lazy_module_imports_on_first_use():
+    json = lazy_module("json")
+    assert json._module is None
+    assert json.loads("[1]") == [1] and json._module is not None
@@ -0,0 +1,44 @@
+# tests/test_streaming.py
+"""
+Async nodes + token streaming; the sync entry points keep working.
+"""
+import asyncio
+import itertools
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.graph import flow, streaming
+
+
+def _patch(monkeypatch):
+    llm = GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="Sunny and 30 C in Pune")))
+    monkeypatch.setattr(flow, "get_chain", lambda name, temperature: flow._PROMPTS[name] | llm)
+    w = {"city": "Pune", "temp": 30}
+    monkeypatch.setattr(flow, "fetch_weather_by_city", lambda city: w)
+
+    async def afetch(city):
+        return w
+    monkeypatch.setattr(flow, "afetch_weather_by_city", afetch)
+
+
+def test_astream_yields_answer_tokens(monkeypatch):
+    _patch(monkeypatch)
+
+    async def collect():
+        return [e async for e in streaming.astream_answer({"question": "weather in Pune"})]
+
+    events = asyncio.run(collect())
+    tokens = [e for e in events if e["type"] == "token"]
+    final = events[-1]
+    assert len(tokens) > 1 and {e["node"] for e in tokens} == {"weather"}
+    assert "".join(e["text"] for e in tokens) == final["state"]["answer"] == "Sunny and 30 C in Pune"
+    assert final["metrics"]["streamed"] and final["metrics"]["ttft_ms"] <= final["metrics"]["total_ms"]
+    assert streaming.latency_stats()["count"] >= 1
+
+
+def test_sync_entry_points(monkeypatch):
+    _patch(monkeypatch)
+    events = list(streaming.stream_answer({"question": "weather in Pune"}))
+    assert events[-1]["state"]["answer"] == "Sunny and 30 C in Pune"
+    assert flow.get_graph().invoke({"question": "weather in Pune"})["answer"] == "Sunny and 30 C in Pune"
@@ -0,0 +1,36 @@
+# tests/test_tracing.py
+"""
+Spans land in the graph state and in the Prometheus text; disabled tracing is a no-op.
+"""
+import itertools
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.graph import flow
+from src.utils import tracing
+
+
+def test_graph_state_carries_trace(monkeypatch):
+    llm = GenericFakeChatModel(messages=itertools.repeat(AIMessage(content="Sunny in Pune")))
+    monkeypatch.setattr(flow, "get_chain", lambda name, temperature: flow._PROMPTS[name] | llm)
+    monkeypatch.setattr(flow, "fetch_weather_by_city", lambda city: {"city": city, "temp": 30})
+
+    out = flow.build_graph().invoke({"question": "weather in Pune"})
+    spans = {s["name"]: s for s in out["trace"]}
+    assert {"node.classify", "node.weather", "llm.weather"} <= set(spans)
+    assert spans["llm.weather"]["parent"] == "node.weather"
+    assert spans["llm.weather"]["tokens_in"] > 0 and spans["llm.weather"]["tokens_out"] > 0
+
+    text = tracing.metrics_text()
+    assert 'rag_span_seconds_count{span="node.weather"}' in text
+    assert 'rag_tokens_total{span="llm.weather",direction="out"}' in text
+
+
+def test_disabled_is_noop(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    before = tracing.metrics_snapshot().get("noop.check")
+    with tracing.collect() as trace:
+        with tracing.span("noop.check") as s:
+            s["items"] = 3
+    assert trace.spans == [] and tracing.metrics_snapshot().get("noop.check") == before
@@ -0,0 +1,56 @@
+# tests/test_vector_store.py
+"""
+Qdrant backend collection handling, against qdrant-client's in-process local mode.
+"""
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from src.utils.vector_store import QdrantStore, DimensionMismatch
+
+# local mode ignores payload indexes and search params (and says so)
+pytestmark = pytest.mark.filterwarnings("ignore::UserWarning")
+
+
+def _store(**kw):
+    store = QdrantStore(**kw)
+    store._client = QdrantClient(location=":memory:")
+    return store
+
+
+def test_create_is_idempotent_and_quantized_search_works():
+    store = _store(on_disk=True, quantization="scalar", hnsw_m=8, hnsw_ef=64)
+    store.create_collection("docs", 2)
+    store.create_payload_index("docs", "document_id")
+    store.upsert("docs", [1, 2], np.asarray([[1, 0], [0, 1]], dtype=np.float32),
+                 [{"document_id": "a"}, {"document_id": "b"}])
+
+    store.create_collection("docs", 2)  # existing collection: kept
+    hits = store.search("docs", np.asarray([1, 0.1], dtype=np.float32), top_k=2, filters={"document_id": "b"})
+    assert [h["id"] for h in hits] == [2]
+    assert store.vector_size("docs") == 2
+    with pytest.raises(DimensionMismatch):
+        store.create_collection("docs", 3)
+
+    applied = store.configure_collection("docs")
+    assert applied["quantization"] == "scalar" and applied["on_disk"] is True
+    assert len(store.search("docs", np.asarray([1, 0], dtype=np.float32))) == 2
+
+
+def test_unknown_quantization_is_rejected():
+    with pytest.raises(ValueError):
+        QdrantStore(quantization="binary")
+
+
+def test_collection_exists_does_not_hide_an_outage():
+    store = _store()
+    assert store.collection_exists("docs") is False
+    store.create_collection("docs", 2)
+    assert store.collection_exists("docs") is True
+
+    class Down:
+        def collection_exists(self, name):
+            raise ConnectionError("qdrant unreachable")
+    store._client = Down()
+    with pytest.raises(ConnectionError):
+        store.collection_exists("docs")
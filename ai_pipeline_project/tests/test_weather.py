@@ -0,0 +1,68 @@
+# tests/test_weather.py
+"""
+Weather agent against a local stub of the OpenWeatherMap endpoint.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import src.agents.wheather_agent as weather
+from src.utils.cache import TTLCache
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def do_GET(self):
+            city = parse_qs(urlparse(self.path).query)["q"][0]
+            calls.append(city)
+            time.sleep(0.2)
+            body = json.dumps({"name": city, "weather": [{"description": f"clear #{len(calls)}"}],
+                               "main": {"temp": 30, "feels_like": 32, "humidity": 40}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(weather, "OWM_BASE", f"http://127.0.0.1:{server.server_address[1]}/weather")
+    monkeypatch.setattr(weather, "WEATHER_API_KEY", "test-key")
+    monkeypatch.setattr(weather, "_cache", TTLCache(maxsize=16, ttl=60))
+    yield calls
+    server.shutdown()
+    server.server_close()
+
+
+def test_cached_and_stale_while_revalidate(stub, monkeypatch):
+    first = weather.fetch_weather_by_city("Mumbai")
+    assert weather.fetch_weather_by_city("  mumbai ") is first
+    assert len(stub) == 1
+
+    monkeypatch.setattr(weather, "WEATHER_CACHE_TTL", 0)  # everything is now stale
+    assert weather.fetch_weather_by_city("Mumbai") is first  # served stale, refresh in background
+    for _ in range(50):
+        if len(stub) == 2 and not weather._refreshing:
+            break
+        time.sleep(0.05)
+    assert weather.fetch_weather_by_city("Mumbai")["description"] == "clear #2"
+
+
+def test_many_cities_concurrently(stub):
+    assert weather.split_cities("Pune and Delhi, Goa") == ["Pune", "Delhi", "Goa"]
+    start = time.perf_counter()
+    out = weather.fetch_weather_many(["Pune", "Delhi", "Goa"])
+    assert time.perf_counter() - start < 0.5  # three 0.2s requests overlap
+    assert [r["city"] for r in out.values()] == ["Pune", "Delhi", "Goa"]